@@ -0,0 +1,187 @@
+import logging
+import math
+import random
+import time
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import transaction
+from redis.exceptions import RedisError
+from monitoring.metrics import CACHE_LATENCY, CACHE_REQUESTS
+from .db_router import read_from_replica
+
+logger = logging.getLogger(__name__)
+
+LOCK_TIMEOUT = 10  # seconds one process may spend filling an entry before others recompute too
+LOCK_WAIT = 2  # how long a miss waits for another process's fill before computing itself
+
+
+class FailOpenRedisCache(RedisCache):
+    """
+    RedisCache that behaves like an empty cache (and logs) while Redis is unreachable.
+    Version bumps and fill locks bypass this (see `bump_version` and `cached`): they need to
+    tell an error from a miss.
+    """
+
+    def _fail_open(method, default=None):
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            except RedisError as e:
+                logger.warning(f"Cache unavailable ({method.__name__}): {str(e)}")
+                return default(*args, **kwargs) if callable(default) else default
+        return wrapper
+
+    get = _fail_open(RedisCache.get, lambda key, default=None, version=None: default)
+    get_many = _fail_open(RedisCache.get_many, lambda *args, **kwargs: {})
+    set = _fail_open(RedisCache.set)
+    add = _fail_open(RedisCache.add, False)
+    set_many = _fail_open(RedisCache.set_many, lambda *args, **kwargs: [])
+    delete = _fail_open(RedisCache.delete, False)
+    delete_many = _fail_open(RedisCache.delete_many)
+    touch = _fail_open(RedisCache.touch, False)
+    incr = _fail_open(RedisCache.incr, lambda key, delta=1, version=None: None)
+    has_key = _fail_open(RedisCache.has_key, False)
+    del _fail_open
+
+
+def _version_key(namespace, ident):
+    return f'v:{namespace}:{ident}'
+
+
+def _fresh_version():
+    # A lost counter restarts past every value it could have had, so old entries are never reused
+    return time.time_ns() // 1000
+
+
+# Per-namespace generation, bumped by invalidate_all(); part of every version in the namespace
+ALL = '*'
+
+# Namespaces with a bump lost to a Redis error; their generation is bumped once Redis answers again
+_pending_resets = set()
+
+
+def _counter(key):
+    version = cache.get(key)
+    if version is None:
+        version = _fresh_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def get_versions(namespace, idents):
+    """{ident: version} for many objects in one cache round trip (missing counters are created)."""
+    if _pending_resets:
+        try:
+            _reset_pending()
+        except RedisError:
+            pass  # still down: reads fail open and get fresh versions anyway
+    keys = {ident: _version_key(namespace, ident) for ident in idents}
+    generation_key = _version_key(namespace, ALL)
+    found = cache.get_many([generation_key, *keys.values()])
+    generation = found.get(generation_key) or _counter(generation_key)
+    return {ident: f'{generation}.{found.get(key) or _counter(key)}' for ident, key in keys.items()}
+
+
+def get_version(namespace, ident):
+    return get_versions(namespace, [ident])[ident]
+
+
+def _strict_cache():
+    """The default cache without FailOpenRedisCache's error handling: Redis errors propagate."""
+    backend = caches['default']
+    return super(FailOpenRedisCache, backend) if isinstance(backend, FailOpenRedisCache) else backend
+
+
+def _bump(key):
+    strict = _strict_cache()
+    try:
+        if strict.incr(key) is not None:
+            return
+    except ValueError:  # no counter yet
+        pass
+    strict.set(key, _fresh_version(), None)
+
+
+def _reset_pending():
+    for namespace in list(_pending_resets):
+        _bump(_version_key(namespace, ALL))
+        _pending_resets.discard(namespace)
+
+
+def bump_version(namespace, ident):
+    """
+    Invalidate every cached entry of (namespace, ident) in O(1): later reads use a new key.
+    A Redis outage doesn't fail the write: the bump is logged as lost and the namespace's
+    generation is bumped as soon as Redis answers again (the entry timeouts bound the rest).
+    """
+    try:
+        if _pending_resets:
+            _reset_pending()
+        _bump(_version_key(namespace, ident))
+    except RedisError as e:
+        _pending_resets.add(namespace)
+        logger.warning(f"Cache version bump lost ({namespace}:{ident}), namespace reset pending: {str(e)}")
+
+
+def invalidate(namespace, ident=ALL):
+    """
+    Bump now, and again after commit in case a concurrent read cached the old rows meanwhile.
+    Without `ident`, invalidates the whole namespace (e.g. after a bulk_update).
+    """
+    bump_version(namespace, ident)
+    transaction.on_commit(lambda: bump_version(namespace, ident))
+
+
+def _lock(key):
+    """Take the fill lock for `key`. With Redis down there's nothing to coordinate: compute."""
+    try:
+        return _strict_cache().add(f'{key}:lock', 1, LOCK_TIMEOUT)
+    except RedisError:
+        return True
+
+
+def cached(namespace, ident, compute, timeout, version=None):
+    """
+    `compute()`'s result for (namespace, ident), cached under the current version of
+    (`version` or namespace, ident); several namespaces can share one object's version.
+
+    Stampedes are avoided two ways: entries are recomputed a little before they expire, with a
+    probability that rises as expiry nears and with how long the compute took ("XFetch"); and on
+    a miss only the process holding a short lock computes while the others wait for its result.
+    Fills read from the primary, so a lagging replica can't be cached under a new version.
+    """
+    start = time.perf_counter()
+    key = f'c:{namespace}:{ident}:{get_version(version or namespace, ident)}'
+    entry = cache.get(key)
+    CACHE_LATENCY.labels(namespace, 'get').observe(time.perf_counter() - start)
+
+    if entry is not None:
+        value, delta, expires = entry
+        if time.time() - delta * math.log(random.random() or 1e-12) < expires:
+            CACHE_REQUESTS.labels(namespace, 'hit').inc()
+            return value
+        if not _lock(key):
+            CACHE_REQUESTS.labels(namespace, 'hit').inc()  # someone else is refreshing it
+            return value
+        CACHE_REQUESTS.labels(namespace, 'early').inc()
+    else:
+        CACHE_REQUESTS.labels(namespace, 'miss').inc()
+        if not _lock(key):
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry[0]
+
+    try:
+        compute_start = time.perf_counter()
+        with read_from_replica(False):
+            value = compute()
+        delta = time.perf_counter() - compute_start
+        CACHE_LATENCY.labels(namespace, 'compute').observe(delta)
+        cache.set(key, (value, delta, time.time() + timeout), timeout)
+    finally:
+        cache.delete(f'{key}:lock')  # a failed compute mustn't leave others waiting on it
+    return value
@@ -0,0 +1,87 @@
+import hashlib
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from .cache import get_version, get_versions
+
+
+def version_stamp(namespace, ident):
+    """Validator stamp for one cached object (see HealthBackEnd.cache), no database query."""
+    return f'{namespace}:{ident}:{get_version(namespace, ident)}'
+
+
+def aggregate_stamp(namespace, idents):
+    """Validator stamp for a list: changes when its members or any member's version change."""
+    versions = get_versions(namespace, sorted(idents))
+    return f'{namespace}:' + ','.join(f'{ident}.{version}' for ident, version in versions.items())
+
+
+class _NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified for GET, answering If-None-Match / If-Modified-Since with 304 right
+    after authentication and permissions, before the handler serializes anything.
+
+    Views supply `get_version_stamp()` (cache versions bumped by writes, so free to compute)
+    and optionally `get_last_modified()` (one indexed query, only run for If-Modified-Since
+    without If-None-Match) plus `last_modified_field`, the dotted path of that timestamp in
+    the response data, so 200s carry Last-Modified without the query.
+    """
+    last_modified_field = None
+
+    def get_version_stamp(self, request):
+        return None
+
+    def get_last_modified(self, request):
+        return None
+
+    def _etag(self, request):
+        stamp = self.get_version_stamp(request)
+        if stamp is None:
+            return None
+        # Weak: the same data may be rendered differently (query params are part of the stamp)
+        return 'W/"%s"' % hashlib.md5(f'{stamp}|{request.get_full_path()}'.encode()).hexdigest()
+
+    def _response_last_modified(self, data):
+        value = data
+        for part in self.last_modified_field.split('.'):
+            value = value.get(part) if isinstance(value, dict) else None
+        value = parse_datetime(value) if isinstance(value, str) else value
+        return int(value.timestamp()) if value else None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        self.etag = self._etag(request)
+        last_modified = None
+        if 'HTTP_IF_MODIFIED_SINCE' in request.META and 'HTTP_IF_NONE_MATCH' not in request.META:
+            last_modified = self.get_last_modified(request)
+            last_modified = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=self.etag, last_modified=last_modified)
+        if response is not None:
+            raise _NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, _NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304):
+            return response
+        if getattr(self, 'etag', None):
+            response.headers['ETag'] = self.etag
+        if response.status_code == 200 and self.last_modified_field and isinstance(response.data, dict):
+            last_modified = self._response_last_modified(response.data)
+            if last_modified:
+                response.headers['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,127 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fnmatch import fnmatch
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+PIN_KEY = 'db:pin:{}'
+
+
+class _Routing:
+    __slots__ = ('use_replica', 'pinned')
+
+    def __init__(self, use_replica):
+        self.use_replica = use_replica
+        self.pinned = False
+
+
+# Routing state of the current request (or `read_from_replica` block); None means primary only
+_routing = ContextVar('db_routing', default=None)
+
+
+class ReplicaRouter:
+    """
+    Sends reads to a random DB_REPLICAS alias while the current request/block allows it.
+    The first write pins the rest of the request to the primary, so it reads its own writes;
+    so does an open transaction on the primary (e.g. select_for_update).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.use_replica or state.pinned or not settings.DB_REPLICAS:
+            return None
+        if connections['default'].in_atomic_block:
+            return None
+        return random.choice(settings.DB_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.pinned = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DB_REPLICAS
+
+
+@contextmanager
+def read_from_replica(enabled=True):
+    """Route reads in the block to a replica (until the first write), e.g. in reports and tasks."""
+    token = _routing.set(_Routing(enabled))
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+def _client_key(request):
+    """
+    Who the request is from, without touching the user table: the authenticated user once a
+    view has run, before that the user_id of a JWT whose signature checks out (a forged or
+    expired one gets no key), or the session's user. Anonymous clients are keyed by IP.
+    """
+    user = getattr(request, 'user', None)
+    # DRF authentication replaces the lazy session user; evaluating that one would query it
+    if user is not None and not isinstance(user, SimpleLazyObject) and user.is_authenticated:
+        return f'user:{user.pk}'
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Bearer '):
+        try:
+            return f'user:{AccessToken(header.split()[1])[api_settings.USER_ID_CLAIM]}'
+        except (IndexError, KeyError, TokenError):
+            return None
+    session = getattr(request, 'session', None)
+    user_id = session.get('_auth_user_id') if session is not None else None
+    if user_id is not None:
+        return f'user:{user_id}'
+    return f"ip:{request.META.get('REMOTE_ADDR')}"
+
+
+def wants_replica(request, view_func):
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') or not settings.DB_REPLICAS:
+        return False
+    view_class = getattr(view_func, 'view_class', None) or getattr(view_func, 'cls', None)
+    flag = getattr(view_func, 'read_replica', getattr(view_class, 'read_replica', None))
+    if flag is not None:
+        return flag
+    match = request.resolver_match
+    return bool(match) and any(fnmatch(match.view_name, pattern) for pattern in settings.DB_REPLICA_URL_NAMES)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests to views with `read_replica = True` (or whose URL name matches
+    DB_REPLICA_URL_NAMES) read from a replica. A client that wrote recently is pinned to the
+    primary for DB_REPLICA_PIN_SECONDS so it doesn't read stale rows past replication lag.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _Routing(False)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if state.pinned and settings.DB_REPLICAS:
+            client = _client_key(request)
+            if client is not None:
+                cache.set(PIN_KEY.format(client), True, settings.DB_REPLICA_PIN_SECONDS)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if state is not None and wants_replica(request, view_func):
+            client = _client_key(request)
+            state.use_replica = client is None or not cache.get(PIN_KEY.format(client))
@@ -0,0 +1,109 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _tree(value):
+    """'id,claims.amount' -> {'id': None, 'claims': {'amount': None}}; None means the whole field."""
+    tree = {}
+    for path in value.split(','):
+        *parents, leaf = [part.strip() for part in path.split('.')]
+        node = tree
+        for part in parents:
+            if part in node and node[part] is None:
+                break
+            node = node.setdefault(part, {})
+        else:
+            if leaf:
+                node[leaf] = None
+    return tree
+
+
+def parse_fieldset(request):
+    """
+    (fields, exclude) trees from `?fields=` / `?exclude=` on a read request, each None when
+    not given. Dotted names reach one object deeper, e.g. `?fields=id,name,claims.status`.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = request.query_params if hasattr(request, 'query_params') else request.GET
+    fields, exclude = params.get('fields'), params.get('exclude')
+    return (_tree(fields) if fields else None), (_tree(exclude) if exclude else None)
+
+
+def _keep(name, fields, exclude):
+    if fields is not None and name not in fields:
+        return False
+    return not (exclude and name in exclude and exclude[name] is None)
+
+
+def sparse_data(data, fields, exclude):
+    """Apply fieldset trees to already serialized data (e.g. from the cache)."""
+    if fields is None and not exclude:
+        return data
+    if isinstance(data, list):
+        return [sparse_data(item, fields, exclude) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {
+        name: sparse_data(value, (fields or {}).get(name), (exclude or {}).get(name))
+        for name, value in data.items() if _keep(name, fields, exclude)
+    }
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin: on reads, drops the fields not asked for with `?fields=` / `?exclude=`
+    before any are evaluated, so unrequested nested serializers cost nothing. Unknown names
+    are ignored. Writes always use every field.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, exclude = parse_fieldset(self.context.get('request'))
+        if fields is not None or exclude:
+            self.apply_fieldset(fields, exclude)
+
+    def apply_fieldset(self, fields, exclude):
+        for name in list(self.fields):
+            if not _keep(name, fields, exclude):
+                self.fields.pop(name)
+        for name, field in self.fields.items():
+            nested = getattr(field, 'child', field)
+            sub_fields, sub_exclude = (fields or {}).get(name), (exclude or {}).get(name)
+            if isinstance(nested, SparseFieldsetMixin) and (sub_fields is not None or sub_exclude):
+                nested.apply_fieldset(sub_fields, sub_exclude)
+
+
+def trim_queryset(queryset, serializer):
+    """
+    Load only the columns, and run only the prefetches, that `serializer`'s (sparse) fields
+    read. Left as is if a field reads the whole object or something that isn't a model field.
+    """
+    model = queryset.model
+    columns, relations = {model._meta.pk.name}, set()
+    for field in serializer.fields.values():
+        if field.source == '*':
+            return queryset
+        name = field.source.split('.')[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return queryset
+        (columns if model_field.concrete else relations).add(name)
+    prefetches = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if (lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup).split('__')[0] in relations
+    ]
+    return queryset.prefetch_related(None).prefetch_related(*prefetches).only(*columns)
+
+
+class SparseQuerysetMixin:
+    """View mixin: trims the list/detail queryset to the fields a sparse request renders."""
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, exclude = parse_fieldset(self.request)
+        if fields is not None or exclude:
+            queryset = trim_queryset(queryset, self.get_serializer())
+        return queryset
@@ -0,0 +1,121 @@
+import logging
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+from redis.exceptions import RedisError
+from rest_framework.exceptions import Throttled
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Checks every bucket first and only debits them if all have room, so a request
+# rejected by the global bucket doesn't use up the user's allowance.
+# KEYS: bucket keys. ARGV: per key -> capacity, refill per ms, cost.
+TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = now_parts[1] * 1000 + math.floor(now_parts[2] / 1000)
+local levels = {}
+local wait = 0
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[(i - 1) * 3 + 1])
+    local rate = tonumber(ARGV[(i - 1) * 3 + 2])
+    local cost = tonumber(ARGV[(i - 1) * 3 + 3])
+    local bucket = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    local level = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    level = math.min(capacity, level + (now - ts) * rate)
+    if level < cost then
+        wait = math.max(wait, (cost - level) / rate)
+    end
+    levels[i] = level
+end
+if wait > 0 then
+    return {0, math.ceil(wait)}
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[(i - 1) * 3 + 1])
+    local rate = tonumber(ARGV[(i - 1) * 3 + 2])
+    local cost = tonumber(ARGV[(i - 1) * 3 + 3])
+    redis.call('HSET', KEYS[i], 'level', levels[i] - cost, 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], math.ceil(capacity / rate) + 1000)
+end
+return {1, 0}
+"""
+
+
+class RateLimited(Throttled):
+    """Raised before an upstream LLM call is made. DRF turns it into a 429 with Retry-After."""
+    default_detail = "The assistant is busy right now. Please try again shortly."
+
+
+def parse_rate(rate):
+    """'10/min' -> (10, 60)"""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def estimate_tokens(prompt=None, has_image=False):
+    """Rough upfront cost of a call; ~4 characters per token plus fixed overhead."""
+    estimate = len(prompt or '') // 4 + settings.LLM_TOKEN_OVERHEAD
+    if has_image:
+        estimate += settings.LLM_IMAGE_TOKENS
+    return estimate
+
+
+def admit_llm_request(user_id=None, phone=None, tokens=0):
+    """
+    Take one request and `tokens` tokens from the per-user/per-phone and global buckets.
+    Raises RateLimited (with retry-after) when any bucket is empty. Fails open without Redis.
+    """
+    client = get_redis()
+    if client is None:
+        return
+
+    scopes = [('global', 'all')]
+    if user_id is not None:
+        scopes.append(('user', user_id))
+    if phone:
+        scopes.append(('phone', phone))
+
+    keys, args = [], []
+    for scope, ident in scopes:
+        for dimension, cost in (('requests', 1), ('tokens', tokens)):
+            limit = settings.LLM_RATE_LIMITS[scope].get(dimension)
+            if not limit or not cost:
+                continue
+            capacity, period = parse_rate(limit)
+            keys.append(f"llm:bucket:{scope}:{ident}:{dimension}")
+            args.extend([capacity, capacity / (period * 1000), min(cost, capacity)])
+
+    try:
+        allowed, wait_ms = client.eval(TOKEN_BUCKET_SCRIPT, len(keys), *keys, *args)
+    except RedisError as e:
+        logger.warning(f"Rate limiter unavailable, admitting request: {str(e)}")
+        return
+
+    if not allowed:
+        logger.info(f"LLM request throttled for {scopes}, retry in {wait_ms} ms")
+        raise RateLimited(wait=max(1, wait_ms / 1000))
+
+
+_upstream_slots = None
+_slots_lock = threading.Lock()
+
+
+@contextmanager
+def upstream_slot():
+    """Bound the number of concurrent upstream LLM calls in this process."""
+    global _upstream_slots
+    if _upstream_slots is None:
+        with _slots_lock:
+            if _upstream_slots is None:
+                _upstream_slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+
+    if not _upstream_slots.acquire(timeout=settings.LLM_QUEUE_TIMEOUT):
+        raise RateLimited(wait=1)
+    try:
+        yield
+    finally:
+        _upstream_slots.release()
@@ -14,6 +14,57 @@ USE_HTTPS = os.getenv('USE_HTTPS', 'False').lower() in ('true', '1', 'yes')
 
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 
+# LLM backend: real OpenAI client, or 'chatbot.fake_llm.FakeLLMClient' for load tests / offline work
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'chatbot.llm.openai_client')
+LLM_FAKE_LATENCY = os.getenv('LLM_FAKE_LATENCY', 'lognormal:1200:0.5')
+LLM_FAKE_RATE_LIMIT_RATE = float(os.getenv('LLM_FAKE_RATE_LIMIT_RATE', 0))
+LLM_FAKE_TIMEOUT_RATE = float(os.getenv('LLM_FAKE_TIMEOUT_RATE', 0))
+LLM_FAKE_TIMEOUT_SECONDS = float(os.getenv('LLM_FAKE_TIMEOUT_SECONDS', 10))
+LLM_FAKE_SEED = int(os.getenv('LLM_FAKE_SEED', 0))
+
+# Model tiers used by chatbot.routing; short English text goes to 'fast', images to 'vision'
+LLM_MODEL_TIERS = {
+    'fast': os.getenv('LLM_FAST_MODEL', 'gpt-4o-mini'),
+    'standard': os.getenv('LLM_STANDARD_MODEL', 'gpt-4-turbo'),
+    'vision': os.getenv('LLM_VISION_MODEL', 'gpt-4-turbo'),
+}
+LLM_FAST_MAX_PROMPT_CHARS = int(os.getenv('LLM_FAST_MAX_PROMPT_CHARS', 280))
+
+# LLM admission control (HealthBackEnd.ratelimit): Redis token buckets + per-process concurrency cap
+LLM_RATE_LIMITS = {
+    'user': {
+        'requests': os.getenv('LLM_USER_REQUEST_RATE', '10/min'),
+        'tokens': os.getenv('LLM_USER_TOKEN_RATE', '20000/hour'),
+    },
+    'phone': {
+        'requests': os.getenv('LLM_PHONE_REQUEST_RATE', '10/min'),
+        'tokens': os.getenv('LLM_PHONE_TOKEN_RATE', '20000/hour'),
+    },
+    'global': {
+        'requests': os.getenv('LLM_GLOBAL_REQUEST_RATE', '300/min'),
+        'tokens': os.getenv('LLM_GLOBAL_TOKEN_RATE', '200000/min'),
+    },
+}
+LLM_TOKEN_OVERHEAD = int(os.getenv('LLM_TOKEN_OVERHEAD', 800))
+LLM_IMAGE_TOKENS = int(os.getenv('LLM_IMAGE_TOKENS', 1100))
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+LLM_QUEUE_TIMEOUT = float(os.getenv('LLM_QUEUE_TIMEOUT', 5))
+
+# Single-flight coalescing of identical chatbot questions (chatbot.coalesce)
+COALESCE_TIMEOUT = float(os.getenv('COALESCE_TIMEOUT', 60))
+COALESCE_RESULT_TTL = float(os.getenv('COALESCE_RESULT_TTL', 5))
+
+# Images sent to vision models are downscaled/re-encoded first (chatbot.images)
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', 1536))
+RECEIPT_IMAGE_MAX_DIMENSION = int(os.getenv('RECEIPT_IMAGE_MAX_DIMENSION', 2048))
+IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'JPEG').upper()  # JPEG or WEBP
+IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', 80))
+IMAGE_CACHE_TIMEOUT = int(os.getenv('IMAGE_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Voice notes: optional ffmpeg normalization before Whisper (chatbot.audio)
+AUDIO_NORMALIZE = os.getenv('AUDIO_NORMALIZE', 'False').lower() in ('true', '1', 'yes')
+AUDIO_SAMPLE_RATE = int(os.getenv('AUDIO_SAMPLE_RATE', 16000))
+
 INSTALLED_APPS = [
     'jazzmin',
     'django.contrib.admin',
@@ -27,6 +78,7 @@ INSTALLED_APPS = [
     'chatbot',
     'wallets',
     'circles',
+    'monitoring',
     'corsheaders',
     'django_celery_beat',
     
@@ -43,6 +95,8 @@ CSRF_TRUSTED_ORIGINS = os.getenv("CSRF_TRUSTED_ORIGINS", "").split(",") if os.ge
 
 
 MIDDLEWARE = [
+    'monitoring.middleware.InstrumentationMiddleware',
+    'monitoring.middleware.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -50,12 +104,71 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'HealthBackEnd.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'HealthBackEnd.urls'
 
+# Per-request instrumentation (monitoring.middleware): requests over budget log their top queries
+REQUEST_QUERY_BUDGET = int(os.getenv('REQUEST_QUERY_BUDGET', 30))
+REQUEST_TIME_BUDGET_MS = int(os.getenv('REQUEST_TIME_BUDGET_MS', 1000))
+# URL name -> (query budget, time budget ms); chat/claims wait on the LLM
+REQUEST_BUDGETS = {
+    'health-chatbot': (REQUEST_QUERY_BUDGET, 30000),
+    'create-claim': (REQUEST_QUERY_BUDGET, 30000),
+}
+
+# Hot GET responses are cached under per-object versions that writes bump (HealthBackEnd.cache);
+# these timeouts bound memory and how long an entry can outlive a bump lost to a Redis outage
+PROFILE_CACHE_TIMEOUT = int(os.getenv('PROFILE_CACHE_TIMEOUT', '300'))
+CIRCLE_CACHE_TIMEOUT = int(os.getenv('CIRCLE_CACHE_TIMEOUT', '300'))
+WALLET_CACHE_TIMEOUT = int(os.getenv('WALLET_CACHE_TIMEOUT', '300'))
+
+# Read-only requests on the wallet/profile/circle-list views authenticate from token claims
+# (no user query); a full user needed anyway is cached in-process for CLAIMS_USER_CACHE_TTL seconds
+CLAIMS_AUTH_ENABLED = os.getenv('CLAIMS_AUTH_ENABLED', 'True').lower() in ('true', '1', 'yes')
+CLAIMS_USER_CACHE_TTL = int(os.getenv('CLAIMS_USER_CACHE_TTL', '30'))
+
+# Expired refresh tokens are pruned hourly in batches; blacklisted JTIs are kept in a Bloom
+# filter (Redis, or per process without it) sized for TOKEN_BLOOM_CAPACITY tokens
+TOKEN_PRUNE_BATCH_SIZE = int(os.getenv('TOKEN_PRUNE_BATCH_SIZE', '5000'))
+TOKEN_BLOOM_CAPACITY = int(os.getenv('TOKEN_BLOOM_CAPACITY', '1000000'))
+TOKEN_BLOOM_ERROR_RATE = float(os.getenv('TOKEN_BLOOM_ERROR_RATE', '0.001'))
+
+# Bearer token required by /metrics. Without one the endpoint is a 404, unless DEBUG or
+# METRICS_PUBLIC allows unauthenticated scrapes (e.g. behind a private network)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', 'False').lower() in ('true', '1', 'yes')
+# Port a Celery worker serves its own metrics on (task durations, LLM calls made in tasks)
+CELERY_METRICS_PORT = int(os.getenv('CELERY_METRICS_PORT', 0)) or None
+
+# Sampling profiler: requests with a signed X-Profile header, or a random PROFILER_SAMPLE_RATE
+# share of them, are profiled and kept as collapsed stacks in PROFILER_DIR (newest N kept)
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', '0'))
+PROFILER_TASK_SAMPLE_RATE = float(os.getenv('PROFILER_TASK_SAMPLE_RATE', '0'))
+PROFILER_TASKS = [t for t in os.getenv('PROFILER_TASKS', '').split(',') if t]  # e.g. circles.tasks.enforce_contributions
+PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', '5'))
+PROFILER_DIR = os.getenv('PROFILER_DIR', str(BASE_DIR / 'profiles'))
+PROFILER_MAX_PROFILES = int(os.getenv('PROFILER_MAX_PROFILES', '200'))
+PROFILER_TOKEN_MAX_AGE = int(os.getenv('PROFILER_TOKEN_MAX_AGE', '3600'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'kv': {
+            '()': 'monitoring.log_format.KeyValueFormatter',
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'kv'},
+    },
+    'root': {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO')},
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -81,6 +194,50 @@ CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Africa/Lagos'
+# Synced into django_celery_beat's periodic tasks when beat starts
+CELERY_BEAT_SCHEDULE = {
+    'prune-expired-tokens': {
+        'task': 'auths.tasks.prune_expired_tokens',
+        'schedule': timedelta(hours=1),
+    },
+    'requeue-stale-messages': {
+        'task': 'chatbot.tasks.requeue_stale_messages',
+        'schedule': timedelta(minutes=5),
+    },
+}
+
+REDIS_URL = CELERY_BROKER_URL
+# Seconds; a stalled Redis fails fast instead of hanging requests (limiter, cache and locks fall back)
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 1))
+REDIS_CONNECT_TIMEOUT = float(os.getenv('REDIS_CONNECT_TIMEOUT', 0.5))
+
+# Shared cache on the Celery Redis (fails open; a lost version bump resets the namespace later);
+# per-process memory when Redis isn't configured, which gunicorn.conf.py refuses with several workers
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'HealthBackEnd.cache.FailOpenRedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'cache',
+            'TIMEOUT': 300,
+            'OPTIONS': {
+                'socket_timeout': REDIS_SOCKET_TIMEOUT,
+                'socket_connect_timeout': REDIS_CONNECT_TIMEOUT,
+            },
+        },
+    }
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Twilio (WhatsApp) Config
+TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
+TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
+TWILIO_MESSAGING_BACKEND = os.getenv('TWILIO_MESSAGING_BACKEND', 'chatbot.messaging.TwilioBackend')
+TWILIO_SENDER_LOCK_TIMEOUT = int(os.getenv('TWILIO_SENDER_LOCK_TIMEOUT', 120))  # renewed before each message
+# Pending/processing messages older than this are re-queued by requeue_stale_messages
+TWILIO_STALE_MESSAGE_SECONDS = int(os.getenv('TWILIO_STALE_MESSAGE_SECONDS', 900))
+TWILIO_MEDIA_MAX_BYTES = int(os.getenv('TWILIO_MEDIA_MAX_BYTES', 16 * 1024 * 1024))
+TWILIO_MEDIA_POOL_SIZE = int(os.getenv('TWILIO_MEDIA_POOL_SIZE', 10))
 
 AUTH_USER_MODEL = 'auths.CustomUser'
 
@@ -107,6 +264,17 @@ DATABASES = {
     }
 }
 
+# Read replicas (comma-separated hosts, same credentials as the primary). Safe requests to views
+# with `read_replica = True` or a URL name matching DB_REPLICA_URL_NAMES read from them; a client
+# that wrote is kept on the primary for DB_REPLICA_PIN_SECONDS (HealthBackEnd.db_router)
+DB_REPLICA_HOSTS = [h for h in os.getenv('DB_REPLICA_HOSTS', '').split(',') if h]
+for i, host in enumerate(DB_REPLICA_HOSTS, 1):
+    DATABASES[f'replica{i}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+DB_REPLICAS = [f'replica{i}' for i in range(1, len(DB_REPLICA_HOSTS) + 1)]
+DB_REPLICA_PIN_SECONDS = int(os.getenv('DB_REPLICA_PIN_SECONDS', '10'))
+DB_REPLICA_URL_NAMES = ['admin:*_changelist']
+DATABASE_ROUTERS = ['HealthBackEnd.db_router.ReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -142,11 +310,20 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # DRF Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'auths.authentication.RevocableJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'HealthBackEnd.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'HealthBackEnd.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 # JWT Configuration
@@ -1,11 +1,15 @@
 from django.contrib import admin
 from django.urls import path, include
+from monitoring.views import metrics_view, profile_detail_view, profile_list_view
 
 urlpatterns = [
+    path('admin/profiles/', admin.site.admin_view(profile_list_view), name='profile-list'),
+    path('admin/profiles/<str:name>', admin.site.admin_view(profile_detail_view), name='profile-detail'),
     path('admin/', admin.site.urls),
     path('api/user-auth/', include('auths.urls')),
     path('api/health-sub/', include('healthSubs.urls')),
     path('api/chatbot/', include('chatbot.urls')),
     path('api/wallet/', include('wallets.urls')),
     path('api/circles/', include('circles.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
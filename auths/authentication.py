@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from redis.exceptions import RedisError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from HealthBackEnd.redis_client import get_redis
+from .models import TokenRevocation
+
+logger = logging.getLogger(__name__)
+
+# Profile fields copied into every token, so read endpoints don't need the user row
+USER_CLAIMS = ('username', 'language', 'phone')
+
+REVOKED_JTI_KEY = 'auth:revoked:jti:{}'
+REVOKED_USER_KEY = 'auth:revoked:user:{}'
+# Set once Redis holds every unexpired TokenRevocation; missing after a flush or on a new Redis
+REVOCATIONS_SYNCED_KEY = 'auth:revoked:synced'
+REVOCATIONS_SYNC_LOCK_KEY = 'auth:revoked:syncing'
+
+
+def add_user_claims(token, user):
+    """Copy USER_CLAIMS and is_active onto a (refresh) token; access tokens derived from it inherit them."""
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim) or ''
+    token['is_active'] = user.is_active
+    return token
+
+
+def _revoke(key, revoked_before, ttl):
+    """
+    Record a revocation in Redis, then in the database. Unlike the cache this doesn't fail
+    open: if Redis can't take it the error propagates, since readers trust Redis while it's up.
+    """
+    client = get_redis()
+    if client is not None:
+        client.set(key, revoked_before, ex=ttl)
+    TokenRevocation.objects.update_or_create(
+        key=key, defaults={'revoked_before': revoked_before, 'expires_at': timezone.now() + timedelta(seconds=ttl)},
+    )
+
+
+def revoke_token(token):
+    """Reject an access token for the rest of its lifetime (e.g. on logout)."""
+    ttl = int(token['exp'] - time.time())
+    if ttl > 0:
+        _revoke(REVOKED_JTI_KEY.format(token[api_settings.JTI_CLAIM]), int(token['exp']) + 1, ttl)
+
+
+def revoke_user_tokens(user_id):
+    """Reject every access token issued to the user up to now."""
+    lifetime = settings.SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'].total_seconds()
+    _revoke(REVOKED_USER_KEY.format(user_id), int(time.time()) + 1, int(lifetime))
+
+
+def sync_revocations(client):
+    """Copy the unexpired revocations into Redis, once at a time across processes."""
+    if not client.set(REVOCATIONS_SYNC_LOCK_KEY, 1, nx=True, ex=60):
+        return
+    now = timezone.now()
+    pipe = client.pipeline()
+    for key, revoked_before, expires_at in (
+        TokenRevocation.objects.filter(expires_at__gt=now).values_list('key', 'revoked_before', 'expires_at')
+    ):
+        pipe.set(key, revoked_before, ex=max(1, int((expires_at - now).total_seconds())))
+    pipe.set(REVOCATIONS_SYNCED_KEY, 1)
+    pipe.delete(REVOCATIONS_SYNC_LOCK_KEY)
+    pipe.execute()
+
+
+def is_revoked(token):
+    """
+    One Redis MGET per request. Without Redis, while it's unreachable, or until it has been
+    synced from TokenRevocation, the database answers instead, so a revoked token is never
+    let through because a per-process or failing cache didn't see the revocation.
+    """
+    keys = [
+        REVOKED_JTI_KEY.format(token.get(api_settings.JTI_CLAIM)),
+        REVOKED_USER_KEY.format(token.get(api_settings.USER_ID_CLAIM)),
+    ]
+    client = get_redis()
+    if client is not None:
+        try:
+            synced, *values = client.mget([REVOCATIONS_SYNCED_KEY, *keys])
+            if synced:
+                return _issued_before(token, values)
+            sync_revocations(client)
+        except RedisError as e:
+            logger.warning(f"Revocation store unavailable, checking the database: {str(e)}")
+
+    stored = dict(
+        TokenRevocation.objects.filter(key__in=keys, expires_at__gt=timezone.now()).values_list('key', 'revoked_before')
+    )
+    return _issued_before(token, [stored.get(key) for key in keys])
+
+
+def _issued_before(token, revoked_before):
+    issued_at = token.get('iat', 0)
+    return any(value is not None and issued_at < int(value) for value in revoked_before)
+
+
+class _UserCache:
+    """Small per-process LRU of full user rows, for the rare claims-user access that needs one."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry and entry[0] > now:
+                self._users.move_to_end(user_id)
+                return entry[1]
+        user = get_user_model().objects.get(pk=user_id)
+        with self._lock:
+            self._users[user_id] = (now + settings.CLAIMS_USER_CACHE_TTL, user)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.maxsize:
+                self._users.popitem(last=False)
+        return user
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = _UserCache()
+
+
+class ClaimsUser:
+    """
+    request.user built from token claims alone. Exposes id/pk, is_active and USER_CLAIMS;
+    anything else (email, is_staff, permissions, ...) comes from the full user, loaded through
+    `user_cache`.
+    """
+    is_anonymous = False
+    is_authenticated = True
+
+    def __init__(self, token):
+        self.token = token
+        self.id = self.pk = token[api_settings.USER_ID_CLAIM]
+        self.username = token['username']
+        self.language = token.get('language', '')
+        self.phone = token.get('phone', '')
+        self.is_active = token.get('is_active', True)  # tokens from before the claim: deactivation revoked them
+
+    def __str__(self):
+        return self.username
+
+    def __eq__(self, other):
+        return getattr(other, 'pk', None) == self.pk and getattr(other, 'is_authenticated', False)
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def get_username(self):
+        return self.username
+
+    def get_full_user(self):
+        return user_cache.get(self.id)
+
+    def __getattr__(self, attr):
+        if attr.startswith('_') or attr == 'token':
+            raise AttributeError(attr)
+        return getattr(self.get_full_user(), attr)
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that also rejects tokens revoked through revoke_token/revoke_user_tokens."""
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token):
+            raise AuthenticationFailed('Token has been revoked', code='token_revoked')
+        return validated_token
+
+
+class ClaimsJWTAuthentication(RevocableJWTAuthentication):
+    """
+    JWT authentication without the per-request user query. Tokens issued before the claims
+    existed fall back to the database lookup.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token or 'username' not in validated_token:
+            return super().get_user(validated_token)
+        user = ClaimsUser(validated_token)
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+
+class ClaimsAuthMixin:
+    """Authenticate safe (read-only) requests with ClaimsJWTAuthentication; writes get the full user."""
+
+    def initialize_request(self, request, *args, **kwargs):
+        self.claims_auth = settings.CLAIMS_AUTH_ENABLED and request.method in SAFE_METHODS
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_authenticators(self):
+        if getattr(self, 'claims_auth', False):
+            return [ClaimsJWTAuthentication()]
+        return super().get_authenticators()
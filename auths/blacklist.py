@@ -0,0 +1,151 @@
+import hashlib
+import logging
+import math
+import threading
+from django.conf import settings
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from HealthBackEnd.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+BLOOM_KEY = 'auth:blacklist:bloom'
+BLOOM_LAST_ID_KEY = 'auth:blacklist:bloom:last_id'
+BLOOM_REBUILD_LOCK_KEY = 'auth:blacklist:bloom:rebuilding'
+
+
+def _size(capacity, error_rate):
+    """(bits, hash count) for a filter holding `capacity` items at `error_rate` false positives."""
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    return bits, max(1, round(bits / capacity * math.log(2)))
+
+
+def _offsets(jti, bits, hashes):
+    digest = hashlib.blake2b(jti.encode(), digest_size=16).digest()
+    h1, h2 = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+    return [(h1 + i * h2) % bits for i in range(hashes)]
+
+
+class BlacklistBloomFilter:
+    """
+    Bloom filter of blacklisted refresh-token JTIs, so most blacklist checks skip the database.
+    "Not in the filter" is definite; "maybe" falls through to the BlacklistedToken query.
+
+    The bits live in Redis when it's configured, shared by every process; new blacklist rows are
+    added by a post_save signal. Without Redis each process keeps its own bytearray and catches
+    up with rows from other processes (`pk > last seen`) before answering "not blacklisted".
+    Bits use Redis SETBIT order, so a locally built filter can be uploaded as is.
+    """
+
+    def __init__(self):
+        self.bits, self.hashes = _size(settings.TOKEN_BLOOM_CAPACITY, settings.TOKEN_BLOOM_ERROR_RATE)
+        self._local = None
+        self._last_id = 0
+        self._lock = threading.Lock()
+
+    def _build(self, rows):
+        data = bytearray((self.bits + 7) // 8)
+        for jti in rows:
+            for offset in _offsets(jti, self.bits, self.hashes):
+                data[offset >> 3] |= 0x80 >> (offset & 7)
+        return data
+
+    def _new_rows(self, after):
+        return list(
+            BlacklistedToken.objects.filter(pk__gt=after).order_by('pk').values_list('pk', 'token__jti')
+        )
+
+    def add(self, jti, pk=None):
+        client = get_redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for offset in _offsets(jti, self.bits, self.hashes):
+                    pipe.setbit(BLOOM_KEY, offset, 1)
+                pipe.execute()
+            except RedisError as e:
+                logger.warning(f"Blacklist bloom filter unavailable: {str(e)}")
+            return
+        with self._lock:
+            if self._local is not None:
+                for offset in _offsets(jti, self.bits, self.hashes):
+                    self._local[offset >> 3] |= 0x80 >> (offset & 7)
+                if pk is not None:
+                    self._last_id = max(self._last_id, pk)
+
+    def might_contain(self, jti):
+        """False only when `jti` is certainly not blacklisted."""
+        offsets = _offsets(jti, self.bits, self.hashes)
+        client = get_redis()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                pipe.exists(BLOOM_LAST_ID_KEY)
+                for offset in offsets:
+                    pipe.getbit(BLOOM_KEY, offset)
+                ready, *bits = pipe.execute()
+            except RedisError as e:
+                logger.warning(f"Blacklist bloom filter unavailable, checking the database: {str(e)}")
+                return True
+            if not ready:
+                # First use, or Redis was flushed: rebuild in the background, use the database meanwhile
+                if client.set(BLOOM_REBUILD_LOCK_KEY, 1, nx=True, ex=600):
+                    from .tasks import rebuild_blacklist_filter
+                    rebuild_blacklist_filter.delay()
+                return True
+            return all(bits)
+
+        with self._lock:
+            if self._local is None:
+                self._rebuild_local()
+            else:
+                for pk, row_jti in self._new_rows(self._last_id):
+                    for offset in _offsets(row_jti, self.bits, self.hashes):
+                        self._local[offset >> 3] |= 0x80 >> (offset & 7)
+                    self._last_id = pk
+            return all(self._local[offset >> 3] & (0x80 >> (offset & 7)) for offset in offsets)
+
+    def _rebuild_local(self):
+        rows = self._new_rows(0)
+        self._local = self._build(jti for _, jti in rows)
+        self._last_id = rows[-1][0] if rows else 0
+
+    def rebuild(self):
+        """
+        Rebuild from BlacklistedToken (entries can't be removed from a Bloom filter, so this is
+        how pruned tokens leave it). Rows blacklisted during the rebuild are re-added after the swap.
+        """
+        client = get_redis()
+        if client is None:
+            with self._lock:
+                self._rebuild_local()
+            return
+        rows = self._new_rows(0)
+        last_id = rows[-1][0] if rows else 0
+        data = self._build(jti for _, jti in rows)
+        try:
+            pipe = client.pipeline()
+            pipe.set(f'{BLOOM_KEY}:new', bytes(data))
+            pipe.rename(f'{BLOOM_KEY}:new', BLOOM_KEY)
+            pipe.set(BLOOM_LAST_ID_KEY, last_id)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Couldn't store the blacklist bloom filter: {str(e)}")
+            return
+        for _, jti in self._new_rows(last_id):
+            self.add(jti)
+        client.delete(BLOOM_REBUILD_LOCK_KEY)
+        logger.info(f"Rebuilt blacklist bloom filter with {len(rows)} tokens")
+
+
+bloom = BlacklistBloomFilter()
+
+
+class BloomRefreshToken(RefreshToken):
+    """RefreshToken whose blacklist check consults the Bloom filter before the database."""
+
+    def check_blacklist(self):
+        if bloom.might_contain(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
@@ -0,0 +1,184 @@
+import csv
+import json
+import multiprocessing
+import os
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, connection, connections, transaction
+from tqdm import tqdm
+from circles.counters import rebuild_counters
+from circles.models import Circle, Membership
+from circles.stats import rebuild_stats
+from healthSubs.models import HealthProfile
+from healthSubs.scoring import active_rules, score_profile
+from wallets.models import Wallet
+
+User = get_user_model()
+
+FIELDS = ('username', 'password', 'phone', 'language', 'email', 'full_name', 'gender', 'circle')
+MIN_PASSWORD_LENGTH = 6  # same as RegisterSerializer
+
+
+def _hash(password):
+    # Rows without a password get an unusable one (the user sets it through a reset)
+    return make_password(password or None)
+
+
+def _read_rows(path, fmt):
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {'_error': f"line {line_no}: invalid JSON ({e.msg})"}
+
+
+class Command(BaseCommand):
+    help = "Bulk-create users with a wallet, an empty health profile and optional circle membership from CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help=f"CSV with a header row, or NDJSON; columns/keys: {', '.join(FIELDS)}")
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help="Default: from the file extension")
+        parser.add_argument('--circle', type=int, help="Circle id for rows that don't name one")
+        parser.add_argument('--results', help="Per-row result CSV (default: <path>.results.csv)")
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Password hashing processes")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Users per insert transaction")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+        results_path = options['results'] or f'{path}.results.csv'
+
+        rows = [self._clean(row, options['circle']) for row in _read_rows(path, fmt)]
+        results = [{'row': n, 'username': row.get('username', ''), 'status': 'error' if row.get('_error') else '',
+                    'user_id': '', 'error': row.get('_error', '')} for n, row in enumerate(rows, 1)]
+        self._mark_conflicts(rows, results)
+
+        pending = [n for n, result in enumerate(results) if not result['status']]
+        self.stdout.write(f"{len(rows)} rows, {len(pending)} to import, {len(rows) - len(pending)} rejected")
+
+        passwords = self._hash_passwords([rows[n]['password'] for n in pending], options['workers'])
+        rules = active_rules()
+        _, empty_risk = score_profile(HealthProfile(), rules)  # every imported profile starts empty
+
+        circle_ids = set()
+        batch_size = options['batch_size']
+        with tqdm(total=len(pending), desc='users', unit='rows') as progress:
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                hashes = passwords[start:start + batch_size]
+                try:
+                    created = self._insert(rows, batch, hashes, empty_risk, rules.version)
+                except IntegrityError:
+                    # A username was taken since the conflict check: re-check this batch and retry once
+                    self._mark_conflicts(rows, results, batch)
+                    kept = [(n, h) for n, h in zip(batch, hashes) if not results[n]['status']]
+                    batch, hashes = [n for n, _ in kept], [h for _, h in kept]
+                    created = self._insert(rows, batch, hashes, empty_risk, rules.version)
+                for n, user in zip(batch, created):
+                    results[n].update(status='created', user_id=user.pk)
+                    if rows[n]['circle']:
+                        circle_ids.add(rows[n]['circle'])
+                progress.update(len(batch))
+
+        if circle_ids:
+            # bulk_create skips the membership signals that keep stats and counters current
+            rebuild_stats(circle_ids)
+            rebuild_counters(circle_ids)
+
+        with open(results_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['row', 'username', 'status', 'user_id', 'error'])
+            writer.writeheader()
+            writer.writerows(results)
+
+        counts = {status: sum(r['status'] == status for r in results) for status in ('created', 'conflict', 'error')}
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['created']} users ({counts['conflict']} conflicts, {counts['error']} errors); "
+            f"results in {results_path}"
+        ))
+
+    def _clean(self, row, default_circle):
+        """Normalize one input row; problems are reported as `_error` rather than raised."""
+        if not isinstance(row, dict):
+            return {'_error': "expected an object"}
+        if row.get('_error'):
+            return row
+        row = {field: (str(row[field]).strip() if row.get(field) not in (None, '') else '') for field in FIELDS}
+        try:
+            User.username_validator(row['username'])
+            if not row['username'] or len(row['username']) > 150:
+                raise ValidationError("username is required (at most 150 characters)")
+        except ValidationError as e:
+            row['_error'] = '; '.join(e.messages)
+            return row
+        if row['password'] and len(row['password']) < MIN_PASSWORD_LENGTH:
+            row['_error'] = f"password must be at least {MIN_PASSWORD_LENGTH} characters"
+        if row['gender'] and row['gender'] not in dict(HealthProfile.GENDER_CHOICES):
+            row['_error'] = f"gender must be one of {', '.join(dict(HealthProfile.GENDER_CHOICES))}"
+        circle = row['circle'] or default_circle
+        try:
+            row['circle'] = int(circle) if circle else None
+        except ValueError:
+            row['_error'] = "circle must be a circle id"
+        return row
+
+    def _mark_conflicts(self, rows, results, indexes=None):
+        """Flag usernames already taken (one query per max_query_params names) or repeated in the file."""
+        indexes = [n for n in (indexes if indexes is not None else range(len(rows))) if not results[n]['status']]
+        names = [rows[n]['username'] for n in indexes]
+        step = connection.features.max_query_params or len(names) or 1
+        taken = set()
+        for start in range(0, len(names), step):
+            taken.update(User.objects.filter(username__in=names[start:start + step]).values_list('username', flat=True))
+
+        circles = {rows[n]['circle'] for n in indexes if rows[n]['circle']}
+        existing_circles = set(Circle.objects.filter(pk__in=circles).values_list('pk', flat=True)) if circles else set()
+
+        seen = set()
+        for n in indexes:
+            username = rows[n]['username']
+            if username in taken or username in seen:
+                results[n].update(status='conflict', error="username already exists")
+            elif rows[n]['circle'] and rows[n]['circle'] not in existing_circles:
+                results[n].update(status='error', error=f"circle {rows[n]['circle']} does not exist")
+            seen.add(username)
+
+    def _hash_passwords(self, passwords, workers):
+        """PBKDF2 dominates an import, so spread it over processes."""
+        if workers <= 1 or len(passwords) < 100:
+            return [_hash(p) for p in tqdm(passwords, desc='passwords', unit='rows')]
+        connections.close_all()  # children must not share the parent's connection
+        with multiprocessing.get_context('fork').Pool(workers) as pool:
+            return list(tqdm(pool.imap(_hash, passwords, chunksize=64), total=len(passwords), desc='passwords', unit='rows'))
+
+    def _insert(self, rows, batch, hashes, risk_level, scoring_version):
+        """One transaction per batch: users, then their wallets, profiles and memberships."""
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(
+                    username=rows[n]['username'], password=password, email=rows[n]['email'],
+                    **{field: rows[n][field] for field in ('phone', 'language') if rows[n][field]},
+                )
+                for n, password in zip(batch, hashes)
+            ])
+            Wallet.objects.bulk_create([Wallet(user=user) for user in users])
+            HealthProfile.objects.bulk_create([
+                HealthProfile(
+                    user=user, full_name=rows[n]['full_name'], gender=rows[n]['gender'],
+                    risk_level=risk_level, scoring_version=scoring_version,
+                )
+                for n, user in zip(batch, users)
+            ])
+            Membership.objects.bulk_create([
+                Membership(user=user, circle_id=rows[n]['circle'])
+                for n, user in zip(batch, users) if rows[n]['circle']
+            ])
+        return users
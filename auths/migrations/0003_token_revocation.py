@@ -0,0 +1,22 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auths', '0002_delete_blacklistedaccesstoken'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('revoked_before', models.BigIntegerField(help_text='Tokens issued (iat) before this Unix time are rejected')),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
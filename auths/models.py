@@ -8,3 +8,17 @@ class CustomUser(AbstractUser):
     def __str__(self):
         return self.username
 
+
+
+class TokenRevocation(models.Model):
+    """
+    Access tokens rejected before they expire: a single token (`auth:revoked:jti:<jti>`) or
+    every token a user was issued before `revoked_before` (`auth:revoked:user:<id>`). The
+    source of truth for auths.authentication, which mirrors these rows in Redis.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    revoked_before = models.BigIntegerField(help_text="Tokens issued (iat) before this Unix time are rejected")
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
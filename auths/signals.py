@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from .authentication import revoke_user_tokens
+from .blacklist import bloom
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def revoke_tokens_of_inactive_user(sender, instance, created, **kwargs):
+    """Claims-authenticated requests never load the user, so deactivation has to revoke its tokens"""
+    if not created and not instance.is_active:
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def add_to_blacklist_filter(sender, instance, created, **kwargs):
+    if created:
+        bloom.add(instance.token.jti, instance.pk)
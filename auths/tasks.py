@@ -0,0 +1,40 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from .blacklist import bloom
+from .models import TokenRevocation
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def prune_expired_tokens(batch_size=None):
+    """
+    Delete expired outstanding refresh tokens (their blacklist rows cascade) in primary-key
+    batches, then rebuild the blacklist Bloom filter so it stops carrying the pruned JTIs.
+    Expired access-token revocations go too.
+    """
+    batch_size = batch_size or settings.TOKEN_PRUNE_BATCH_SIZE
+    now = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            OutstandingToken.objects.filter(expires_at__lt=now).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        OutstandingToken.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+
+    TokenRevocation.objects.filter(expires_at__lt=now).delete()
+    if deleted:
+        bloom.rebuild()
+    logger.info(f"Pruned {deleted} expired refresh tokens")
+    return deleted
+
+
+@shared_task
+def rebuild_blacklist_filter():
+    bloom.rebuild()
@@ -1,3 +1,176 @@
+import csv
+import os
+import tempfile
+from datetime import timedelta
+from unittest import mock
+import fakeredis
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from circles.models import Circle, CircleStats, Membership
+from healthSubs.models import HealthProfile
+from monitoring.testing import QueryBudgetTestCase
+from wallets.models import Wallet
+from .authentication import REVOCATIONS_SYNCED_KEY
+from .blacklist import bloom
+from .models import TokenRevocation
+from .tasks import prune_expired_tokens
+from .views import get_tokens_for_user
 
-# Create your tests here.
+
+class AuthQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_login(self):
+        with self.assertWithinBudget('login'):
+            response = APIClient().post(
+                reverse('login'), {'username': 'budget0', 'password': 'budget-pass'}, format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_changelist(self):
+        self.client.force_login(self.fixtures['admin'])
+        with self.assertWithinBudget('admin:auths_customuser_changelist'):
+            response = self.client.get(reverse('admin:auths_customuser_changelist'))
+        self.assertEqual(response.status_code, 200)
+
+
+class ClaimsAuthenticationTests(QueryBudgetTestCase):
+    """Reads authenticate from token claims; writes, logout and deactivation still behave."""
+
+    def setUp(self):
+        cache.clear()
+        self.redis = fakeredis.FakeRedis()
+        self.redis.set(REVOCATIONS_SYNCED_KEY, 1)
+        patcher = mock.patch('auths.authentication.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = self.fixtures['owner']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {get_tokens_for_user(self.user)['access']}")
+
+    def test_wallet_read_skips_user_query(self):
+        # Same budget as the force_authenticate test: no query for the user row or revocations
+        with self.assertWithinBudget('wallet'):
+            response = self.client.get(reverse('wallet'))
+        self.assertEqual(response.status_code, 200)
+
+    def logout(self):
+        tokens = get_tokens_for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        self.client.cookies['refresh_token'] = tokens['refresh']
+        return self.client.post(reverse('logout'))
+
+    def test_logout_revokes_access_token(self):
+        self.assertEqual(self.logout().status_code, 205)
+        self.assertEqual(self.client.get(reverse('wallet')).status_code, 401)
+
+    def test_revoking_fails_loudly_when_redis_is_down(self):
+        # Refused outright: a row in the table alone would be missed by readers that trust Redis
+        with mock.patch.object(self.redis, 'set', side_effect=RedisConnectionError('down')):
+            self.assertEqual(self.logout().status_code, 400)
+        self.assertFalse(TokenRevocation.objects.exists())
+
+    def test_inactive_claim_rejected(self):
+        self.user.is_active = False
+        token = get_tokens_for_user(self.user)['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        response = self.client.get(reverse('wallet'))
+        self.assertEqual((response.status_code, response.data['detail'].code), (401, 'user_inactive'))
+
+    def test_deactivation_revokes_tokens(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('health-profile')).status_code, 401)
+
+    def test_revocation_checked_in_database_without_redis(self):
+        self.assertEqual(self.logout().status_code, 205)
+        self.assertTrue(TokenRevocation.objects.exists())
+
+        self.redis.flushall()  # e.g. a Redis restart: nothing cached, but the table still answers
+        with mock.patch.object(self.redis, 'mget', side_effect=RedisConnectionError('down')):
+            self.assertEqual(self.client.get(reverse('wallet')).status_code, 401)
+        with mock.patch('auths.authentication.get_redis', return_value=None):
+            self.assertEqual(self.client.get(reverse('wallet')).status_code, 401)
+
+        # Reconnected: the first check resyncs Redis from the table
+        self.assertEqual(self.client.get(reverse('wallet')).status_code, 401)
+        self.assertTrue(self.redis.exists(REVOCATIONS_SYNCED_KEY))
+        self.assertEqual(self.redis.dbsize(), 2)  # the sentinel and the revoked token
+
+
+class TokenBlacklistTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='token-user', password='pass1234')
+        bloom.rebuild()
+
+    def refresh(self, token):
+        client = APIClient()
+        client.cookies['refresh_token'] = token
+        return client.post(reverse('token_refresh'))
+
+    def test_bloom_filter_skips_blacklist_query(self):
+        live, revoked = get_tokens_for_user(self.user), get_tokens_for_user(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {revoked['access']}")
+        client.cookies['refresh_token'] = revoked['refresh']
+        client.post(reverse('logout'))
+
+        self.assertEqual(self.refresh(revoked['refresh']).status_code, 401)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.refresh(live['refresh']).status_code, 200)
+        # Only the filter's catch-up scan (no Redis here), not the per-token blacklist lookup
+        self.assertFalse([q for q in queries if '"jti" =' in q['sql'] or '"jti" IN' in q['sql']])
+
+    def test_prune_expired_tokens(self):
+        get_tokens_for_user(self.user)
+        OutstandingToken.objects.create(
+            user=self.user, jti='expired', token='x', expires_at=timezone.now() - timedelta(days=1),
+        )
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti='expired'))
+
+        self.assertEqual(prune_expired_tokens(batch_size=1), 1)
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+class ImportUsersTests(TestCase):
+
+    def test_import_users(self):
+        owner = get_user_model().objects.create_user(username='taken', password='pass1234')
+        circle = Circle.objects.create(name='Coop', creator=owner, contribution_amount=100)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'users.csv')
+            with open(path, 'w', newline='') as f:
+                f.write(
+                    "username,password,phone,language,full_name,gender\n"
+                    "amina,secret123,+254700000001,Swahili,Amina K,F\n"
+                    "baraka,,+254700000002,,Baraka O,M\n"
+                    "taken,secret123,,,,\n"
+                    "amina,secret123,,,,\n"
+                    "bad name!,secret123,,,,\n"
+                    "chidi,123,,,,\n"
+                )
+            call_command('import_users', path, circle=circle.pk, workers=1, stdout=open(os.devnull, 'w'))
+            with open(f'{path}.results.csv') as f:
+                statuses = [row['status'] for row in csv.DictReader(f)]
+
+        self.assertEqual(statuses, ['created', 'created', 'conflict', 'conflict', 'error', 'error'])
+        amina = get_user_model().objects.get(username='amina')
+        self.assertTrue(amina.check_password('secret123'))
+        self.assertEqual((amina.language, amina.phone), ('Swahili', '+254700000001'))
+        self.assertFalse(get_user_model().objects.get(username='baraka').has_usable_password())
+        self.assertEqual(Wallet.objects.filter(user__username__in=['amina', 'baraka']).count(), 2)
+        self.assertEqual(HealthProfile.objects.get(user=amina).full_name, 'Amina K')
+        self.assertEqual(Membership.objects.filter(circle=circle).count(), 2)
+        self.assertEqual(CircleStats.objects.get(circle=circle).member_count, 2)
+        circle.refresh_from_db()
+        self.assertEqual((circle.member_count, circle.active_member_count), (2, 2))
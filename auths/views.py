@@ -7,6 +7,8 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.exceptions import TokenError
+from .authentication import add_user_claims, revoke_token
+from .blacklist import BloomRefreshToken
 from .serializers import RegisterSerializer, CustomTokenObtainPairSerializer
 from datetime import timedelta
 from django.views.decorators.csrf import ensure_csrf_cookie
@@ -17,7 +19,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 def get_tokens_for_user(user):
-    refresh = RefreshToken.for_user(user)
+    refresh = add_user_claims(RefreshToken.for_user(user), user)
     return {
         'refresh': str(refresh),
         'access': str(refresh.access_token),
@@ -97,7 +99,7 @@ class CustomTokenRefreshView(APIView):
             return Response({"error": "Refresh token not found in cookies"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            token = RefreshToken(refresh_token)
+            token = BloomRefreshToken(refresh_token)
             new_access_token = str(token.access_token)
 
             return Response({"access": new_access_token}, status=status.HTTP_200_OK)
@@ -120,9 +122,9 @@ class LogoutView(APIView):
             )
 
         try:
-            token = RefreshToken(refresh_token)
-            token.check_blacklist()  # Verify token isn't already blacklisted
+            token = BloomRefreshToken(refresh_token)  # raises TokenError if already blacklisted
             token.blacklist()
+            revoke_token(request.auth)  # the access token would otherwise live until it expires
             
             response = Response(
                 {"message": "Logged out successfully"},
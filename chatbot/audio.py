@@ -0,0 +1,70 @@
+import hashlib
+import logging
+import shutil
+import subprocess
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TRIM_START = "silenceremove=start_periods=1:start_threshold=-50dB"
+
+
+def read_audio(audio_file):
+    """
+    The audio (for in-memory files such as MediaBuffer, a memoryview of the buffer rather
+    than a copy) and a filename Whisper can infer the format from.
+    """
+    if hasattr(audio_file, "getbuffer"):
+        data = audio_file.getbuffer()
+    else:
+        audio_file.seek(0)
+        data = audio_file.read()
+    name = getattr(audio_file, "name", None) or "audio.mp3"
+    return data, name
+
+
+def audio_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def upload_source(audio_file, data):
+    """What to send Whisper: bytes as is; a view is replaced by its file, read in place."""
+    if isinstance(data, memoryview):
+        audio_file.seek(0)
+        return audio_file
+    return data
+
+
+def normalize_audio(data, name):
+    """
+    Downmix to mono, resample to AUDIO_SAMPLE_RATE, trim leading/trailing silence and
+    re-encode as low-bitrate Opus. Needs ffmpeg on PATH; otherwise (or if ffmpeg fails)
+    the original bytes are returned unchanged.
+    """
+    if not settings.AUDIO_NORMALIZE:
+        return data, name
+
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        logger.warning("AUDIO_NORMALIZE is on but ffmpeg is not installed; sending audio as-is")
+        return data, name
+
+    command = [
+        ffmpeg, "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-ac", "1",
+        "-ar", str(settings.AUDIO_SAMPLE_RATE),
+        # Trim leading silence, then (reversed) trailing silence; pauses inside speech are kept
+        "-af", f"{TRIM_START},areverse,{TRIM_START},areverse",
+        "-c:a", "libopus", "-b:a", "24k",
+        "-f", "ogg", "pipe:1",
+    ]
+    try:
+        result = subprocess.run(command, input=data, capture_output=True, timeout=30, check=True)
+    except (subprocess.SubprocessError, OSError) as e:
+        logger.warning(f"Audio normalization failed, sending original: {str(e)}")
+        return data, name
+
+    if not result.stdout or len(result.stdout) >= len(data):
+        return data, name
+    return result.stdout, "audio.ogg"
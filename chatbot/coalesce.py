@@ -0,0 +1,127 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from django.conf import settings
+from redis.exceptions import RedisError
+from HealthBackEnd.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Delete the lock only if it still holds our token; after a slow compute it may have
+# expired and been taken by another process's leader.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def prompt_key(namespace, prompt):
+    """Same question, different casing/spacing/trailing punctuation -> same key."""
+    normalized = re.sub(r"\s+", " ", prompt.strip().lower()).rstrip("?!. ")
+    return f"{namespace}:{hashlib.sha256(normalized.encode('utf-8')).hexdigest()}"
+
+
+def single_flight(key, compute):
+    """
+    Run `compute` once for all concurrent callers with the same key.
+
+    Threads in this process wait on the leader's Future; other processes wait on a Redis
+    lock + pub/sub message from whichever process holds the lock. Waiters that time out,
+    or whose leader dies, fall back to calling `compute` themselves. `compute` must return
+    something JSON-serializable.
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _inflight[key] = future
+
+    if not is_leader:
+        try:
+            return future.result(timeout=settings.COALESCE_TIMEOUT)
+        except FutureTimeout:
+            logger.warning(f"Coalesced request {key} timed out waiting for leader")
+            return compute()
+
+    try:
+        result = _across_processes(key, compute)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+def _across_processes(key, compute):
+    client = get_redis()
+    if client is None:
+        return compute()
+
+    lock_key = f"sf:lock:{key}"
+    result_key = f"sf:result:{key}"
+    channel = f"sf:done:{key}"
+    timeout = settings.COALESCE_TIMEOUT
+
+    token = uuid.uuid4().hex
+    try:
+        is_leader = client.set(lock_key, token, nx=True, px=int(timeout * 1000))
+    except RedisError as e:
+        logger.warning(f"Coalescing unavailable: {str(e)}")
+        return compute()
+
+    if is_leader:
+        try:
+            result = compute()
+            payload = json.dumps(result)
+            try:
+                # Kept briefly for followers that subscribe after the publish
+                client.set(result_key, payload, px=int(settings.COALESCE_RESULT_TTL * 1000))
+                client.publish(channel, payload)
+            except RedisError as e:
+                logger.warning(f"Could not publish coalesced result for {key}: {str(e)}")
+            return result
+        finally:
+            try:
+                client.eval(RELEASE_SCRIPT, 1, lock_key, token)
+            except RedisError:
+                pass
+
+    try:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(channel)
+        try:
+            cached = client.get(result_key)
+            if cached is not None:
+                return json.loads(cached)
+
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                message = pubsub.get_message(timeout=0.5)
+                if message and message["type"] == "message":
+                    return json.loads(message["data"])
+                if not client.exists(lock_key):
+                    # Leader finished (or died) without us seeing the message
+                    cached = client.get(result_key)
+                    if cached is not None:
+                        return json.loads(cached)
+                    break
+        finally:
+            pubsub.close()
+    except RedisError as e:
+        logger.warning(f"Lost coalesced result for {key}: {str(e)}")
+
+    return compute()
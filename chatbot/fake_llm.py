@@ -0,0 +1,142 @@
+"""
+Deterministic stand-in for the OpenAI client, for load tests and offline development.
+
+Enable with LLM_BACKEND=chatbot.fake_llm.FakeLLMClient. It exposes the same
+`chat.completions.create` / `audio.transcriptions.create` surface the app uses.
+"""
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from types import SimpleNamespace
+import httpx
+import openai
+from django.conf import settings
+
+FAKE_URL = "https://fake-llm.local/v1"
+
+
+def parse_latency(spec):
+    """'fixed:200', 'uniform:100:500' or 'lognormal:<median ms>:<sigma>' -> sampler(rng) in seconds."""
+    kind, *params = spec.split(':')
+    params = [float(p) for p in params]
+    if kind == 'fixed':
+        return lambda rng: params[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(params[0], params[1]) / 1000
+    if kind == 'lognormal':
+        mu = math.log(params[0])
+        return lambda rng: rng.lognormvariate(mu, params[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def _user_text(messages):
+    for message in reversed(messages):
+        if message["role"] != "user":
+            continue
+        if isinstance(message["content"], str):
+            return message["content"]
+        return " ".join(part.get("text", "") for part in message["content"] if part.get("type") == "text")
+    return ""
+
+
+class _Completions:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, model, messages, response_format=None, **kwargs):
+        self.backend.simulate("/chat/completions")
+
+        digest = _digest([model, messages])
+        system = " ".join(m["content"] for m in messages if m["role"] == "system" and isinstance(m["content"], str))
+        prompt = _user_text(messages)
+
+        if response_format and response_format.get("type") == "json_object":
+            if "medical claim" in system:
+                payload = {
+                    "valid": True,
+                    "reason": "Fake backend approves every claim",
+                    "amount_match": True,
+                    "date_valid": True,
+                }
+            else:
+                payload = {"text": f"[fake {model} {digest[:8]}] {prompt[:120]}", "links": []}
+            content = json.dumps(payload)
+        else:
+            content = f"[fake {model} {digest[:8]}] {prompt[:120]}"
+
+        prompt_tokens = len(json.dumps(messages, default=str)) // 4
+        completion_tokens = len(content) // 4
+        return SimpleNamespace(
+            id=f"chatcmpl-fake-{digest[:12]}",
+            model=model,
+            choices=[SimpleNamespace(index=0, finish_reason="stop",
+                                     message=SimpleNamespace(role="assistant", content=content))],
+            usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                  total_tokens=prompt_tokens + completion_tokens),
+        )
+
+
+def _upload_bytes(file):
+    """Content of an upload in any form the SDK takes: bytes, a file, or a (name, bytes or file, ...) tuple."""
+    content = file[1] if isinstance(file, tuple) else file
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        return bytes(content)
+    if hasattr(content, 'getvalue'):  # BytesIO, e.g. chatbot.media.MediaBuffer
+        return content.getvalue()
+    return content.read()
+
+
+class _Transcriptions:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, file, model, response_format=None, **kwargs):
+        self.backend.simulate("/audio/transcriptions")
+        data = _upload_bytes(file)
+        digest = hashlib.sha256(data).hexdigest()
+        text = f"fake transcript {digest[:8]}"
+        if response_format == "text":
+            return text
+        return SimpleNamespace(text=text, language="english", duration=round(len(data) / 4000, 2))
+
+
+class FakeLLMClient:
+    """
+    Latency, rate-limit errors and timeouts are drawn from one seeded RNG, so a run with
+    the same LLM_FAKE_SEED and request order is reproducible. Response text depends only
+    on the request.
+    """
+
+    def __init__(self):
+        self.sample_latency = parse_latency(settings.LLM_FAKE_LATENCY)
+        self.rate_limit_rate = settings.LLM_FAKE_RATE_LIMIT_RATE
+        self.timeout_rate = settings.LLM_FAKE_TIMEOUT_RATE
+        self.timeout_seconds = settings.LLM_FAKE_TIMEOUT_SECONDS
+        self._rng = random.Random(settings.LLM_FAKE_SEED)
+        self._rng_lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self))
+        self.audio = SimpleNamespace(transcriptions=_Transcriptions(self))
+
+    def simulate(self, path):
+        with self._rng_lock:
+            latency = self.sample_latency(self._rng)
+            roll = self._rng.random()
+
+        request = httpx.Request("POST", f"{FAKE_URL}{path}")
+        if roll < self.timeout_rate:
+            time.sleep(self.timeout_seconds)
+            raise openai.APITimeoutError(request=request)
+        time.sleep(latency)
+        if roll < self.timeout_rate + self.rate_limit_rate:
+            raise openai.RateLimitError(
+                "Rate limit reached (fake backend)",
+                response=httpx.Response(429, request=request),
+                body=None,
+            )
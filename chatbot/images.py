@@ -0,0 +1,106 @@
+import base64
+import hashlib
+import io
+import logging
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+
+
+def _read_source(image_file):
+    """The image bytes; for in-memory files (MediaBuffer) a view of the buffer, not a copy."""
+    if hasattr(image_file, "getbuffer"):
+        return image_file.getbuffer()
+    image_file.seek(0)
+    return image_file.read()
+
+
+class _ViewReader(io.RawIOBase):
+    """Seekable file over a memoryview, so Pillow decodes the buffer in place."""
+
+    def __init__(self, view):
+        super().__init__()
+        self.view = memoryview(view).cast('B')
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = max(0, min(len(b), len(self.view) - self.pos))
+        b[:n] = self.view[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        self.pos = max(0, (offset, self.pos + offset, len(self.view) + offset)[whence])
+        return self.pos
+
+    def tell(self):
+        return self.pos
+
+
+def _open_source(source):
+    # BytesIO(bytes) shares the bytes object until written to; a memoryview would be copied
+    return io.BytesIO(source) if isinstance(source, bytes) else io.BufferedReader(_ViewReader(source))
+
+
+def preprocess_image(source, max_dimension=None):
+    """
+    Auto-orient, downscale and re-encode an image for vision calls. EXIF is dropped.
+
+    `source` is bytes or a memoryview (read in place). Returns (bytes, content_type).
+    Results are cached by the source's sha256, so the same photo forwarded again is only
+    processed once. Anything Pillow can't open is passed through untouched.
+    """
+    max_dimension = max_dimension or settings.IMAGE_MAX_DIMENSION
+    image_format = settings.IMAGE_FORMAT
+    quality = settings.IMAGE_QUALITY
+
+    digest = hashlib.sha256(source).hexdigest()
+    cache_key = f"image:{digest}:{max_dimension}:{image_format}:{quality}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        with Image.open(_open_source(source)) as img:
+            # Let the JPEG decoder skip detail we'd throw away anyway
+            img.draft('RGB', (max_dimension, max_dimension))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            output = io.BytesIO()
+            save_kwargs = {'quality': quality, 'optimize': True}
+            if image_format == 'JPEG':
+                save_kwargs['progressive'] = True
+            img.save(output, format=image_format, **save_kwargs)
+    except (UnidentifiedImageError, OSError) as e:
+        logger.warning(f"Image preprocessing skipped: {str(e)}")
+        return source, None
+
+    result = (output.getvalue(), CONTENT_TYPES[image_format])
+    cache.set(cache_key, result, settings.IMAGE_CACHE_TIMEOUT)
+    return result
+
+
+def encode_image(image_file, max_dimension=None):
+    """Base64 data URL of the preprocessed image, ready for an `image_url` message part."""
+    data, content_type = preprocess_image(_read_source(image_file), max_dimension)
+    content_type = content_type or getattr(image_file, "content_type", None) or "image/jpeg"
+    return f"data:{content_type};base64,{base64.b64encode(data).decode('utf-8')}"
@@ -0,0 +1,128 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+import openai
+from openai import OpenAI
+from django.conf import settings
+from django.utils.module_loading import import_string
+from HealthBackEnd.ratelimit import upstream_slot
+from monitoring.instrumentation import record_llm_call
+from monitoring.metrics import observe_llm_call
+from .routing import escalate
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+# Upstream failures worth retrying once on the standard tier when the fast model hits them
+FALLBACK_ERRORS = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+_stats_lock = threading.Lock()
+_tier_stats = defaultdict(lambda: {
+    'calls': 0, 'errors': 0, 'latency_ms': 0.0, 'prompt_tokens': 0, 'completion_tokens': 0,
+})
+
+
+def openai_client():
+    return OpenAI(api_key=settings.OPENAI_API_KEY)
+
+
+def get_client():
+    """Shared client built from LLM_BACKEND on first use (real OpenAI or chatbot.fake_llm)."""
+    global _client
+    if _client is None:
+        _client = import_string(settings.LLM_BACKEND)()
+    return _client
+
+
+def chat_completion(messages, route, client=None, **kwargs):
+    """
+    Run a chat completion on the model chosen by `route` and record latency/token usage
+    for its tier. A fast-tier timeout, rate limit or server error falls back to the
+    standard tier once. Pass `client` to run against a fake backend.
+    """
+    return _complete_with_fallback(messages, route, client or get_client(), **kwargs)[0]
+
+
+def json_completion(messages, route, client=None, **kwargs):
+    """
+    chat_completion in JSON mode, returning the parsed object. A fast-tier reply that
+    isn't a JSON object is escalated to the standard tier once.
+    """
+    client = client or get_client()
+    kwargs['response_format'] = {"type": "json_object"}
+    response, used = _complete_with_fallback(messages, route, client, **kwargs)
+    try:
+        return _json_object(response)
+    except ValueError:
+        escalated = escalate(used, 'fast tier returned invalid JSON')
+        if escalated is None:
+            raise
+        logger.warning(f"Escalating {used.model} reply to {escalated.model}: invalid JSON")
+        return _json_object(_complete(messages, escalated, client, **kwargs))
+
+
+def _json_object(response):
+    result = json.loads(response.choices[0].message.content or '')
+    if not isinstance(result, dict):
+        raise ValueError("Expected a JSON object")
+    return result
+
+
+def _complete_with_fallback(messages, route, client, **kwargs):
+    """(response, route that produced it)."""
+    try:
+        return _complete(messages, route, client, **kwargs), route
+    except FALLBACK_ERRORS as e:
+        fallback = escalate(route, f'fast tier failed: {type(e).__name__}')
+        if fallback is None:
+            raise
+        logger.warning(f"Falling back from {route.model} to {fallback.model}: {type(e).__name__}")
+        return _complete(messages, fallback, client, **kwargs), fallback
+
+
+def _complete(messages, route, client, **kwargs):
+    start = time.perf_counter()
+    try:
+        with upstream_slot():
+            response = client.chat.completions.create(model=route.model, messages=messages, **kwargs)
+    except Exception:
+        latency_ms = (time.perf_counter() - start) * 1000
+        _record(route, latency_ms, error=True)
+        record_llm_call(latency_ms)
+        raise
+
+    latency_ms = (time.perf_counter() - start) * 1000
+    _record(route, latency_ms, usage=getattr(response, 'usage', None))
+    record_llm_call(latency_ms)
+    return response
+
+
+def _record(route, latency_ms, usage=None, error=False):
+    observe_llm_call(route.model, route.tier, latency_ms / 1000, usage=usage, error=error)
+    prompt_tokens = getattr(usage, 'prompt_tokens', 0) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', 0) or 0
+    with _stats_lock:
+        stats = _tier_stats[route.tier]
+        stats['calls'] += 1
+        stats['errors'] += int(error)
+        stats['latency_ms'] += latency_ms
+        stats['prompt_tokens'] += prompt_tokens
+        stats['completion_tokens'] += completion_tokens
+
+    logger.info(
+        "llm_call",
+        extra={
+            "tier": route.tier, "model": route.model, "route_reason": route.reason,
+            "latency_ms": round(latency_ms, 1), "error": error,
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+        },
+    )
+
+
+def tier_stats():
+    """Snapshot of per-tier counters for this process."""
+    with _stats_lock:
+        return {tier: dict(stats) for tier, stats in _tier_stats.items()}
@@ -0,0 +1,85 @@
+import base64
+import statistics
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from chatbot.images import preprocess_image
+from chatbot.llm import get_client
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.heic'}
+
+
+class Command(BaseCommand):
+    help = "Measure bytes saved and latency of image preprocessing before vision calls"
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="Image files or directories of images")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per image")
+        parser.add_argument('--max-dimension', type=int, default=None)
+        parser.add_argument(
+            '--live', action='store_true',
+            help="Also send raw and processed versions to the vision model and time the round trip"
+        )
+
+    def handle(self, *args, **options):
+        files = []
+        for raw_path in options['paths']:
+            path = Path(raw_path)
+            if path.is_dir():
+                files.extend(sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES))
+            elif path.is_file():
+                files.append(path)
+        if not files:
+            raise CommandError("No images found")
+
+        total_raw = total_processed = 0
+        for path in files:
+            source = path.read_bytes()
+
+            timings = []
+            for _ in range(options['repeat']):
+                cache.clear()
+                start = time.perf_counter()
+                processed, content_type = preprocess_image(source, options['max_dimension'])
+                timings.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            preprocess_image(source, options['max_dimension'])
+            cached_ms = (time.perf_counter() - start) * 1000
+
+            total_raw += len(source)
+            total_processed += len(processed)
+            saved = 100 * (1 - len(processed) / len(source))
+            self.stdout.write(
+                f"{path.name}: {len(source):,} B -> {len(processed):,} B ({saved:.1f}% saved), "
+                f"base64 {len(base64.b64encode(source)):,} -> {len(base64.b64encode(processed)):,} B, "
+                f"preprocess median {statistics.median(timings):.1f} ms, cached {cached_ms:.2f} ms"
+            )
+
+            if options['live']:
+                raw_ms, raw_tokens = self._vision_call(source, 'image/jpeg')
+                new_ms, new_tokens = self._vision_call(processed, content_type or 'image/jpeg')
+                self.stdout.write(
+                    f"    vision round trip {raw_ms:.0f} ms -> {new_ms:.0f} ms, "
+                    f"prompt tokens {raw_tokens} -> {new_tokens}"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(files)} image(s): {total_raw:,} B -> {total_processed:,} B "
+            f"({100 * (1 - total_processed / total_raw):.1f}% saved)"
+        ))
+
+    def _vision_call(self, data, content_type):
+        image_url = f"data:{content_type};base64,{base64.b64encode(data).decode('utf-8')}"
+        start = time.perf_counter()
+        response = get_client().chat.completions.create(
+            model=settings.LLM_MODEL_TIERS['vision'],
+            messages=[{"role": "user", "content": [
+                {"type": "text", "text": "Describe this image in one sentence."},
+                {"type": "image_url", "image_url": image_url},
+            ]}],
+            max_tokens=50,
+        )
+        return (time.perf_counter() - start) * 1000, response.usage.prompt_tokens
@@ -0,0 +1,131 @@
+import io
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from monitoring.instrumentation import track_http
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# (offset, magic bytes, content type, extension)
+SIGNATURES = [
+    (0, b'\xff\xd8\xff', 'image/jpeg', 'jpg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png', 'png'),
+    (0, b'GIF87a', 'image/gif', 'gif'),
+    (0, b'GIF89a', 'image/gif', 'gif'),
+    (0, b'OggS', 'audio/ogg', 'ogg'),
+    (0, b'#!AMR', 'audio/amr', 'amr'),
+    (0, b'ID3', 'audio/mpeg', 'mp3'),
+    (0, b'\xff\xfb', 'audio/mpeg', 'mp3'),
+    (0, b'\xff\xf3', 'audio/mpeg', 'mp3'),
+    (0, b'\xff\xf2', 'audio/mpeg', 'mp3'),
+    (4, b'ftyp', 'audio/mp4', 'm4a'),
+]
+
+
+class MediaError(Exception):
+    pass
+
+
+class MediaTooLarge(MediaError):
+    pass
+
+
+class UnsupportedMedia(MediaError):
+    pass
+
+
+class MediaBuffer(io.BytesIO):
+    """The downloaded attachment. Passed as-is to Whisper (needs `name`) and to vision."""
+
+    def __init__(self, content_type, extension):
+        super().__init__()
+        self.content_type = content_type
+        self.name = f"media.{extension}"
+
+    @property
+    def kind(self):
+        return self.content_type.split('/')[0]
+
+
+def sniff_content_type(head):
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp', 'webp'
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return 'audio/wav', 'wav'
+    for offset, magic, content_type, extension in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return content_type, extension
+    return None, None
+
+
+_session = None
+
+
+def get_session():
+    """Pooled session reused across downloads; authenticates when Twilio media auth is on."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[502, 503, 504], allowed_methods=['GET'])
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=settings.TWILIO_MEDIA_POOL_SIZE, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        if settings.TWILIO_ACCOUNT_SID and settings.TWILIO_AUTH_TOKEN:
+            session.auth = (settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+        _session = session
+    return _session
+
+
+def fetch_media(url, declared_type=None):
+    """
+    Stream a media attachment into a single MediaBuffer.
+
+    Stops as soon as the body passes TWILIO_MEDIA_MAX_BYTES or the first bytes don't look
+    like a supported image/audio format, so memory per download never exceeds the cap.
+    """
+    max_bytes = settings.TWILIO_MEDIA_MAX_BYTES
+
+    with track_http(), get_session().get(url, stream=True, timeout=(3.05, 10)) as response:
+        response.raise_for_status()
+
+        content_length = response.headers.get('Content-Length')
+        if content_length and int(content_length) > max_bytes:
+            raise MediaTooLarge(f"Media is {content_length} bytes (limit {max_bytes})")
+
+        buffer = None
+        head = b''
+        size = 0
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise MediaTooLarge(f"Media exceeds {max_bytes} bytes")
+
+            if buffer is None:
+                head += chunk
+                if len(head) < 16:
+                    continue
+                content_type, extension = sniff_content_type(head)
+                if content_type is None:
+                    raise UnsupportedMedia(f"Unrecognised media (declared {declared_type})")
+                buffer = MediaBuffer(content_type, extension)
+                buffer.write(head)
+                head = b''
+            else:
+                buffer.write(chunk)
+
+        if buffer is None:
+            content_type, extension = sniff_content_type(head)
+            if content_type is None:
+                raise UnsupportedMedia(f"Unrecognised media (declared {declared_type})")
+            buffer = MediaBuffer(content_type, extension)
+            buffer.write(head)
+
+    if declared_type and declared_type.split('/')[0] != buffer.kind:
+        logger.warning(f"Media declared as {declared_type} but looks like {buffer.content_type}")
+
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,63 @@
+import logging
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from monitoring.instrumentation import track_http
+
+logger = logging.getLogger(__name__)
+
+TWILIO_MESSAGES_URL = "https://api.twilio.com/2010-04-01/Accounts/{sid}/Messages.json"
+
+# Messages captured by LocmemBackend (mirrors django.core.mail.outbox)
+outbox = []
+
+
+class BaseBackend:
+    def send(self, to, from_, body):
+        raise NotImplementedError
+
+
+class TwilioBackend(BaseBackend):
+    """Sends messages through the Twilio REST API."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.auth = (settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+
+    def send(self, to, from_, body):
+        with track_http():
+            response = self.session.post(
+                TWILIO_MESSAGES_URL.format(sid=settings.TWILIO_ACCOUNT_SID),
+                data={"To": to, "From": from_, "Body": body},
+                timeout=10,
+            )
+        response.raise_for_status()
+        return response.json().get("sid")
+
+
+class LocmemBackend(BaseBackend):
+    """Keeps messages in `outbox` instead of sending them. For tests and local runs."""
+
+    def send(self, to, from_, body):
+        outbox.append({"to": to, "from": from_, "body": body})
+        return f"LOCAL{len(outbox)}"
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.TWILIO_MESSAGING_BACKEND)()
+    return _backend
+
+
+def send_reply(to, from_, text, links=None):
+    """Send the answer followed by one message per link (same layout the TwiML reply used)."""
+    backend = get_backend()
+    sids = [backend.send(to, from_, text)]
+    for link in links or []:
+        sids.append(backend.send(to, from_, link))
+    logger.info(f"Sent {len(sids)} message(s) to {to}")
+    return sids
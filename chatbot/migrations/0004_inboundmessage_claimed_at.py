@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot', '0003_transcript'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inboundmessage',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
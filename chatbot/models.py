@@ -13,4 +13,42 @@ class Conversation(models.Model):
         ordering = ["-created_at"]
 
     def __str__(self):
-        return f"{self.user.email} - {self.created_at}"
\ No newline at end of file
+        return f"{self.user.email} - {self.created_at}"
+
+class InboundMessage(models.Model):
+    """WhatsApp message received through the Twilio webhook, answered asynchronously."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('replied', 'Replied'),
+        ('failed', 'Failed'),
+    ]
+
+    message_sid = models.CharField(max_length=64, unique=True)
+    from_number = models.CharField(max_length=32, db_index=True)
+    to_number = models.CharField(max_length=32)
+    body = models.TextField(blank=True)
+    media_url = models.URLField(max_length=500, blank=True)
+    media_type = models.CharField(max_length=100, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # when a worker started answering it
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.from_number} - {self.message_sid} ({self.status})"
+
+
+class Transcript(models.Model):
+    """Whisper output keyed by the sha256 of the original audio bytes (forwarded voice notes repeat)."""
+    audio_hash = models.CharField(max_length=64, unique=True)
+    text = models.TextField()
+    language = models.CharField(max_length=32, blank=True)
+    duration_seconds = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.audio_hash[:12]} ({self.duration_seconds}s)"
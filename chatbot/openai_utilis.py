@@ -1,20 +1,65 @@
 import json
-from openai import OpenAI
-import base64
-from django.conf import settings
-
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+import logging
+import time
+from HealthBackEnd.ratelimit import RateLimited, upstream_slot
+from monitoring.instrumentation import record_llm_call
+from monitoring.metrics import observe_llm_call
+from .audio import audio_hash, normalize_audio, read_audio, upload_source
+from .coalesce import prompt_key, single_flight
+from .images import encode_image
+from .llm import get_client, json_completion
+from .models import Transcript
+from .routing import route_request
+
+logger = logging.getLogger(__name__)
 
 def transcribe_audio(audio_file):
-    """Convert audio to text using Whisper."""
+    """Convert audio to text using Whisper. Repeated voice notes are served from Transcript."""
     try:
-        transcript = client.audio.transcriptions.create(
-            file=audio_file,
-            model="whisper-1",
-            response_format="text"
+        data, name = read_audio(audio_file)
+        digest = audio_hash(data)
+
+        lookup_start = time.perf_counter()
+        cached = Transcript.objects.filter(audio_hash=digest).values_list("text", flat=True).first()
+        if cached is not None:
+            logger.info(
+                "transcription",
+                extra={"cache_hit": True, "audio_bytes": len(data),
+                       "latency_ms": round((time.perf_counter() - lookup_start) * 1000, 1)},
+            )
+            return cached
+
+        upload, upload_name = normalize_audio(data, name)
+        upload_bytes = len(upload)
+        with upstream_slot():
+            start = time.perf_counter()  # the Whisper call only, not the lookup or normalization
+            transcript = get_client().audio.transcriptions.create(
+                file=(upload_name, upload_source(audio_file, upload)),
+                model="whisper-1",
+                response_format="verbose_json"
+            )
+        latency_ms = round((time.perf_counter() - start) * 1000, 1)
+        record_llm_call(latency_ms)
+        observe_llm_call("whisper-1", "transcription", latency_ms / 1000)
+        logger.info(
+            "transcription",
+            extra={"cache_hit": False, "audio_bytes": len(data), "upload_bytes": upload_bytes,
+                   "audio_seconds": transcript.duration, "latency_ms": latency_ms},
+        )
+
+        Transcript.objects.get_or_create(
+            audio_hash=digest,
+            defaults={
+                "text": transcript.text,
+                "language": transcript.language or "",
+                "duration_seconds": transcript.duration,
+            },
         )
-        return transcript
+        return transcript.text
+    except RateLimited:
+        raise
     except Exception as e:
+        logger.error(f"Transcription failed: {str(e)}")
         return None
 
 def generate_health_response(user_data, prompt=None, image_file=None, audio_file=None):
@@ -76,35 +121,25 @@ def generate_health_response(user_data, prompt=None, image_file=None, audio_file
         messages.append({"role": "user", "content": prompt})
     
     if image_file:
-        base64_image = base64.b64encode(image_file.read()).decode('utf-8')
         messages.append({
             "role": "user",
             "content": [{
                 "type": "image_url",
-                "image_url": f"data:image/jpeg;base64,{base64_image}"
+                "image_url": encode_image(image_file)
             }]
         })
 
-    # 5. Call OpenAI
+    # 5. Call OpenAI on the tier picked by the router
+    route = route_request(prompt, has_image=bool(image_file), personalized=True)
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=messages,
-            response_format={"type": "json_object"},
-            temperature=0.3
-        )
-        ai_response = json.loads(response.choices[0].message.content)
+        ai_response = json_completion(messages, route, temperature=0.3)
         return {"text": ai_response.get("text", "No response generated")} | ai_response
+    except RateLimited:
+        raise
     except Exception as e:
         return {"text": f"Error: {str(e)}"}
     
 def generate_basic_health_response(prompt=None, image_file=None, audio_file=None):
-    from openai import OpenAI
-    import base64
-    import json
-
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
     if audio_file:
         prompt = transcribe_audio(audio_file)
         if not prompt:
@@ -126,23 +161,26 @@ def generate_basic_health_response(prompt=None, image_file=None, audio_file=None
         messages.append({"role": "user", "content": prompt})
 
     if image_file:
-        base64_image = base64.b64encode(image_file.read()).decode('utf-8')
         messages.append({
             "role": "user",
             "content": [{
                 "type": "image_url",
-                "image_url": f"data:image/jpeg;base64,{base64_image}"
+                "image_url": encode_image(image_file)
             }]
         })
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=messages,
-            response_format={"type": "json_object"},
-            temperature=0.4
-        )
-        ai_response = json.loads(response.choices[0].message.content)
-        return {"text": ai_response.get("text", "No response generated")} | ai_response
-    except Exception as e:
-        return {"text": f"Error: {str(e)}"}
+    route = route_request(prompt, has_image=bool(image_file))
+
+    def complete():
+        try:
+            ai_response = json_completion(messages, route, temperature=0.4)
+            return {"text": ai_response.get("text", "No response generated")} | ai_response
+        except RateLimited:
+            raise
+        except Exception as e:
+            return {"text": f"Error: {str(e)}"}
+
+    if image_file or not prompt:
+        return complete()
+    # Identical questions arriving together (same text, no image) share one upstream call
+    return single_flight(prompt_key("basic", prompt), complete)
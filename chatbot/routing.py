@@ -0,0 +1,65 @@
+import re
+from collections import namedtuple
+from django.conf import settings
+
+Route = namedtuple('Route', ['tier', 'model', 'reason'])
+
+ENGLISH_STOPWORDS = {
+    'the', 'a', 'an', 'is', 'are', 'was', 'i', 'my', 'me', 'you', 'it', 'what', 'how', 'why',
+    'can', 'do', 'does', 'should', 'have', 'has', 'and', 'or', 'of', 'to', 'in', 'for', 'with',
+    'on', 'this', 'that', 'when', 'which', 'who', 'not', 'be', 'get', 'if', 'after', 'before',
+}
+
+
+def detect_language(text):
+    """Cheap local guess: 'en' or 'other'. Good enough to keep non-English text off the small tier."""
+    if not text:
+        return 'en'
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    if non_ascii / len(text) > 0.1:
+        return 'other'
+    words = re.findall(r"[a-z']+", text.lower())
+    if not words:
+        return 'en'
+    hits = sum(1 for word in words if word in ENGLISH_STOPWORDS)
+    return 'en' if hits / len(words) >= 0.15 or (len(words) <= 3 and hits) else 'other'
+
+
+def classify_request(prompt=None, has_image=False, personalized=False, kind='chat'):
+    """Features the router looks at. Computed locally, no API calls."""
+    prompt = prompt or ''
+    return {
+        'kind': kind,
+        'modality': 'image' if has_image else 'text',
+        'prompt_chars': len(prompt),
+        'language': detect_language(prompt),
+        'personalized': personalized,
+    }
+
+
+def route_request(prompt=None, has_image=False, personalized=False, kind='chat'):
+    """Pick a model tier from LLM_MODEL_TIERS for this request."""
+    features = classify_request(prompt, has_image, personalized, kind)
+    tiers = settings.LLM_MODEL_TIERS
+
+    if features['modality'] == 'image':
+        tier, reason = 'vision', 'image attached'
+    elif features['kind'] == 'claim':
+        tier, reason = 'standard', 'claim validation'
+    elif features['personalized']:
+        tier, reason = 'standard', 'uses health profile'
+    elif features['language'] != 'en':
+        tier, reason = 'standard', 'non-English prompt'
+    elif features['prompt_chars'] > settings.LLM_FAST_MAX_PROMPT_CHARS:
+        tier, reason = 'standard', 'long prompt'
+    else:
+        tier, reason = 'fast', 'short text question'
+
+    return Route(tier, tiers[tier], reason)
+
+
+def escalate(route, reason):
+    """The standard-tier Route to retry a fast-tier request on, or None if `route` isn't fast."""
+    if route.tier != 'fast':
+        return None
+    return Route('standard', settings.LLM_MODEL_TIERS['standard'], reason)
@@ -0,0 +1,148 @@
+from datetime import timedelta
+from celery import shared_task
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+from redis.exceptions import LockError
+from HealthBackEnd.ratelimit import RateLimited, admit_llm_request, estimate_tokens
+from HealthBackEnd.redis_client import get_redis
+from .models import InboundMessage
+from .media import fetch_media
+from .messaging import send_reply
+from .openai_utilis import generate_basic_health_response
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _sender_lock(from_number):
+    client = get_redis()
+    if client is None:
+        return None
+    return client.lock(f"twilio:sender:{from_number}", timeout=settings.TWILIO_SENDER_LOCK_TIMEOUT)
+
+
+def _still_owner(lock):
+    """Extend the sender lock for the next message; False if it expired and may be someone else's."""
+    if lock is None:
+        return True
+    try:
+        lock.reacquire()
+    except LockError:
+        return False
+    return True
+
+
+@shared_task(bind=True, max_retries=60)
+def process_inbound_message(self, message_id):
+    """Answer a WhatsApp message, keeping replies in the order each sender wrote them."""
+    message = InboundMessage.objects.filter(id=message_id).first()
+    if message is None or message.status != 'pending':
+        return
+
+    lock = _sender_lock(message.from_number)
+    if lock is not None and not lock.acquire(blocking=False):
+        # Another worker is answering this sender; it will pick this message up or we retry.
+        raise self.retry(countdown=2)
+
+    try:
+        # Answer anything older from the same sender first so replies never overtake each other.
+        pending = InboundMessage.objects.filter(
+            from_number=message.from_number,
+            status='pending',
+            id__lte=message.id,
+        ).order_by('id')
+        for inbound in pending:
+            if not _still_owner(lock):
+                # Another worker may be answering this sender now; let it keep the order
+                logger.warning(f"Lost sender lock for {message.from_number}; retrying message {message.id}")
+                lock = None
+                raise self.retry(countdown=2)
+            answer_message(inbound)
+    except RateLimited as e:
+        # Stay queued; the message is still pending and keeps its place in line
+        raise self.retry(countdown=e.wait)
+    finally:
+        if lock is not None:
+            try:
+                lock.release()
+            except LockError:
+                logger.warning(f"Sender lock for {message.from_number} expired before release")
+
+
+def answer_message(message):
+    admit_llm_request(
+        phone=message.from_number,
+        tokens=estimate_tokens(message.body, has_image=message.media_type.startswith("image")),
+    )
+
+    # Claim the message so a concurrent worker can't answer it twice
+    claimed = InboundMessage.objects.filter(id=message.id, status='pending').update(
+        status='processing', claimed_at=timezone.now(),
+    )
+    if not claimed:
+        return
+
+    try:
+        prompt = message.body.strip() or None
+        image_file = None
+        audio_file = None
+
+        if message.media_url and message.media_type:
+            try:
+                logger.info(f"Processing media: {message.media_url} ({message.media_type})")
+                media = fetch_media(message.media_url, message.media_type)
+                if media.kind == "image":
+                    image_file = media
+                elif media.kind == "audio":
+                    audio_file = media
+            except Exception as media_error:
+                logger.error(f"Media processing failed: {str(media_error)}")
+
+        response_data = generate_basic_health_response(
+            prompt=prompt,
+            image_file=image_file,
+            audio_file=audio_file
+        )
+
+        response_text = response_data.get("text", "Sorry, I couldn't generate a response.")
+        links = response_data.get("links", [])
+
+        send_reply(message.from_number, message.to_number, response_text, links)
+        message.status = 'replied'
+    except RateLimited:
+        InboundMessage.objects.filter(id=message.id).update(status='pending')
+        raise
+    except Exception as e:
+        logger.error(f"Error answering Twilio message {message.message_sid}: {str(e)}", exc_info=True)
+        message.status = 'failed'
+        try:
+            send_reply(message.from_number, message.to_number, "An error occurred while processing your message")
+        except Exception as send_error:
+            logger.error(f"Could not send error reply to {message.from_number}: {str(send_error)}")
+
+    message.processed_at = timezone.now()
+    message.save(update_fields=['status', 'processed_at'])
+
+
+@shared_task
+def requeue_stale_messages():
+    """
+    Put back messages nobody is answering: `processing` rows whose worker died (claimed longer
+    ago than TWILIO_STALE_MESSAGE_SECONDS) go back to `pending`, and every sender with a
+    `pending` row that old (e.g. after its retries ran out) gets a new task for the oldest one.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.TWILIO_STALE_MESSAGE_SECONDS)
+    reset = InboundMessage.objects.filter(status='processing', claimed_at__lt=cutoff).update(status='pending')
+
+    oldest = (
+        InboundMessage.objects.filter(status='pending', created_at__lt=cutoff)
+        .values('from_number').annotate(first_id=Min('id')).values_list('first_id', flat=True)
+    )
+    requeued = 0
+    for message_id in oldest:
+        process_inbound_message.delay(message_id)
+        requeued += 1
+    if reset or requeued:
+        logger.info(f"Reset {reset} stuck message(s); re-queued {requeued} sender(s)")
+    return requeued
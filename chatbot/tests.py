@@ -1,3 +1,424 @@
-from django.test import TestCase
+import io
+import json
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+import fakeredis
+import httpx
+import openai
+from celery.exceptions import Retry
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from HealthBackEnd.ratelimit import RateLimited, admit_llm_request
+from . import llm, messaging
+from .audio import normalize_audio, read_audio, upload_source
+from .coalesce import prompt_key, single_flight
+from .fake_llm import FakeLLMClient, parse_latency
+from .images import encode_image, preprocess_image
+from .media import MediaBuffer
+from .models import InboundMessage
+from .routing import route_request
+from .tasks import process_inbound_message, requeue_stale_messages
 
-# Create your tests here.
+
+def _answer(prompt=None, **kwargs):
+    return {"text": f"re: {prompt}", "links": []}
+
+
+@override_settings(TWILIO_MESSAGING_BACKEND='chatbot.messaging.LocmemBackend')
+@mock.patch('chatbot.tasks.generate_basic_health_response', side_effect=_answer)
+class InboundMessageTests(TestCase):
+    """Twilio webhook -> process_inbound_message, with replies captured by the locmem backend."""
+
+    def setUp(self):
+        messaging._backend = None
+        messaging.outbox.clear()
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('chatbot.tasks.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def inbound(self, body, sender='whatsapp:+254700000001'):
+        return InboundMessage.objects.create(
+            message_sid=f'SM{InboundMessage.objects.count()}', from_number=sender, to_number='whatsapp:+1', body=body,
+        )
+
+    def test_webhook_acks_before_answering(self, generate):
+        with mock.patch.object(process_inbound_message, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                response = self.client.post(reverse('twilio-webhook'), {
+                    'MessageSid': 'SM1', 'From': 'whatsapp:+254700000001', 'To': 'whatsapp:+1', 'Body': 'hello',
+                })
+                self.client.post(reverse('twilio-webhook'), {'MessageSid': 'SM1', 'From': 'whatsapp:+254700000001'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'<Response></Response>', response.content)
+        generate.assert_not_called()
+        self.assertEqual(len(callbacks), 1)  # Twilio's retry of the same MessageSid isn't queued again
+        delay.assert_called_once_with(InboundMessage.objects.get().id)
+        self.assertEqual(messaging.outbox, [])
+
+    def test_replies_in_sender_order(self, generate):
+        first, second = self.inbound('first'), self.inbound('second')
+        other = self.inbound('other sender', sender='whatsapp:+254700000002')
+        third = self.inbound('third')
+
+        process_inbound_message(third.id)  # older messages from the sender are answered first
+        self.assertEqual([m['body'] for m in messaging.outbox], ['re: first', 're: second', 're: third'])
+        self.assertEqual(InboundMessage.objects.get(pk=other.pk).status, 'pending')
+
+        process_inbound_message(first.id)  # already answered: no duplicate reply
+        self.assertEqual(len(messaging.outbox), 3)
+        self.assertEqual(InboundMessage.objects.get(pk=second.pk).status, 'replied')
+
+    def test_rate_limited_message_is_retried(self, generate):
+        message = self.inbound('hello')
+        with mock.patch('chatbot.tasks.admit_llm_request', side_effect=[RateLimited(wait=1), None]):
+            process_inbound_message.apply(args=[message.id])
+        self.assertEqual(InboundMessage.objects.get(pk=message.pk).status, 'replied')
+        self.assertEqual([m['body'] for m in messaging.outbox], ['re: hello'])
+
+    def test_busy_sender_is_retried(self, generate):
+        message = self.inbound('hello')
+        self.redis.set(f'twilio:sender:{message.from_number}', 'other-worker')
+        with self.assertRaises(Retry):
+            process_inbound_message(message.id)
+        self.assertEqual(InboundMessage.objects.get(pk=message.pk).status, 'pending')
+
+    def test_lost_lock_stops_before_next_message(self, generate):
+        first, second = self.inbound('first'), self.inbound('second')
+
+        def steal_lock(prompt=None, **kwargs):
+            self.redis.set(f'twilio:sender:{first.from_number}', 'other-worker')
+            return _answer(prompt)
+
+        generate.side_effect = steal_lock
+        with self.assertRaises(Retry):
+            process_inbound_message(second.id)
+        self.assertEqual(InboundMessage.objects.get(pk=first.pk).status, 'replied')
+        self.assertEqual(InboundMessage.objects.get(pk=second.pk).status, 'pending')
+        self.assertEqual(self.redis.get(f'twilio:sender:{first.from_number}'), b'other-worker')
+
+    def test_requeue_stale_messages(self, generate):
+        stale = timezone.now() - timedelta(hours=1)
+        stuck = self.inbound('worker died')
+        later = self.inbound('queued behind it')
+        fresh = self.inbound('just arrived', sender='whatsapp:+254700000002')
+        InboundMessage.objects.filter(pk=stuck.pk).update(status='processing', claimed_at=stale, created_at=stale)
+        InboundMessage.objects.filter(pk=later.pk).update(created_at=stale)
+
+        with mock.patch.object(process_inbound_message, 'delay') as delay:
+            requeue_stale_messages()
+        delay.assert_called_once_with(stuck.id)
+        self.assertEqual(InboundMessage.objects.get(pk=stuck.pk).status, 'pending')
+        self.assertEqual(InboundMessage.objects.get(pk=fresh.pk).status, 'pending')
+
+        process_inbound_message(later.id)
+        self.assertEqual([m['body'] for m in messaging.outbox], ['re: worker died', 're: queued behind it'])
+
+
+@override_settings(IMAGE_MAX_DIMENSION=512, IMAGE_FORMAT='JPEG', IMAGE_QUALITY=80)
+class ImagePreprocessTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def image_bytes(self, size, mode='RGB', image_format='PNG', **save_kwargs):
+        output = io.BytesIO()
+        Image.new(mode, size, (200, 30, 30) if mode == 'RGB' else (200, 30, 30, 128)).save(output, image_format, **save_kwargs)
+        return output.getvalue()
+
+    def test_downscales_and_reencodes(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90°: the output must come out portrait
+        source = self.image_bytes((2000, 1000), image_format='JPEG', exif=exif.tobytes())
+        data, content_type = preprocess_image(source)
+
+        self.assertEqual(content_type, 'image/jpeg')
+        with Image.open(io.BytesIO(data)) as img:
+            self.assertEqual((img.format, img.size), ('JPEG', (256, 512)))
+            self.assertNotIn(0x0112, img.getexif())
+        self.assertLess(len(data), len(source))
+
+    def test_transparency_and_webp(self):
+        with self.settings(IMAGE_FORMAT='WEBP'):
+            data, content_type = preprocess_image(self.image_bytes((600, 600), mode='RGBA'))
+        self.assertEqual(content_type, 'image/webp')
+        with Image.open(io.BytesIO(data)) as img:
+            self.assertEqual((img.format, img.mode, img.size), ('WEBP', 'RGB', (512, 512)))
+
+    def test_media_buffer_and_passthrough(self):
+        buffer = MediaBuffer('image/png', 'png')
+        buffer.write(self.image_bytes((1024, 768)))
+        self.assertTrue(encode_image(buffer).startswith('data:image/jpeg;base64,'))
+
+        junk = b'\x89PNG\r\n\x1a\nnot really a png'
+        self.assertEqual(preprocess_image(junk), (junk, None))
+
+
+class AudioNormalizeTests(SimpleTestCase):
+
+    @override_settings(AUDIO_NORMALIZE=True, AUDIO_SAMPLE_RATE=16000)
+    def test_only_trims_the_ends(self):
+        encoded = mock.Mock(stdout=b'OggS small')
+        with mock.patch('chatbot.audio.shutil.which', return_value='/usr/bin/ffmpeg'), \
+                mock.patch('chatbot.audio.subprocess.run', return_value=encoded) as run:
+            self.assertEqual(normalize_audio(b'OggS' + b'\0' * 1000, 'media.ogg'), (b'OggS small', 'audio.ogg'))
+
+        command = run.call_args.args[0]
+        audio_filter = command[command.index('-af') + 1]
+        self.assertEqual(audio_filter.count('areverse'), 2)
+        self.assertNotIn('stop_periods', audio_filter)  # would also cut pauses mid-speech
+
+
+@override_settings(
+    LLM_FAKE_LATENCY='fixed:0', LLM_FAKE_RATE_LIMIT_RATE=0, LLM_FAKE_TIMEOUT_RATE=0,
+    LLM_MODEL_TIERS={'fast': 'fast-model', 'standard': 'standard-model', 'vision': 'vision-model'},
+    LLM_FAST_MAX_PROMPT_CHARS=280,
+)
+class RoutingTests(SimpleTestCase):
+    """Tier selection, fallback and escalation against the fake backend."""
+
+    messages = [{"role": "user", "content": "is ginger tea good for a cold?"}]
+
+    def setUp(self):
+        self.client = FakeLLMClient()
+        llm._tier_stats.clear()
+
+    def test_model_selection(self):
+        cases = [
+            (route_request('What helps a sore throat?'), 'fast'),
+            (route_request('What helps a sore throat?', has_image=True), 'vision'),
+            (route_request('What helps a sore throat?', personalized=True), 'standard'),
+            (route_request('¿Qué ayuda con el dolor de garganta?'), 'standard'),
+            (route_request('what helps ' * 40), 'standard'),
+            (route_request(kind='claim'), 'standard'),
+            (route_request(kind='claim', has_image=True), 'vision'),
+        ]
+        for route, tier in cases:
+            self.assertEqual((route.tier, route.model), (tier, f'{tier}-model'), route.reason)
+
+    def test_records_usage_per_tier(self):
+        route = route_request('What helps a sore throat?')
+        result = llm.json_completion(self.messages, route, client=self.client)
+        self.assertTrue(result['text'].startswith('[fake fast-model '))
+
+        stats = llm.tier_stats()
+        self.assertEqual(list(stats), ['fast'])
+        self.assertEqual((stats['fast']['calls'], stats['fast']['errors']), (1, 0))
+        self.assertGreater(stats['fast']['prompt_tokens'], 0)
+
+    def test_fast_tier_failure_falls_back(self):
+        request = httpx.Request('POST', 'https://fake-llm.local/v1/chat/completions')
+        timeout = openai.APITimeoutError(request=request)
+        with mock.patch.object(self.client, 'simulate', side_effect=[timeout, None]):
+            response = llm.chat_completion(self.messages, route_request('is ginger tea good for a cold?'), client=self.client)
+        self.assertEqual(response.model, 'standard-model')
+        stats = llm.tier_stats()
+        self.assertEqual((stats['fast']['errors'], stats['standard']['calls']), (1, 1))
+
+        # Only the fast tier falls back; other tiers surface the error
+        with mock.patch.object(self.client, 'simulate', side_effect=timeout), self.assertRaises(openai.APITimeoutError):
+            llm.chat_completion(self.messages, route_request('is ginger tea good for a cold?', personalized=True), client=self.client)
+
+    def test_invalid_json_escalates(self):
+        create = self.client.chat.completions.create
+
+        def truncate(models):
+            def create_truncated(model, messages, **kwargs):
+                response = create(model, messages, **kwargs)
+                if model in models:
+                    response.choices[0].message.content = '{"text": "cut o'
+                return response
+            return create_truncated
+
+        with mock.patch.object(self.client.chat.completions, 'create', side_effect=truncate({'fast-model'})):
+            result = llm.json_completion(self.messages, route_request('is ginger tea good for a cold?'), client=self.client)
+        self.assertTrue(result['text'].startswith('[fake standard-model '))
+        self.assertEqual(result['links'], [])
+
+        # Nothing above the standard tier to escalate to
+        with mock.patch.object(self.client.chat.completions, 'create', side_effect=truncate({'standard-model'})), \
+                self.assertRaises(ValueError):
+            llm.json_completion(self.messages, route_request('is ginger tea good for a cold?', personalized=True), client=self.client)
+
+
+@override_settings(LLM_RATE_LIMITS={
+    'user': {'requests': '3/min', 'tokens': None},
+    'phone': {'requests': '3/min', 'tokens': None},
+    'global': {'requests': '5/min', 'tokens': None},
+})
+class TokenBucketTests(TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('HealthBackEnd.ratelimit.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_throttle(self):
+        for _ in range(3):
+            admit_llm_request(user_id=1)
+        with self.assertRaises(RateLimited) as caught:
+            admit_llm_request(user_id=1)
+        self.assertAlmostEqual(caught.exception.wait, 20, delta=1)  # one request refills every 20 s
+
+        admit_llm_request(user_id=2)  # other users have their own bucket...
+        admit_llm_request(user_id=3)
+        with self.assertRaises(RateLimited):  # ...until the global one runs dry
+            admit_llm_request(user_id=4)
+        self.assertFalse(self.redis.exists('llm:bucket:user:4:requests'))  # the rejected request debited nothing
+
+    def test_refill(self):
+        for _ in range(3):
+            admit_llm_request(phone='+254700000001')
+        key = 'llm:bucket:phone:+254700000001:requests'
+        ts = int(self.redis.hget(key, 'ts'))
+        self.redis.hset(key, 'ts', ts - 20_000)  # 20 s later: one request back
+        admit_llm_request(phone='+254700000001')
+        with self.assertRaises(RateLimited):
+            admit_llm_request(phone='+254700000001')
+
+    def test_throttled_chat_returns_429(self):
+        user = get_user_model().objects.create_user(username='throttled', password='pass')
+        client = APIClient()
+        client.force_authenticate(user)
+        with mock.patch('chatbot.views.generate_health_response', return_value={'text': 'ok'}) as generate:
+            responses = [client.post(reverse('health-chatbot'), {'prompt': 'hello'}) for _ in range(4)]
+
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200, 429])
+        self.assertEqual(generate.call_count, 3)
+        self.assertIn(int(responses[-1]['Retry-After']), range(19, 22))
+
+
+@override_settings(COALESCE_TIMEOUT=5, COALESCE_RESULT_TTL=5)
+class SingleFlightTests(SimpleTestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        patcher = mock.patch('chatbot.coalesce.get_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.key = prompt_key('basic', 'What helps a cold?')
+        self.lock_key = f'sf:lock:{self.key}'
+
+    def test_threads_share_one_call(self):
+        release, calls, results = threading.Event(), [], []
+
+        def compute():
+            calls.append(1)
+            release.wait(5)
+            return {'text': 'rest'}
+
+        threads = [threading.Thread(target=lambda: results.append(single_flight(self.key, compute))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'text': 'rest'}] * 5)
+        self.assertFalse(self.redis.exists(self.lock_key))
+        self.assertEqual(prompt_key('basic', '  what HELPS a cold '), self.key)
+
+    def test_follows_leader_in_other_process(self):
+        self.redis.set(self.lock_key, 'other-process')
+
+        def leader_finishes():
+            time.sleep(0.2)
+            payload = json.dumps({'text': 'from the other process'})
+            self.redis.set(f'sf:result:{self.key}', payload)
+            self.redis.publish(f'sf:done:{self.key}', payload)
+            self.redis.delete(self.lock_key)
+
+        leader = threading.Thread(target=leader_finishes)
+        leader.start()
+        compute = mock.Mock(return_value={'text': 'computed here'})
+        self.assertEqual(single_flight(self.key, compute), {'text': 'from the other process'})
+        leader.join(5)
+        compute.assert_not_called()
+
+    def test_computes_when_leader_dies(self):
+        self.redis.set(self.lock_key, 'other-process', px=300)  # expires without a result
+        compute = mock.Mock(return_value={'text': 'computed here'})
+        self.assertEqual(single_flight(self.key, compute), {'text': 'computed here'})
+        compute.assert_called_once()
+
+    def test_release_keeps_a_lock_taken_over_by_another_leader(self):
+        def slow_compute():
+            # Our lock expired mid-call and another process's leader took it
+            self.redis.set(self.lock_key, 'other-leader')
+            return {'text': 'late'}
+
+        self.assertEqual(single_flight(self.key, slow_compute), {'text': 'late'})
+        self.assertEqual(self.redis.get(self.lock_key), b'other-leader')
+
+
+@override_settings(LLM_FAKE_LATENCY='fixed:50', LLM_FAKE_RATE_LIMIT_RATE=0, LLM_FAKE_TIMEOUT_RATE=0, LLM_FAKE_SEED=7)
+class FakeLLMTests(SimpleTestCase):
+
+    messages = [
+        {"role": "system", "content": "Always return a JSON object"},
+        {"role": "user", "content": "is ginger tea good for a cold?"},
+    ]
+
+    def test_completion_shape_and_latency(self):
+        client = FakeLLMClient()
+        start = time.perf_counter()
+        response = client.chat.completions.create(
+            model='gpt-4o-mini', messages=self.messages, response_format={"type": "json_object"},
+        )
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+        content = response.choices[0].message.content
+        self.assertEqual(set(json.loads(content)), {'text', 'links'})
+        usage = response.usage
+        self.assertEqual(usage.prompt_tokens, len(json.dumps(self.messages)) // 4)
+        self.assertEqual(usage.completion_tokens, len(content) // 4)
+        self.assertEqual(usage.total_tokens, usage.prompt_tokens + usage.completion_tokens)
+
+        again = client.chat.completions.create(model='gpt-4o-mini', messages=self.messages, response_format={"type": "json_object"})
+        self.assertEqual(again.choices[0].message.content, content)  # depends only on the request
+
+    @override_settings(LLM_FAKE_LATENCY='fixed:0')
+    def test_transcribes_every_upload_form(self):
+        audio = b'OggS' + bytes(range(200))
+        buffer = MediaBuffer('audio/ogg', 'ogg')
+        buffer.write(audio)
+        transcriptions = FakeLLMClient().audio.transcriptions
+        texts = {
+            transcriptions.create(file=file, model='whisper-1', response_format='text')
+            for file in (
+                ('a.ogg', audio),
+                ('a.ogg', upload_source(buffer, read_audio(buffer)[0])),  # a Twilio voice note
+                buffer,
+            )
+        }
+        self.assertEqual(len(texts), 1)
+
+    def test_latency_distributions(self):
+        rng = random.Random(1)
+        self.assertEqual(parse_latency('fixed:200')(rng), 0.2)
+        self.assertTrue(all(0.1 <= parse_latency('uniform:100:500')(rng) <= 0.5 for _ in range(100)))
+        sampler = parse_latency('lognormal:1200:0.5')
+        self.assertAlmostEqual(statistics.median(sampler(rng) for _ in range(2001)), 1.2, delta=0.1)
+        with self.assertRaises(ValueError):
+            parse_latency('normal:100')
+
+    def test_simulated_errors(self):
+        with self.settings(LLM_FAKE_LATENCY='fixed:0', LLM_FAKE_RATE_LIMIT_RATE=1):
+            with self.assertRaises(openai.RateLimitError):
+                FakeLLMClient().chat.completions.create(model='gpt-4o-mini', messages=self.messages)
+        with self.settings(LLM_FAKE_TIMEOUT_RATE=1, LLM_FAKE_TIMEOUT_SECONDS=0):
+            with self.assertRaises(openai.APITimeoutError):
+                FakeLLMClient().audio.transcriptions.create(file=('a.ogg', b'OggS'), model='whisper-1')
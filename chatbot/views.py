@@ -4,15 +4,14 @@ from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from django.views import View
 from django.utils.decorators import method_decorator
-from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.views.decorators.csrf import csrf_exempt
 from django.http import HttpResponse
-from django.forms.models import model_to_dict
-from healthSubs.models import HealthProfile
-from .models import Conversation
-from .openai_utilis import generate_health_response, generate_basic_health_response
-import tempfile
-import requests
+from healthSubs.profiles import get_profile_data
+from django.db import transaction
+from HealthBackEnd.ratelimit import admit_llm_request, estimate_tokens
+from .models import Conversation, InboundMessage
+from .openai_utilis import generate_health_response
+from .tasks import process_inbound_message
 import logging
 from django.utils.xmlutils import SimplerXMLGenerator
 from io import StringIO
@@ -33,11 +32,9 @@ class HealthChatbotView(APIView):
         if not (prompt or image_file or audio_file):
             return Response({"error": "Provide text, image, or audio."}, status=400)
 
-        try:
-            health_profile = HealthProfile.objects.get(user=user)
-            profile_dict = model_to_dict(health_profile)
-        except HealthProfile.DoesNotExist:
-            profile_dict = {}
+        profile_dict = get_profile_data(user.id)
+
+        admit_llm_request(user_id=user.id, tokens=estimate_tokens(prompt, has_image=bool(image_file)))
 
         ai_response = generate_health_response(
             user_data=profile_dict,
@@ -56,81 +53,45 @@ class HealthChatbotView(APIView):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class TwilioWebhookView(View):
-    def build_twiml_response(self, text, links=None):
-        """Helper method to generate properly formatted TwiML"""
+    """Acknowledges Twilio at once; the reply is sent by `process_inbound_message`."""
+
+    def build_twiml_response(self):
+        """Empty TwiML: tells Twilio the message was received without replying inline"""
         stream = StringIO()
         xml = SimplerXMLGenerator(stream, "UTF-8")
         xml.startDocument()
         xml.startElement("Response", {})
-        
-        xml.startElement("Message", {})
-        xml.characters(text)
-        xml.endElement("Message")
-        
-        if links:
-            for link in links:
-                xml.startElement("Message", {})
-                xml.characters(link)
-                xml.endElement("Message")
-                
         xml.endElement("Response")
         xml.endDocument()
         return stream.getvalue()
 
     def post(self, request):
         try:
-            # Log incoming request for debugging
-            logger.info(f"Incoming Twilio request: {request.POST.dict()}")
-
+            message_sid = request.POST.get("MessageSid")
             from_number = request.POST.get("From")
-            message_body = request.POST.get("Body")
-            media_url = request.POST.get("MediaUrl0")
-            media_type = request.POST.get("MediaContentType0")
-
-            prompt = message_body.strip() if message_body else None
-            image_file = None
-            audio_file = None
-
-            # Handle media if present
-            if media_url and media_type:
-                try:
-                    logger.info(f"Processing media: {media_url} ({media_type})")
-                    media_response = requests.get(media_url, timeout=5)
-                    media_response.raise_for_status()
-                    
-                    with tempfile.NamedTemporaryFile(delete=True) as temp_file:
-                        temp_file.write(media_response.content)
-                        temp_file.seek(0)
-
-                        if media_type.startswith("image"):
-                            image_file = InMemoryUploadedFile(
-                                temp_file, None, 'image.jpg', media_type, temp_file.tell(), None
-                            )
-                        elif media_type.startswith("audio"):
-                            audio_file = InMemoryUploadedFile(
-                                temp_file, None, 'audio.mp3', media_type, temp_file.tell(), None
-                            )
-                except Exception as media_error:
-                    logger.error(f"Media processing failed: {str(media_error)}")
-
-            # Generate response (replace with your actual function)
-            response_data = generate_basic_health_response(
-                prompt=prompt,
-                image_file=image_file,
-                audio_file=audio_file
+            if not (message_sid and from_number):
+                logger.warning(f"Ignoring Twilio request without MessageSid/From: {request.POST.dict()}")
+                return HttpResponse(self.build_twiml_response(), content_type="application/xml")
+
+            message, created = InboundMessage.objects.get_or_create(
+                message_sid=message_sid,
+                defaults={
+                    "from_number": from_number,
+                    "to_number": request.POST.get("To", ""),
+                    "body": request.POST.get("Body") or "",
+                    "media_url": request.POST.get("MediaUrl0") or "",
+                    "media_type": request.POST.get("MediaContentType0") or "",
+                },
             )
 
-            response_text = response_data.get("text", "Sorry, I couldn't generate a response.")
-            links = response_data.get("links", [])
-
-            # Build proper TwiML response
-            twiml = self.build_twiml_response(response_text, links)
-            logger.info(f"Sending TwiML response: {twiml}")
-
-            return HttpResponse(twiml, content_type="application/xml")
+            if created:
+                transaction.on_commit(lambda: process_inbound_message.delay(message.id))
+                logger.info(f"Queued Twilio message {message_sid} from {from_number}")
+            else:
+                # Twilio retried a webhook we already accepted
+                logger.info(f"Duplicate Twilio message {message_sid} ignored")
 
         except Exception as e:
             logger.error(f"Error in Twilio webhook: {str(e)}", exc_info=True)
-            # Return error response to Twilio
-            error_twiml = self.build_twiml_response("An error occurred while processing your message")
-            return HttpResponse(error_twiml, content_type="application/xml", status=200)
\ No newline at end of file
+
+        return HttpResponse(self.build_twiml_response(), content_type="application/xml")
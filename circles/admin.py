@@ -1,21 +1,51 @@
 from django.contrib import admin
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .counters import rebuild_counters
 from .models import Circle, Contribution, Claim, Membership
 
 class MembershipInline(admin.TabularInline):  # or admin.StackedInline
+    # Existing members, read-only user column: an editable user widget per row costs a
+    # query per member on big circles. New members go through AddMembershipInline.
     model = Membership
+    fields = ['user', 'join_date', 'is_active', 'payment_warnings', 'last_contribution_date']
+    readonly_fields = ['user', 'join_date']
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user')
+
+
+class AddMembershipInline(admin.TabularInline):
+    model = Membership
+    fields = ['user', 'is_active']
+    raw_id_fields = ['user']
     extra = 1
+    verbose_name_plural = 'Add members'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).none()
 
 @admin.register(Circle)
 class CircleAdmin(admin.ModelAdmin):
-    list_display = ['name', 'creator', 'balance', 'frequency', 'member_count']
-    inlines = [MembershipInline]
-    
-    def member_count(self, obj):
-        return obj.members.count()
+    list_display = ['name', 'creator', 'balance', 'frequency', 'member_count', 'active_member_count', 'total_contributed']
+    list_select_related = ['creator']
+    readonly_fields = ['member_count', 'active_member_count', 'total_contributed']
+    inlines = [MembershipInline, AddMembershipInline]
+    actions = ['recount']
+
+    @admin.action(description="Recount members and contributions")
+    def recount(self, request, queryset):
+        count = rebuild_counters(queryset.values_list('pk', flat=True))
+        self.message_user(request, f"Recounted {count} circles")
 
 @admin.register(Membership)
 class MembershipAdmin(admin.ModelAdmin):
     list_display = ['user', 'circle', 'is_active', 'payment_warnings', 'last_contribution_date']
+    list_select_related = ['user', 'circle']
     list_filter = ['is_active', 'circle']
     search_fields = ['user__username']
     # Add filter_horizontal here if you want it for the user/circle selection when creating memberships
@@ -25,16 +55,25 @@ class MembershipAdmin(admin.ModelAdmin):
 class ContributionAdmin(admin.ModelAdmin):
     list_display = ['user', 'circle', 'amount', 'timestamp', 'is_automatic', 'refunded']
     list_filter = ['circle', 'is_automatic', 'refunded']
+    list_select_related = ['user', 'circle']
 
 @admin.register(Claim)
 class ClaimAdmin(admin.ModelAdmin):
     list_display = ['user', 'circle', 'amount', 'status', 'fraud_risk', 'created_at']
     list_filter = ['status', 'circle']
+    list_select_related = ['user', 'circle']
     readonly_fields = ['processed_at']
 
+    def get_queryset(self, request):
+        user_claims = (
+            Claim.objects.filter(user=OuterRef('user')).order_by()
+            .values('user').annotate(n=Count('pk')).values('n')
+        )
+        return super().get_queryset(request).annotate(_user_claim_count=Coalesce(Subquery(user_claims), 0))
+
     def fraud_risk(self, obj):
         if obj.amount > 3000:
             return "⚠️ High"
-        elif Claim.objects.filter(user=obj.user).count() > 2:
+        elif obj._user_claim_count > 2:
             return "⚠️ Frequent Claimer"
         return "Low"
\ No newline at end of file
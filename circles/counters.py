@@ -0,0 +1,63 @@
+from decimal import Decimal
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from HealthBackEnd.cache import invalidate
+from .models import Circle, Contribution, Membership
+
+
+def adjust_counters(circle_id, members=0, active=0, contributed=0):
+    """
+    Add deltas to a circle's counters in one `UPDATE ... SET x = x + delta`, so concurrent
+    joins/contributions never lose each other's increments. Skips Circle.post_save, so
+    the cached circle is invalidated here.
+    """
+    deltas = {'member_count': members, 'active_member_count': active, 'total_contributed': contributed}
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if updates:
+        Circle.objects.filter(pk=circle_id).update(**updates)
+        invalidate('circle', circle_id)
+
+
+def circle_id_batches(circle_ids=None, batch_size=1000):
+    """
+    Ids of existing circles in pk order, batch_size at a time: keyset pages over every circle
+    by default, so no query carries more than batch_size ids.
+    """
+    if circle_ids is None:
+        last = 0
+        while True:
+            batch = list(Circle.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last = batch[-1]
+    else:
+        circle_ids = sorted(set(circle_ids))
+        for start in range(0, len(circle_ids), batch_size):
+            chunk = circle_ids[start:start + batch_size]
+            batch = list(Circle.objects.filter(pk__in=chunk).order_by('pk').values_list('pk', flat=True))
+            if batch:
+                yield batch
+
+
+def rebuild_counters(circle_ids=None, batch_size=1000):
+    """Recompute counters from memberships and contributions (all circles by default), one UPDATE per batch."""
+    members = (
+        Membership.objects.filter(circle=OuterRef('pk')).order_by().values('circle')
+        .annotate(n=Count('pk'), active=Count('pk', filter=Q(is_active=True)))
+    )
+    contributed = (
+        Contribution.objects.filter(circle=OuterRef('pk'), refunded=False).order_by().values('circle')
+        .annotate(total=Sum('amount')).values('total')
+    )
+    count = 0
+    for batch in circle_id_batches(circle_ids, batch_size):
+        Circle.objects.filter(pk__in=batch).update(
+            member_count=Coalesce(Subquery(members.values('n')), 0),
+            active_member_count=Coalesce(Subquery(members.values('active')), 0),
+            total_contributed=Coalesce(Subquery(contributed), Value(Decimal('0')), output_field=DecimalField()),
+        )
+        count += len(batch)
+    if count:
+        invalidate('circle')
+    return count
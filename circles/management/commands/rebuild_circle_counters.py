@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from circles.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute Circle member/active member counts and total contributed (after bulk loads or to repair drift)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('circle_ids', nargs='*', type=int, help="Circles to recount (default: all)")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Circles per UPDATE")
+
+    def handle(self, *args, **options):
+        count = rebuild_counters(options['circle_ids'] or None, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Recounted {count} circles"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from circles.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute CircleStats from memberships and profiles (after bulk loads or to repair drift)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('circle_ids', nargs='*', type=int, help="Circles to rebuild (default: all)")
+
+    def handle(self, *args, **options):
+        count = rebuild_stats(options['circle_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} circles"))
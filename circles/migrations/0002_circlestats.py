@@ -0,0 +1,32 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CircleStats',
+            fields=[
+                ('circle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='circles.circle')),
+                ('member_count', models.PositiveIntegerField(default=0)),
+                ('risk_low', models.PositiveIntegerField(default=0)),
+                ('risk_medium', models.PositiveIntegerField(default=0)),
+                ('risk_high', models.PositiveIntegerField(default=0)),
+                ('risk_unknown', models.PositiveIntegerField(default=0)),
+                ('bmi_total', models.FloatField(default=0)),
+                ('bmi_count', models.PositiveIntegerField(default=0)),
+                ('condition_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Circle stats',
+            },
+        ),
+    ]
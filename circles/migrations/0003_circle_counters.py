@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-19 19:26
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    # Same as circles.counters.rebuild_counters, against the historical models
+    Circle = apps.get_model('circles', 'Circle')
+    Membership = apps.get_model('circles', 'Membership')
+    Contribution = apps.get_model('circles', 'Contribution')
+    members = (
+        Membership.objects.filter(circle=OuterRef('pk')).order_by().values('circle')
+        .annotate(n=Count('pk'), active=Count('pk', filter=Q(is_active=True)))
+    )
+    contributed = (
+        Contribution.objects.filter(circle=OuterRef('pk'), refunded=False).order_by().values('circle')
+        .annotate(total=Sum('amount')).values('total')
+    )
+    Circle.objects.update(
+        member_count=Coalesce(Subquery(members.values('n')), 0),
+        active_member_count=Coalesce(Subquery(members.values('active')), 0),
+        total_contributed=Coalesce(Subquery(contributed), Value(Decimal('0')), output_field=models.DecimalField()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('circles', '0002_circlestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='circle',
+            name='active_member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='circle',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='circle',
+            name='total_contributed',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Contributions not refunded', max_digits=12),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -26,6 +26,14 @@ class Circle(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     claim_lock_period = models.PositiveIntegerField(default=30, help_text="Days before new members can file claims")
     min_balance_alert = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    # Maintained with F() updates by circles.counters; repair with rebuild_circle_counters
+    member_count = models.PositiveIntegerField(default=0, editable=False)
+    active_member_count = models.PositiveIntegerField(default=0, editable=False)
+    total_contributed = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, editable=False, help_text="Contributions not refunded"
+    )
+
+    COUNTER_FIELDS = ('member_count', 'active_member_count', 'total_contributed')
 
     def __str__(self):
         return self.name
@@ -33,6 +41,11 @@ class Circle(models.Model):
     def save(self, *args, **kwargs):
         if not self.min_balance_alert or self.min_balance_alert == Decimal('0'):
             self.min_balance_alert = self.contribution_amount * 2
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # The counters may have moved since this instance was loaded; don't write them back
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
 
 
@@ -47,6 +60,11 @@ class Membership(models.Model):
     class Meta:
         unique_together = ('user', 'circle')
 
+    def save(self, *args, **kwargs):
+        # Keeps circles.signals' row lock (pre_save) until the stats and counters are updated
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Membership({self.user.username} in {self.circle.name})"
 
@@ -96,7 +114,7 @@ class Claim(models.Model):
             reason__iexact=self.reason,
             amount=self.amount,
             created_at__gte=timezone.now() - timedelta(days=7)
-        )
+        ).exclude(pk=self.pk)
         if duplicate.exists():
             raise ValidationError("Possible duplicate claim detected")
 
@@ -114,3 +132,31 @@ class Claim(models.Model):
 
     def __str__(self):
         return f"Claim({self.user.username} - {self.amount} - {self.status})"
+
+
+
+class CircleStats(models.Model):
+    """
+    Health mix of a circle's active members, kept up to date incrementally by
+    circles.stats on membership and profile changes so dashboards read one row.
+    """
+    circle = models.OneToOneField(Circle, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    member_count = models.PositiveIntegerField(default=0)
+    risk_low = models.PositiveIntegerField(default=0)
+    risk_medium = models.PositiveIntegerField(default=0)
+    risk_high = models.PositiveIntegerField(default=0)
+    risk_unknown = models.PositiveIntegerField(default=0)
+    bmi_total = models.FloatField(default=0)
+    bmi_count = models.PositiveIntegerField(default=0)
+    condition_counts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Circle stats"
+
+    @property
+    def average_bmi(self):
+        return round(self.bmi_total / self.bmi_count, 1) if self.bmi_count else None
+
+    def __str__(self):
+        return f"Stats({self.circle_id})"
@@ -1,7 +1,8 @@
 from rest_framework import serializers
-from .models import Circle, Contribution, Claim, Membership
+from .models import Circle, CircleStats, Contribution, Claim, Membership
 from auths.serializers import RegisterSerializer
 from .constants import FREQUENCY_CHOICES, MIN_FREQUENCY
+from HealthBackEnd.fieldsets import SparseFieldsetMixin
 
 class ContributionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,13 +10,13 @@ class ContributionSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['user', 'circle', 'is_automatic', 'timestamp', 'refunded']
 
-class ClaimSerializer(serializers.ModelSerializer):
+class ClaimSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = Claim
         fields = '__all__'
         read_only_fields = ['user', 'circle', 'status', 'processed_at', 'created_at']
 
-class CircleSerializer(serializers.ModelSerializer):
+class CircleSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     members = RegisterSerializer(many=True, read_only=True)
     contributions = ContributionSerializer(many=True, read_only=True)
     claims = ClaimSerializer(many=True, read_only=True)
@@ -48,3 +49,14 @@ class MembershipSerializer(serializers.ModelSerializer):
         model = Membership
         fields = '__all__'
         read_only_fields = ['join_date']
+
+class CircleStatsSerializer(serializers.ModelSerializer):
+    average_bmi = serializers.FloatField(read_only=True)
+    risk_distribution = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CircleStats
+        fields = ['circle', 'member_count', 'risk_distribution', 'average_bmi', 'bmi_count', 'condition_counts', 'updated_at']
+
+    def get_risk_distribution(self, obj):
+        return {'low': obj.risk_low, 'medium': obj.risk_medium, 'high': obj.risk_high, 'unknown': obj.risk_unknown}
@@ -0,0 +1,140 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from HealthBackEnd.cache import invalidate
+from healthSubs.models import HealthProfile
+from healthSubs.scoring import profiles_rescored
+from .counters import adjust_counters, rebuild_counters
+from .models import Circle, Claim, Contribution, Membership
+from .stats import PROFILE_FIELDS, rebuild_stats, snapshot, update_stats
+
+
+def _profile_snapshot(user_id):
+    # Locked so a concurrent profile save can't change it between reading and counting it
+    values = HealthProfile.objects.select_for_update().filter(user_id=user_id).values(*PROFILE_FIELDS).first()
+    return snapshot(values or {})
+
+
+# Stats deltas are computed from the row as stored, read under a row lock in pre_save (the
+# models' save() is atomic), not from the instance's loaded values: two saves from stale
+# copies would otherwise both subtract the same old value.
+
+@receiver(pre_save, sender=Membership)
+def lock_membership(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._was_active = False
+        return
+    instance._was_active = (
+        Membership.objects.select_for_update().filter(pk=instance.pk).values_list('is_active', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Membership)
+def membership_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    was_active = False if created else getattr(instance, '_was_active', None)
+    if was_active is None:
+        # Saved without pre_save having seen the row, so we can't tell what changed
+        rebuild_stats([instance.circle_id])
+        rebuild_counters([instance.circle_id])
+        return
+    if was_active != instance.is_active:
+        member = _profile_snapshot(instance.user_id)
+        if instance.is_active:
+            update_stats([instance.circle_id], add=member)
+        else:
+            update_stats([instance.circle_id], remove=member)
+    adjust_counters(instance.circle_id, members=int(created), active=int(instance.is_active) - int(was_active))
+    instance._was_active = instance.is_active
+
+
+@receiver(post_delete, sender=Membership)
+def membership_deleted(sender, instance, **kwargs):
+    # Deletes usually come from a user/circle cascade where the profile may already be
+    # gone, so recount after commit instead of subtracting a snapshot.
+    adjust_counters(instance.circle_id, members=-1, active=-int(instance.is_active))
+    if instance.is_active:
+        transaction.on_commit(lambda: rebuild_stats([instance.circle_id]))
+
+
+@receiver(post_save, sender=Contribution)
+def contribution_saved(sender, instance, created, raw=False, **kwargs):
+    # Refunds flip `refunded` with a queryset update and adjust the total themselves
+    if created and not raw and not instance.refunded:
+        adjust_counters(instance.circle_id, contributed=instance.amount)
+
+
+@receiver(post_delete, sender=Contribution)
+def contribution_deleted(sender, instance, **kwargs):
+    if not instance.refunded:
+        adjust_counters(instance.circle_id, contributed=-instance.amount)
+
+
+@receiver(pre_save, sender=HealthProfile)
+def lock_profile(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._stats_before = snapshot({})
+        return
+    values = HealthProfile.objects.select_for_update().filter(pk=instance.pk).values(*PROFILE_FIELDS).first()
+    instance._stats_before = snapshot(values or {})  # members without a profile count as unknown risk
+
+
+@receiver(post_save, sender=HealthProfile)
+def profile_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, '_stats_before', None)
+    new = snapshot({f: getattr(instance, f) for f in PROFILE_FIELDS})
+    if old == new:
+        return
+
+    circle_ids = list(
+        Membership.objects.filter(user_id=instance.user_id, is_active=True).values_list('circle_id', flat=True)
+    )
+    if not circle_ids:
+        return
+    if old is None:
+        rebuild_stats(circle_ids)
+    else:
+        update_stats(circle_ids, add=new, remove=old)
+
+
+@receiver(post_delete, sender=HealthProfile)
+def profile_deleted(sender, instance, **kwargs):
+    # In a user delete the memberships may be gone already; membership_deleted covers those
+    circle_ids = list(
+        Membership.objects.filter(user_id=instance.user_id, is_active=True).values_list('circle_id', flat=True)
+    )
+    if circle_ids:
+        transaction.on_commit(lambda: rebuild_stats(circle_ids))
+
+
+@receiver(profiles_rescored)
+def rebuild_after_rescore(sender, **kwargs):
+    rebuild_stats()
+
+
+@receiver([post_save, post_delete], sender=Circle)
+def invalidate_cached_circle(sender, instance, **kwargs):
+    invalidate('circle', instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Membership)
+@receiver([post_save, post_delete], sender=Contribution)
+@receiver([post_save, post_delete], sender=Claim)
+def invalidate_cached_circle_rows(sender, instance, **kwargs):
+    invalidate('circle', instance.circle_id)
+
+
+# Fields of a user shown in circle member lists (RegisterSerializer)
+MEMBER_FIELDS = {'username', 'phone', 'language'}
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_member_circles(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if created or raw or (update_fields is not None and not MEMBER_FIELDS & set(update_fields)):
+        return
+    for circle_id in Membership.objects.filter(user_id=instance.pk).values_list('circle_id', flat=True):
+        invalidate('circle', circle_id)
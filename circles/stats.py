@@ -0,0 +1,81 @@
+from django.db import transaction
+from .counters import circle_id_batches
+from .models import CircleStats, Membership
+
+RISK_FIELDS = {'low': 'risk_low', 'medium': 'risk_medium', 'high': 'risk_high'}
+PROFILE_FIELDS = ('risk_level', 'height_cm', 'weight_kg', 'conditions')
+STATS_FIELDS = [
+    'member_count', 'risk_low', 'risk_medium', 'risk_high', 'risk_unknown',
+    'bmi_total', 'bmi_count', 'condition_counts',
+]
+
+
+def snapshot(values):
+    """The parts of a profile the stats depend on, from a dict of its field values ({} = no profile)."""
+    height, weight = values.get('height_cm'), values.get('weight_kg')
+    return (
+        values.get('risk_level') or '',
+        round(weight / ((height / 100) ** 2), 1) if height and weight else None,
+        tuple(sorted(set(values.get('conditions') or []))),
+    )
+
+
+def _apply(stats, member, sign):
+    risk, bmi, conditions = member
+    stats.member_count += sign
+    field = RISK_FIELDS.get(risk, 'risk_unknown')
+    setattr(stats, field, getattr(stats, field) + sign)
+    if bmi is not None:
+        stats.bmi_total += sign * bmi
+        stats.bmi_count += sign
+    for condition in conditions:
+        count = stats.condition_counts.get(condition, 0) + sign
+        if count > 0:
+            stats.condition_counts[condition] = count
+        else:
+            stats.condition_counts.pop(condition, None)
+
+
+def update_stats(circle_ids, add=None, remove=None):
+    """
+    Apply one member's snapshot change to each circle's stats: `remove` the old snapshot,
+    `add` the new one. Rows are locked in id order; a circle without stats yet is rebuilt.
+    """
+    with transaction.atomic():
+        for circle_id in sorted(set(circle_ids)):
+            stats = CircleStats.objects.select_for_update().filter(circle_id=circle_id).first()
+            if stats is None:
+                rebuild_stats([circle_id])
+                continue
+            if remove is not None:
+                _apply(stats, remove, -1)
+            if add is not None:
+                _apply(stats, add, +1)
+            stats.save()
+
+
+def rebuild_stats(circle_ids=None, batch_size=1000):
+    """Recompute stats from scratch (for all circles by default), batch_size circles per query."""
+    count = 0
+    for batch in circle_id_batches(circle_ids, batch_size):
+        stats = {circle_id: CircleStats(circle_id=circle_id) for circle_id in batch}
+        members = (
+            Membership.objects.filter(circle_id__in=batch, is_active=True)
+            .values_list('circle_id', *(f'user__health_profile__{f}' for f in PROFILE_FIELDS))
+            .iterator(chunk_size=5000)
+        )
+        for circle_id, *values in members:
+            _apply(stats[circle_id], snapshot(dict(zip(PROFILE_FIELDS, values))), +1)
+        CircleStats.objects.bulk_create(
+            stats.values(), update_conflicts=True, unique_fields=['circle'], update_fields=STATS_FIELDS + ['updated_at'],
+        )
+        count += len(batch)
+    return count
+
+
+def get_stats(circle_id):
+    stats = CircleStats.objects.filter(circle_id=circle_id).first()
+    if stats is None:
+        rebuild_stats([circle_id])
+        stats = CircleStats.objects.get(circle_id=circle_id)
+    return stats
@@ -2,7 +2,7 @@ from celery import shared_task
 from django.utils import timezone
 from datetime import timedelta
 from django.db import transaction
-from django.db.models import Sum
+from .counters import adjust_counters
 from .models import Circle, Membership, Contribution
 from wallets.models import Wallet, Transaction
 import logging
@@ -67,18 +67,23 @@ def enforce_contributions():
 
 def refund_and_remove_member(membership):
     with transaction.atomic():
-        total_contributed = Contribution.objects.filter(
-            user=membership.user,
-            circle=membership.circle,
-            refunded=False
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Refund exactly the rows summed (locked), so total_contributed drops by what was refunded
+        circle = Circle.objects.select_for_update().get(pk=membership.circle_id)
+        contributions = list(
+            Contribution.objects.select_for_update().filter(
+                user=membership.user,
+                circle=circle,
+                refunded=False
+            ).values_list('pk', 'amount')
+        )
+        total_contributed = sum(amount for _, amount in contributions)
 
         if total_contributed > 0:
-            if membership.circle.balance < total_contributed:
+            if circle.balance < total_contributed:
                 logger.warning(f"Insufficient circle balance for refund to {membership.user}")
                 return
 
-            wallet = Wallet.objects.filter(user=membership.user).first()
+            wallet = Wallet.objects.select_for_update().filter(user=membership.user).first()
             if not wallet:
                 logger.warning(f"No wallet to refund user {membership.user}")
                 return
@@ -86,23 +91,20 @@ def refund_and_remove_member(membership):
             wallet.balance += total_contributed
             wallet.save()
 
-            membership.circle.balance -= total_contributed
-            membership.circle.save()
+            circle.balance -= total_contributed
+            circle.save()
 
-            Contribution.objects.filter(
-                user=membership.user,
-                circle=membership.circle,
-                refunded=False
-            ).update(refunded=True)
+            Contribution.objects.filter(pk__in=[pk for pk, _ in contributions]).update(refunded=True)
+            adjust_counters(membership.circle_id, contributed=-total_contributed)
 
             Transaction.objects.create(
                 wallet=wallet,
                 amount=total_contributed,
                 transaction_type='topup',
-                description=f'Refund from {membership.circle.name}'
+                description=f'Refund from {circle.name}'
             )
 
         membership.is_active = False
-        membership.save()
+        membership.save()  # the membership signal decrements active_member_count
 
-        logger.info(f"Deactivated and refunded user {membership.user} from {membership.circle.name}")
+        logger.info(f"Deactivated and refunded user {membership.user} from {circle.name}")
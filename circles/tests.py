@@ -1,3 +1,361 @@
-from django.test import TestCase
+import re
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, router
+from django.db.models.signals import pre_save
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from HealthBackEnd.cache import cached
+from HealthBackEnd.db_router import ReplicaRoutingMiddleware
+from monitoring.testing import QueryBudgetTestCase
+from wallets.models import Wallet
+from healthSubs.models import HealthProfile
+from .models import Circle, CircleStats, Contribution, Membership
+from .counters import rebuild_counters
+from .stats import STATS_FIELDS, rebuild_stats
+from .tasks import refund_and_remove_member
+from .views import CircleDetailView, CircleListCreateView
 
-# Create your tests here.
+
+class CircleQueryBudgetTests(QueryBudgetTestCase):
+    """Query count / wall time per circle endpoint against large circles (see query_budgets.json)."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.fixtures['owner'])
+        self.circle = self.fixtures['circles'][0]
+
+    def test_circle_list(self):
+        with self.assertWithinBudget('circle-list'):
+            response = self.client.get(reverse('circle-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_circle_detail(self):
+        with self.assertWithinBudget('circle-detail'):
+            response = self.client.get(reverse('circle-detail', args=[self.circle.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['members']), 300)
+
+    def test_circle_detail_cached(self):
+        url = reverse('circle-detail', args=[self.circle.id])
+        self.client.get(url)
+        with self.assertWithinBudget('circle-detail-cached'):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['members']), 300)
+
+        # A write bumps the circle's version, so the next read is fresh
+        self.circle.name = 'Renamed'
+        self.circle.save()
+        self.assertEqual(self.client.get(url).data['name'], 'Renamed')
+
+    def test_circle_list_sparse(self):
+        with self.assertWithinBudget('circle-list-sparse'):
+            response = self.client.get(reverse('circle-list'), {'fields': 'id,name,balance,claims.status'})
+        self.assertEqual(response.status_code, 200)
+        circle = next(c for c in response.json() if c['id'] == self.circle.id)
+        self.assertEqual(set(circle), {'id', 'name', 'balance', 'claims'})
+        self.assertEqual(set(circle['claims'][0]), {'status'})
+        self.assertEqual(circle['balance'], '50000.00')  # Decimals stay exact strings
+
+        detail = self.client.get(reverse('circle-detail', args=[self.circle.id]), {'exclude': 'members,claims.receipt'})
+        self.assertNotIn('members', detail.json())
+        self.assertNotIn('receipt', detail.json()['claims'][0])
+
+    def test_circle_list_not_modified(self):
+        etag = self.client.get(reverse('circle-list'))['ETag']
+        with self.assertWithinBudget('circle-list-not-modified'):
+            response = self.client.get(reverse('circle-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A new contribution in any listed circle changes the aggregate stamp
+        self.circle.contributions.first().save()
+        self.assertEqual(self.client.get(reverse('circle-list'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_circle_detail_not_modified(self):
+        url = reverse('circle-detail', args=[self.circle.id])
+        etag = self.client.get(url)['ETag']
+        with self.assertWithinBudget('circle-detail-not-modified'):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Authorization', response['Vary'])
+
+        outsider = APIClient()
+        outsider.force_authenticate(self.fixtures['admin'])
+        self.assertEqual(outsider.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_circle_stats(self):
+        with self.assertWithinBudget('circle-stats'):
+            response = self.client.get(reverse('circle-stats', args=[self.circle.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['member_count'], 300)
+
+    def test_circle_members(self):
+        with self.assertWithinBudget('circle-members'):
+            response = self.client.get(reverse('circle-members', args=[self.circle.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 300)
+
+    def test_circle_members_cached(self):
+        url = reverse('circle-members', args=[self.circle.id])
+        self.client.get(url)
+        with self.assertWithinBudget('circle-members-cached'):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 300)
+
+
+class CircleAdminQueryBudgetTests(QueryBudgetTestCase):
+    """Admin changelists must not issue a query per row."""
+
+    def setUp(self):
+        self.client.force_login(self.fixtures['admin'])
+
+    def assertAdminPageWithinBudget(self, name, url):
+        with self.assertWithinBudget(name):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_circle_changelist(self):
+        self.assertAdminPageWithinBudget('admin:circles_circle_changelist', reverse('admin:circles_circle_changelist'))
+
+    def test_circle_change(self):
+        self.assertAdminPageWithinBudget(
+            'admin:circles_circle_change',
+            reverse('admin:circles_circle_change', args=[self.fixtures['circles'][0].id]),
+        )
+
+    def test_membership_changelist(self):
+        self.assertAdminPageWithinBudget(
+            'admin:circles_membership_changelist', reverse('admin:circles_membership_changelist'),
+        )
+
+    def test_contribution_changelist(self):
+        self.assertAdminPageWithinBudget(
+            'admin:circles_contribution_changelist', reverse('admin:circles_contribution_changelist'),
+        )
+
+    def test_claim_changelist(self):
+        self.assertAdminPageWithinBudget('admin:circles_claim_changelist', reverse('admin:circles_claim_changelist'))
+
+
+@override_settings(DB_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Routing decisions only; no queries run against the (nonexistent) replica alias."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        token = AccessToken()
+        token['user_id'] = 7
+        self.token = str(token)
+
+    def route(self, method='get', write=False, view=CircleListCreateView.as_view(), read=None, token=None, user=None):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            if user:
+                request.user = user  # as DRF authentication does
+            if write:
+                router.db_for_write(Circle)
+            return HttpResponse((read or (lambda: router.db_for_read(Circle)))() or 'default')
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        auth = {} if token == '' else {'HTTP_AUTHORIZATION': f'Bearer {token or self.token}'}
+        request = getattr(self.factory, method)('/', **auth)
+        return middleware(request).content.decode()
+
+    def test_safe_reads_use_replica(self):
+        self.assertEqual(self.route(), 'replica')
+
+    def test_unsafe_methods_and_unflagged_views_use_primary(self):
+        self.assertEqual(self.route('post'), 'default')
+        self.assertEqual(self.route(view=lambda request: None), 'default')
+
+    def test_write_pins_request_and_client(self):
+        self.assertEqual(self.route(write=True), 'default')
+        self.assertEqual(self.route(), 'default')
+        cache.clear()  # pin window over
+        self.assertEqual(self.route(), 'replica')
+
+    def test_forged_token_cannot_pin_or_unpin(self):
+        header, payload, signature = self.token.split('.')
+        forged = f"{header}.{payload}.{signature[::-1]}"  # user 7's claims, not signed by us
+        self.route(write=True, token=forged)
+        self.assertEqual(self.route(), 'replica')
+
+        self.route(write=True)
+        self.assertEqual(self.route(token=forged), 'replica')  # unverified: not read as user 7
+        self.assertEqual(self.route(), 'default')
+
+    def test_pins_authenticated_user_or_anonymous_ip(self):
+        self.route(write=True, token='', user=SimpleNamespace(is_authenticated=True, pk=7))
+        self.assertEqual(self.route(), 'default')
+
+        cache.clear()
+        self.route(write=True, token='')  # anonymous: keyed by IP
+        self.assertEqual(self.route(token=''), 'default')
+        self.assertEqual(self.route(), 'replica')
+
+    def test_cache_fills_read_from_primary(self):
+        view = CircleDetailView.as_view()
+        self.assertEqual(self.route(view=view), 'replica')
+
+        def fill():
+            return cached('circle', 1, lambda: router.db_for_read(Circle) or 'default', 60)
+
+        self.assertEqual(self.route(view=view, read=fill), 'default')
+        self.assertEqual(self.route(view=view, read=lambda: (fill(), router.db_for_read(Circle))[1]), 'replica')
+
+
+class CircleCounterTests(TestCase):
+
+    def setUp(self):
+        User = get_user_model()
+        self.owner = User.objects.create_user(username='counter-owner', password='pass1234')
+        self.member = User.objects.create_user(username='counter-member', password='pass1234')
+        Wallet.objects.create(user=self.member)
+        self.circle = Circle.objects.create(name='Counters', creator=self.owner, contribution_amount=Decimal('100'))
+        Membership.objects.create(user=self.owner, circle=self.circle)
+        self.membership = Membership.objects.create(user=self.member, circle=self.circle)
+        Contribution.objects.create(user=self.member, circle=self.circle, amount=Decimal('100'))
+        Contribution.objects.create(user=self.owner, circle=self.circle, amount=Decimal('150'))
+
+    def counters(self):
+        self.circle.refresh_from_db()
+        return self.circle.member_count, self.circle.active_member_count, self.circle.total_contributed
+
+    def test_counters_follow_memberships_and_refunds(self):
+        self.assertEqual(self.counters(), (2, 2, Decimal('250')))
+        stale = Circle.objects.get(pk=self.circle.pk)
+
+        Circle.objects.filter(pk=self.circle.pk).update(balance=Decimal('250'))
+        refund_and_remove_member(Membership.objects.get(pk=self.membership.pk))
+        self.assertEqual(self.counters(), (2, 1, Decimal('150')))
+
+        # Saving an instance loaded before the refund doesn't write its old counts back
+        stale.name = 'Renamed'
+        stale.save()
+        self.assertEqual(self.counters(), (2, 1, Decimal('150')))
+
+        Membership.objects.get(pk=self.membership.pk).delete()
+        self.assertEqual(self.counters(), (1, 1, Decimal('150')))
+
+    def test_refund_subtracts_what_it_refunds(self):
+        def contribute_meanwhile(sender, instance, **kwargs):
+            pre_save.disconnect(contribute_meanwhile, sender=Wallet)
+            Contribution.objects.create(user=self.member, circle=self.circle, amount=Decimal('40'))
+
+        Circle.objects.filter(pk=self.circle.pk).update(balance=Decimal('250'))
+        pre_save.connect(contribute_meanwhile, sender=Wallet)  # the refund's wallet credit
+        self.addCleanup(pre_save.disconnect, contribute_meanwhile, sender=Wallet)
+        refund_and_remove_member(Membership.objects.get(pk=self.membership.pk))
+
+        self.assertEqual(self.counters(), (2, 1, Decimal('190')))
+        self.assertFalse(Contribution.objects.get(amount=Decimal('40')).refunded)
+        rebuild_counters([self.circle.pk])
+        self.assertEqual(self.counters(), (2, 1, Decimal('190')))
+
+    def test_rebuild_circle_counters(self):
+        Circle.objects.filter(pk=self.circle.pk).update(member_count=0, active_member_count=9, total_contributed=1)
+        call_command('rebuild_circle_counters', stdout=StringIO())
+        self.assertEqual(self.counters(), (2, 2, Decimal('250')))
+
+    def test_rebuilds_in_bounded_batches(self):
+        others = [
+            Circle.objects.create(name=f'Empty {i}', creator=self.owner, contribution_amount=Decimal('10')) for i in range(4)
+        ]
+        Circle.objects.update(member_count=7)
+        CircleStats.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(rebuild_counters(batch_size=2), 5)
+            self.assertEqual(rebuild_stats(batch_size=2), 5)
+        self.assertEqual(self.counters(), (2, 2, Decimal('250')))
+        self.assertEqual(sorted(Circle.objects.values_list('member_count', flat=True)), [0, 0, 0, 0, 2])
+        self.assertEqual(CircleStats.objects.count(), 5)
+        id_lists = [ids for q in captured for ids in re.findall(r'"circle(?:s_circle"\."id|_id)" IN \(([^)]*)\)', q['sql'])]
+        self.assertTrue(id_lists)
+        self.assertTrue(all(len(ids.split(',')) <= 2 for ids in id_lists), id_lists)
+
+        # Explicit ids: unknown ones are skipped
+        self.assertEqual(rebuild_counters([others[0].pk, others[1].pk, 10 ** 6], batch_size=2), 2)
+
+
+class CircleStatsTests(TestCase):
+    """Incremental CircleStats updates must land where a full rebuild_stats would."""
+
+    def setUp(self):
+        User = get_user_model()
+        self.users = [User.objects.create_user(username=f'stats{i}', password='pass1234') for i in range(4)]
+        self.circles = [
+            Circle.objects.create(name=f'Stats {i}', creator=self.users[0], contribution_amount=Decimal('100'))
+            for i in range(2)
+        ]
+        for user in self.users:
+            for circle in self.circles:
+                Membership.objects.create(user=user, circle=circle)
+        HealthProfile.objects.filter(user=self.users[1]).update(height_cm=170, weight_kg=80, conditions=['Asthma'])
+        rebuild_stats()
+
+    def stats(self):
+        return [
+            {field: getattr(stats, field) for field in STATS_FIELDS}
+            for stats in CircleStats.objects.order_by('circle_id')
+        ]
+
+    def assertMatchesRebuild(self):
+        incremental = self.stats()
+        rebuild_stats()
+        self.assertEqual(incremental, self.stats())
+        return incremental
+
+    def test_profile_edits_from_stale_copies(self):
+        first = HealthProfile.objects.get(user=self.users[1])
+        second = HealthProfile.objects.get(user=self.users[1])  # e.g. another request, loaded at the same time
+
+        first.conditions = ['Diabetes', 'Asthma']
+        first.risk_level = 'medium'
+        first.save()
+        second.weight_kg = 95
+        second.conditions = ['Hypertension']
+        second.risk_level = 'high'
+        second.save()
+
+        stats = self.assertMatchesRebuild()[0]
+        self.assertEqual(stats['condition_counts'], {'Hypertension': 1})
+        self.assertEqual((stats['risk_high'], stats['risk_medium']), (1, 0))
+
+    def test_deactivation_from_stale_copies(self):
+        first = Membership.objects.get(user=self.users[2], circle=self.circles[0])
+        second = Membership.objects.get(pk=first.pk)
+        for membership in (first, second):
+            membership.is_active = False
+            membership.save()
+
+        self.assertEqual(self.assertMatchesRebuild()[0]['member_count'], 3)
+        self.circles[0].refresh_from_db()
+        self.assertEqual((self.circles[0].member_count, self.circles[0].active_member_count), (4, 3))
+
+        second.is_active = True
+        second.save()
+        self.assertEqual(self.assertMatchesRebuild()[0]['member_count'], 4)
+
+    def test_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Membership.objects.get(user=self.users[3], circle=self.circles[0]).delete()
+        self.assertEqual([stats['member_count'] for stats in self.assertMatchesRebuild()], [3, 4])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            HealthProfile.objects.get(user=self.users[1]).delete()
+        self.assertEqual(self.assertMatchesRebuild()[1]['condition_counts'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.users[2].delete()
+        self.assertEqual([stats['member_count'] for stats in self.assertMatchesRebuild()], [2, 3])
@@ -4,7 +4,8 @@ from .views import (
     CircleDetailView,
     ContributionView,
     ClaimCreateView,
-    MembershipListView
+    MembershipListView,
+    CircleStatsView,
 )
 
 urlpatterns = [
@@ -13,4 +14,5 @@ urlpatterns = [
     path('<int:circle_id>/members/', MembershipListView.as_view(), name='circle-members'),
     path('<int:circle_id>/contribute/', ContributionView.as_view(), name='contribute'),
     path('<int:circle_id>/claim/', ClaimCreateView.as_view(), name='create-claim'),
+    path('<int:circle_id>/stats/', CircleStatsView.as_view(), name='circle-stats'),
 ]
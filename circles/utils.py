@@ -1,20 +1,21 @@
-import base64
-import json
 from datetime import timedelta
 from django.utils import timezone
-from openai import OpenAI
 from django.conf import settings
+from HealthBackEnd.ratelimit import RateLimited
+from chatbot.images import encode_image
+from chatbot.llm import json_completion
+from chatbot.routing import route_request
+from healthSubs.profiles import get_profile_data
 from .models import Claim
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
-
 def validate_claim(claim):
     """AI claim verification with receipt OCR and fraud checks"""
     # Hardcoded fraud rules
     if claim.amount > 5000:
         return False, "Claim exceeds maximum allowed amount (5000)"
 
-    if claim.user.health_profile.risk_level == 'high' and claim.amount > 2000:
+    profile = get_profile_data(claim.user_id)
+    if profile.get('risk_level') == 'high' and claim.amount > 2000:
         return False, "High-risk users have lower claim limits"
 
     recent_claims = Claim.objects.filter(
@@ -39,33 +40,30 @@ def validate_claim(claim):
         CLAIM DETAILS:
         - Amount: {claim.amount}
         - Reason: {claim.reason}
-        - User Health Conditions: {claim.user.health_profile.conditions}
+        - User Health Conditions: {profile.get('conditions', [])}
         """
     })
 
     if claim.receipt:
         try:
             with claim.receipt.open('rb') as image_file:
-                base64_image = base64.b64encode(image_file.read()).decode('utf-8')
+                receipt_image = encode_image(image_file, max_dimension=settings.RECEIPT_IMAGE_MAX_DIMENSION)
 
             messages.append({
                 "role": "user",
                 "content": [
-                    {"type": "image_url", "image_url": f"data:image/jpeg;base64,{base64_image}"},
+                    {"type": "image_url", "image_url": receipt_image},
                     {"type": "text", "text": "Verify: 1. Amount matches 2. Date is recent 3. Items match claim reason"}
                 ]
             })
         except Exception as e:
             return False, f"Receipt processing failed: {str(e)}"
 
+    route = route_request(kind='claim', has_image=bool(claim.receipt))
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=messages,
-            response_format={"type": "json_object"},
-            temperature=0.1
-        )
-        result = json.loads(response.choices[0].message.content)
+        result = json_completion(messages, route, temperature=0.1)
+    except RateLimited:
+        raise
     except Exception as e:
         return False, f"AI verification error: {str(e)}"
 
@@ -1,32 +1,78 @@
 from rest_framework import generics, status, serializers
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.conf import settings
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
 from django.utils import timezone
 from .models import Circle, Contribution, Claim, Membership
-from .serializers import CircleSerializer, ContributionSerializer, ClaimSerializer, MembershipSerializer
+from .serializers import CircleSerializer, CircleStatsSerializer, ContributionSerializer, ClaimSerializer, MembershipSerializer
+from .stats import get_stats
+from HealthBackEnd.cache import cached
+from HealthBackEnd.conditional import ConditionalGetMixin, aggregate_stamp, version_stamp
+from HealthBackEnd.fieldsets import SparseQuerysetMixin, parse_fieldset, sparse_data
+from auths.authentication import ClaimsAuthMixin
 from wallets.models import Wallet, Transaction
 from .utils import validate_claim
+from HealthBackEnd.ratelimit import RateLimited, admit_llm_request, estimate_tokens
+from monitoring.metrics import CLAIMS_PROCESSED
 
-class CircleListCreateView(generics.ListCreateAPIView):
+class CircleListCreateView(ConditionalGetMixin, SparseQuerysetMixin, ClaimsAuthMixin, generics.ListCreateAPIView):
+    read_replica = True
     serializer_class = CircleSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Circle.objects.filter(members=self.request.user)
+        return Circle.objects.filter(members__id=self.request.user.id).prefetch_related('members', 'contributions', 'claims')
+
+    def get_version_stamp(self, request):
+        circle_ids = Membership.objects.filter(user_id=request.user.id).values_list('circle_id', flat=True)
+        return aggregate_stamp('circle', set(circle_ids))
 
     def perform_create(self, serializer):
         circle = serializer.save(creator=self.request.user)
         Membership.objects.create(user=self.request.user, circle=circle)
 
 
-class CircleDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CircleDetailView(ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
+    read_replica = True
     serializer_class = CircleSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Circle.objects.filter(members=self.request.user)
+        return Circle.objects.filter(members=self.request.user).prefetch_related('members', 'contributions', 'claims')
+
+    def check_member(self):
+        if not getattr(self, 'member_checked', False):
+            if not Membership.objects.filter(circle_id=self.kwargs['pk'], user_id=self.request.user.id).exists():
+                raise Http404
+            self.member_checked = True
+
+    def get_version_stamp(self, request):
+        self.check_member()  # no 304s for non-members
+        return version_stamp('circle', self.kwargs['pk'])
+
+    def retrieve(self, request, *args, **kwargs):
+        """Served from the versioned circle cache once membership is checked"""
+        circle_id = self.kwargs['pk']
+        self.check_member()
+        data = cached('circle', circle_id, lambda: _circle_data(circle_id), settings.CIRCLE_CACHE_TIMEOUT)
+        if data is None:
+            raise Http404
+        return Response(sparse_data(data, *parse_fieldset(request)))
+
+
+def _circle_data(circle_id):
+    circle = Circle.objects.filter(pk=circle_id).prefetch_related('members', 'contributions', 'claims').first()
+    return CircleSerializer(circle).data if circle else None
+
+
+def _member_data(circle_id):
+    if not Circle.objects.filter(pk=circle_id).exists():
+        return None
+    return MembershipSerializer(Membership.objects.filter(circle_id=circle_id), many=True).data
 
 
 class ContributionView(generics.CreateAPIView):
@@ -83,21 +129,31 @@ class ClaimCreateView(generics.CreateAPIView):
                 f"You cannot file claims within {circle.claim_lock_period} days of joining"
             )
 
+        admit_llm_request(
+            user_id=self.request.user.id,
+            tokens=estimate_tokens(self.request.data.get('reason'), has_image=bool(self.request.FILES.get('receipt'))),
+        )
+
         claim = serializer.save(user=self.request.user, circle=circle, status='pending')
         try:
             claim.full_clean()
-        except serializers.ValidationError as e:
+        except DjangoValidationError as e:
             claim.delete()  # Remove invalid claim
-            raise serializers.ValidationError(e.detail if hasattr(e, 'detail') else str(e))
+            raise serializers.ValidationError(e.messages)
 
         # AI validation
-        is_valid, reason = validate_claim(claim)
+        try:
+            is_valid, reason = validate_claim(claim)
+        except RateLimited:
+            claim.delete()  # Let the user resubmit without tripping the duplicate check
+            raise
 
         if is_valid:
             if claim.circle.balance < claim.amount:
                 claim.status = 'rejected'
                 claim.processed_at = timezone.now()
                 claim.save()
+                CLAIMS_PROCESSED.labels('rejected').inc()
                 raise serializers.ValidationError("Insufficient circle balance")
 
             with transaction.atomic():
@@ -118,17 +174,45 @@ class ClaimCreateView(generics.CreateAPIView):
                 claim.status = 'approved'
                 claim.processed_at = timezone.now()
                 claim.save()
+            CLAIMS_PROCESSED.labels('approved').inc()
         else:
             claim.status = 'rejected'
             claim.processed_at = timezone.now()
             claim.save()
+            CLAIMS_PROCESSED.labels('rejected').inc()
             raise serializers.ValidationError(f"Claim rejected: {reason}")
 
 
-class MembershipListView(generics.ListAPIView):
+class MembershipListView(ConditionalGetMixin, generics.ListAPIView):
+    read_replica = True
     serializer_class = MembershipSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_version_stamp(self, request):
+        return version_stamp('circle', self.kwargs['circle_id'])
+
     def get_queryset(self):
         circle = get_object_or_404(Circle, id=self.kwargs['circle_id'])
         return Membership.objects.filter(circle=circle)
+
+    def list(self, request, *args, **kwargs):
+        circle_id = self.kwargs['circle_id']
+        data = cached(
+            'circle_members', circle_id, lambda: _member_data(circle_id), settings.CIRCLE_CACHE_TIMEOUT, version='circle',
+        )
+        if data is None:
+            raise Http404
+        return Response(data)
+
+
+class CircleStatsView(ClaimsAuthMixin, generics.RetrieveAPIView):
+    """Risk mix, average BMI and conditions of a circle's active members (members only)"""
+    read_replica = True
+    serializer_class = CircleStatsSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        circle_id = self.kwargs['circle_id']
+        if not Membership.objects.filter(circle_id=circle_id, user_id=self.request.user.id, is_active=True).exists():
+            raise Http404
+        return get_stats(circle_id)
@@ -0,0 +1,27 @@
+import os
+import shutil
+
+# Prometheus multiprocess mode: each worker writes metrics to PROMETHEUS_MULTIPROC_DIR
+# and /metrics aggregates them. The directory must be empty when the server starts.
+
+
+def on_starting(server):
+    # Each worker would cache, and bump versions, in its own memory: writes served by one
+    # worker would never invalidate another's entries
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HealthBackEnd.settings')
+    from django.conf import settings
+    if server.cfg.workers > 1 and settings.CACHES['default']['BACKEND'].endswith('LocMemCache'):
+        raise RuntimeError(
+            f"{server.cfg.workers} workers with a per-process cache; set UPSTASH_REDIS_URL or run one worker"
+        )
+
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -1,3 +1,9 @@
 from django.contrib import admin
+from .models import RiskScoringVersion
 
-# Register your models here.
+
+@admin.register(RiskScoringVersion)
+class RiskScoringVersionAdmin(admin.ModelAdmin):
+    list_display = ['version', 'is_active', 'medium_threshold', 'high_threshold', 'created_at']
+    list_filter = ['is_active']
+    readonly_fields = ['created_at']
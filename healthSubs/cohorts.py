@@ -0,0 +1,126 @@
+from datetime import date
+from django.db.models import Exists, OuterRef, Q
+from circles.models import Membership
+from .models import HealthProfile
+
+# JSON list fields; each has a jsonb_path_ops GIN index, so `@>` containment is indexed
+LIST_FIELDS = ('conditions', 'medications', 'allergies', 'surgeries', 'family_history')
+BOOLEAN_FIELDS = ('is_smoker', 'alcohol_use', 'has_insurance')
+CHOICE_FIELDS = ('risk_level', 'gender', 'exercise_frequency', 'weight_category')
+MAX_PAGE_SIZE = 1000
+MAX_AGE = 150  # keeps date arithmetic in range
+
+
+class CohortError(ValueError):
+    pass
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)  # JSON true/false are ints in Python
+
+
+def _list_filter(field, spec):
+    """
+    `["Diabetes", "Asthma"]` or `{"all": [...], "any": [...], "none": [...]}`.
+    all/any become `field @> '["x"]'` (GIN-indexed); none is applied on top as a negation.
+    """
+    if isinstance(spec, list):
+        spec = {'all': spec}
+    if not isinstance(spec, dict) or set(spec) - {'all', 'any', 'none'}:
+        raise CohortError(f"{field}: expected a list or an object with all/any/none")
+    for key, values in spec.items():
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise CohortError(f"{field}.{key}: expected a list of strings")
+
+    q = Q()
+    if spec.get('all'):
+        q &= Q(**{f'{field}__contains': spec['all']})
+    if spec.get('any'):
+        any_q = Q()
+        for value in spec['any']:
+            any_q |= Q(**{f'{field}__contains': [value]})
+        q &= any_q
+    for value in spec.get('none', []):
+        q &= ~Q(**{f'{field}__contains': [value]})
+    return q
+
+
+def _years_ago(years):
+    today = date.today()
+    try:
+        return today.replace(year=today.year - years)
+    except ValueError:  # Feb 29
+        return today.replace(year=today.year - years, day=28)
+
+
+def build_cohort_filter(spec):
+    """
+    Turn a cohort spec into a Q over HealthProfile, e.g.
+    {"conditions": ["Hypertension"], "is_smoker": true, "risk_level": ["medium", "high"],
+     "age": {"min": 40}, "circle": 12}
+    """
+    if not isinstance(spec, dict):
+        raise CohortError("filter must be an object")
+    known = set(LIST_FIELDS) | set(BOOLEAN_FIELDS) | set(CHOICE_FIELDS) | {'age', 'circle'}
+    unknown = set(spec) - known
+    if unknown:
+        raise CohortError(f"Unknown filter field(s): {', '.join(sorted(unknown))}")
+
+    q = Q()
+    for field in LIST_FIELDS:
+        if field in spec:
+            q &= _list_filter(field, spec[field])
+
+    for field in BOOLEAN_FIELDS:
+        if field in spec:
+            if not isinstance(spec[field], bool):
+                raise CohortError(f"{field}: expected true or false")
+            q &= Q(**{field: spec[field]})
+
+    for field in CHOICE_FIELDS:
+        if field in spec:
+            values = spec[field] if isinstance(spec[field], list) else [spec[field]]
+            valid = {choice for choice, _ in HealthProfile._meta.get_field(field).choices}
+            if not all(isinstance(v, str) for v in values) or not set(values) <= valid:
+                raise CohortError(f"{field}: expected one of {', '.join(sorted(valid))}")
+            q &= Q(**{f'{field}__in': values})
+
+    if 'age' in spec:
+        age = spec['age']
+        if not isinstance(age, dict) or set(age) - {'min', 'max'} or not all(_is_int(v) for v in age.values()):
+            raise CohortError('age: expected {"min": int, "max": int}')
+        if not all(0 <= v <= MAX_AGE for v in age.values()):
+            raise CohortError(f"age: min and max must be between 0 and {MAX_AGE}")
+        if 'min' in age:
+            q &= Q(date_of_birth__lte=_years_ago(age['min']))
+        if 'max' in age:
+            q &= Q(date_of_birth__gt=_years_ago(age['max'] + 1))
+
+    if 'circle' in spec:
+        if not _is_int(spec['circle']):
+            raise CohortError("circle: expected a circle id")
+        q &= Q(Exists(Membership.objects.filter(user_id=OuterRef('user_id'), circle_id=spec['circle'], is_active=True)))
+    return q
+
+
+def run_cohort(spec, after=None, limit=100):
+    """
+    Count the profiles matching `spec` and return one page of their user ids in id order.
+    Pages are keyset-paginated: pass the returned `next` as `after` for the next page.
+    """
+    if not _is_int(limit) or not 1 <= limit <= MAX_PAGE_SIZE:
+        raise CohortError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    if after is not None and not _is_int(after):
+        raise CohortError("after must be a user id")
+
+    queryset = HealthProfile.objects.filter(build_cohort_filter(spec)).order_by()
+    count = queryset.count()
+    page = queryset
+    if after is not None:
+        page = page.filter(user_id__gt=after)
+    ids = list(page.order_by('user_id').values_list('user_id', flat=True)[:limit])
+    return {
+        'count': count,
+        'user_ids': ids,
+        'next': ids[-1] if len(ids) == limit else None,
+    }
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+from healthSubs.models import HealthProfile
+from healthSubs.scoring import rescore_profiles
+
+
+class Command(BaseCommand):
+    help = "Recompute risk_level for every health profile with a scoring version (default: the active one)"
+
+    def add_arguments(self, parser):
+        # Not --version: BaseCommand already defines that flag
+        parser.add_argument(
+            '--scoring-version', type=int, default=None, help="RiskScoringVersion.version to score with",
+        )
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--stale-only', action='store_true', help="Skip profiles already on this version")
+
+    def handle(self, *args, **options):
+        with tqdm(total=HealthProfile.objects.count(), desc='profiles', unit='rows') as progress:
+            scanned, updated = rescore_profiles(
+                version=options['scoring_version'],
+                chunk_size=options['chunk_size'],
+                stale_only=options['stale_only'],
+                progress=progress.update,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Scanned {scanned} profiles, updated {updated}"))
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-19 18:45
+
+from django.db import migrations, models
+
+
+def create_initial_version(apps, schema_editor):
+    # The weights previously hard-coded in HealthProfileAPI._calculate_risk_level
+    RiskScoringVersion = apps.get_model('healthSubs', 'RiskScoringVersion')
+    RiskScoringVersion.objects.create(
+        version=1,
+        condition_weights={'Diabetes': 3, 'Hypertension': 2, 'HIV/AIDS': 4, 'Cancer': 5, 'Asthma': 1},
+        family_weights={'Heart Disease': 2, 'Diabetes': 1, 'Cancer': 2},
+        lifestyle_weights={'smoker': 3, 'alcohol': 2, 'no_exercise': 2, 'short_sleep': 1, 'overweight': 1, 'obese': 2},
+        short_sleep_hours=6,
+        medium_threshold=4,
+        high_threshold=8,
+        is_active=True,
+        notes='Initial CDC-based weights',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthSubs', '0003_alter_healthprofile_date_of_birth'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskScoringVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(unique=True)),
+                ('condition_weights', models.JSONField(default=dict, help_text='{"Diabetes": 3, ...}')),
+                ('family_weights', models.JSONField(default=dict, help_text='{"Heart Disease": 2, ...}')),
+                ('lifestyle_weights', models.JSONField(default=dict, help_text='Keys: smoker, alcohol, no_exercise, short_sleep, overweight, obese')),
+                ('short_sleep_hours', models.PositiveSmallIntegerField(default=6, help_text='Sleep below this counts as short')),
+                ('medium_threshold', models.PositiveSmallIntegerField(default=4)),
+                ('high_threshold', models.PositiveSmallIntegerField(default=8)),
+                ('is_active', models.BooleanField(default=False)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-version'],
+            },
+        ),
+        migrations.AddField(
+            model_name='healthprofile',
+            name='scoring_version',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(create_initial_version, migrations.RunPython.noop),
+    ]
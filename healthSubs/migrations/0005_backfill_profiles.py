@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    # Profiles are now created at signup; give existing users without one an empty profile.
+    # risk_level is left blank: `manage.py rescore_profiles --stale-only` scores them.
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    HealthProfile = apps.get_model('healthSubs', 'HealthProfile')
+    missing = User.objects.filter(health_profile__isnull=True).values_list('pk', flat=True).iterator(chunk_size=5000)
+    batch = []
+    for user_id in missing:
+        batch.append(HealthProfile(user_id=user_id))
+        if len(batch) == 5000:
+            HealthProfile.objects.bulk_create(batch)
+            batch = []
+    HealthProfile.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthSubs', '0004_risk_scoring_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class AddPostgresIndexConcurrently(AddIndexConcurrently):
+    """
+    Builds the index without locking writes on a large table. GIN/jsonb_path_ops only
+    exists on Postgres, so other backends (SQLite in local dev) just record the state.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False  # CREATE INDEX CONCURRENTLY can't run inside a transaction
+
+    dependencies = [
+        ('healthSubs', '0005_backfill_profiles'),
+    ]
+
+    operations = [
+        AddPostgresIndexConcurrently(
+            model_name='healthprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=[field], name=f'profile_{field}_gin', opclasses=['jsonb_path_ops']),
+        )
+        for field in ('conditions', 'medications', 'allergies', 'surgeries', 'family_history')
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -72,12 +73,24 @@ class HealthProfile(models.Model):
 
     # Auto-generated
     risk_level = models.CharField(max_length=10, choices=RISK_LEVELS, blank=True)
+    scoring_version = models.PositiveIntegerField(null=True, blank=True, db_index=True)
     last_updated = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "Health Profile"
         verbose_name_plural = "Health Profiles"
         ordering = ['-last_updated']
+        # jsonb_path_ops GIN indexes serve the `@>` containment filters built by healthSubs.cohorts
+        indexes = [
+            GinIndex(fields=[field], opclasses=['jsonb_path_ops'], name=f'profile_{field}_gin')
+            for field in ('conditions', 'medications', 'allergies', 'surgeries', 'family_history')
+        ]
+
+    def save(self, *args, **kwargs):
+        # One transaction with the signals: circles.signals locks the row in pre_save and
+        # updates CircleStats in post_save, and the lock must last until both are written
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     @property
     def bmi(self):
@@ -86,4 +99,30 @@ class HealthProfile(models.Model):
         return round(self.weight_kg / ((self.height_cm/100) ** 2), 1)
 
     def __str__(self):
-        return f"{self.user.email}'s Health Profile"
\ No newline at end of file
+        return f"{self.user.email}'s Health Profile"
+
+
+class RiskScoringVersion(models.Model):
+    """
+    One set of risk weights. Profiles are scored with the newest active version;
+    activating a new one re-scores every profile in the background (see healthSubs.scoring).
+    """
+    version = models.PositiveIntegerField(unique=True)
+    condition_weights = models.JSONField(default=dict, help_text='{"Diabetes": 3, ...}')
+    family_weights = models.JSONField(default=dict, help_text='{"Heart Disease": 2, ...}')
+    lifestyle_weights = models.JSONField(
+        default=dict,
+        help_text='Keys: smoker, alcohol, no_exercise, short_sleep, overweight, obese'
+    )
+    short_sleep_hours = models.PositiveSmallIntegerField(default=6, help_text="Sleep below this counts as short")
+    medium_threshold = models.PositiveSmallIntegerField(default=4)
+    high_threshold = models.PositiveSmallIntegerField(default=8)
+    is_active = models.BooleanField(default=False)
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-version']
+
+    def __str__(self):
+        return f"Risk scoring v{self.version}{' (active)' if self.is_active else ''}"
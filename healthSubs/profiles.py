@@ -0,0 +1,20 @@
+from django.conf import settings
+from HealthBackEnd.cache import cached
+from .models import HealthProfile
+
+
+def _load_profile(user_id):
+    from .serializers import HealthProfileSerializer
+    try:
+        profile = HealthProfile.objects.get(user_id=user_id)
+    except HealthProfile.DoesNotExist:
+        return {}
+    return dict(HealthProfileSerializer(profile).data)
+
+
+def get_profile_data(user_id):
+    """
+    The user's serialized health profile, read through the versioned cache. Returns {} if
+    the user has no profile. The HealthProfile save/delete signals bump the version.
+    """
+    return cached('profile', user_id, lambda: _load_profile(user_id), settings.PROFILE_CACHE_TIMEOUT)
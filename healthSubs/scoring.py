@@ -0,0 +1,179 @@
+import logging
+import time
+from types import SimpleNamespace
+import numpy as np
+from django.core.cache import cache
+from django.dispatch import Signal
+from django.utils import timezone
+from .models import HealthProfile, RiskScoringVersion
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_RULES_CACHE_KEY = 'risk_scoring:active'
+
+# Sent after a batch re-score; bulk_update skips post_save, so listeners refresh derived data here
+profiles_rescored = Signal()
+
+LEVELS = np.array(['low', 'medium', 'high'])
+
+# Used while no version is active (the weights migration 0004 seeds as v1), so signup and
+# imports keep working; profiles scored with them get scoring_version=None.
+DEFAULT_WEIGHTS = {
+    'condition_weights': {'Diabetes': 3, 'Hypertension': 2, 'HIV/AIDS': 4, 'Cancer': 5, 'Asthma': 1},
+    'family_weights': {'Heart Disease': 2, 'Diabetes': 1, 'Cancer': 2},
+    'lifestyle_weights': {'smoker': 3, 'alcohol': 2, 'no_exercise': 2, 'short_sleep': 1, 'overweight': 1, 'obese': 2},
+    'short_sleep_hours': 6,
+    'medium_threshold': 4,
+    'high_threshold': 8,
+}
+
+# RiskScoringVersion fields that change scores; saving only other fields (e.g. notes) doesn't re-score
+WEIGHT_FIELDS = ('version', *DEFAULT_WEIGHTS, 'is_active')
+
+# Profile columns the scorer reads; also what the batch mode streams from the database.
+SCORED_FIELDS = (
+    'conditions', 'family_history', 'is_smoker', 'alcohol_use',
+    'exercise_frequency', 'sleep_hours', 'weight_category',
+)
+
+
+class ScoringRules:
+    """Weights from one RiskScoringVersion, in the array form the vectorized scorer uses."""
+
+    def __init__(self, version):
+        self.version = version.version
+        self.conditions = list(version.condition_weights)
+        self.condition_weights = np.array([version.condition_weights[c] for c in self.conditions], dtype=np.int32)
+        self.family = list(version.family_weights)
+        self.family_weights = np.array([version.family_weights[c] for c in self.family], dtype=np.int32)
+        lifestyle = version.lifestyle_weights
+        self.smoker = lifestyle.get('smoker', 0)
+        self.alcohol = lifestyle.get('alcohol', 0)
+        self.no_exercise = lifestyle.get('no_exercise', 0)
+        self.short_sleep = lifestyle.get('short_sleep', 0)
+        self.overweight = lifestyle.get('overweight', 0)
+        self.obese = lifestyle.get('obese', 0)
+        self.short_sleep_hours = version.short_sleep_hours
+        self.medium_threshold = version.medium_threshold
+        self.high_threshold = version.high_threshold
+
+
+def active_rules():
+    """
+    Rules of the newest active version, cached until a version is saved or deleted.
+    Falls back to DEFAULT_WEIGHTS when none is active.
+    """
+    rules = cache.get(ACTIVE_RULES_CACHE_KEY)
+    if rules is None:
+        version = RiskScoringVersion.objects.filter(is_active=True).first()
+        if version is None:
+            logger.warning("No active risk scoring version; using the default weights")
+            return ScoringRules(SimpleNamespace(version=None, **DEFAULT_WEIGHTS))
+        rules = ScoringRules(version)
+        cache.set(ACTIVE_RULES_CACHE_KEY, rules, None)
+    return rules
+
+
+def rules_for(version=None):
+    if version is None:
+        return active_rules()
+    return ScoringRules(RiskScoringVersion.objects.get(version=version))
+
+
+def _multi_hot(lists, vocabulary):
+    """Count of each vocabulary item per row; an item listed twice counts twice, as it always has."""
+    index = {name: i for i, name in enumerate(vocabulary)}
+    matrix = np.zeros((len(lists), len(vocabulary)), dtype=np.int32)
+    rows, cols = [], []
+    for row, items in enumerate(lists):
+        for item in items or ():
+            col = index.get(item)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+    np.add.at(matrix, (rows, cols), 1)
+    return matrix
+
+
+def score_columns(rules, columns):
+    """
+    Score many profiles at once. `columns` maps each name in SCORED_FIELDS to a list with
+    one entry per profile; returns (scores, levels) arrays.
+    """
+    scores = _multi_hot(columns['conditions'], rules.conditions) @ rules.condition_weights
+    scores += _multi_hot(columns['family_history'], rules.family) @ rules.family_weights
+
+    sleep = np.array([h if h is not None else -1 for h in columns['sleep_hours']])
+    exercise = np.array(columns['exercise_frequency'], dtype=object)
+    weight = np.array(columns['weight_category'], dtype=object)
+    scores += rules.smoker * np.array(columns['is_smoker'], dtype=bool)
+    scores += rules.alcohol * np.array(columns['alcohol_use'], dtype=bool)
+    scores += rules.no_exercise * (exercise == 'none')
+    scores += rules.short_sleep * ((sleep > 0) & (sleep < rules.short_sleep_hours))
+    scores += rules.overweight * (weight == 'overweight')
+    scores += rules.obese * (weight == 'obese')
+
+    levels = LEVELS[(scores >= rules.medium_threshold).astype(int) + (scores >= rules.high_threshold)]
+    return scores, levels
+
+
+def score_profile(profile, rules=None):
+    """(score, risk_level) for a single profile."""
+    rules = rules or active_rules()
+    columns = {field: [getattr(profile, field)] for field in SCORED_FIELDS}
+    scores, levels = score_columns(rules, columns)
+    return int(scores[0]), str(levels[0])
+
+
+def apply_risk(profile, rules=None):
+    """Set risk_level and scoring_version on `profile` (doesn't save)."""
+    rules = rules or active_rules()
+    profile.risk_level = score_profile(profile, rules)[1]
+    profile.scoring_version = rules.version
+
+
+def rescore_profiles(version=None, chunk_size=10000, stale_only=False, progress=None):
+    """
+    Re-score every profile with `version` (default: the active one). Streams profiles in
+    primary-key order, scores each chunk in one vectorized pass and writes back only the
+    rows whose level or version changed. Returns (scanned, updated).
+    """
+    rules = rules_for(version)
+    queryset = HealthProfile.objects.order_by('pk')
+    if stale_only:
+        queryset = queryset.exclude(scoring_version=rules.version)
+
+    start = time.perf_counter()
+    scanned = updated = 0
+    last_pk = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_pk)
+            .values_list('pk', 'risk_level', 'scoring_version', *SCORED_FIELDS)[:chunk_size]
+        )
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+        pks, old_levels, old_versions, *fields = zip(*rows)
+        _, levels = score_columns(rules, dict(zip(SCORED_FIELDS, fields)))
+
+        now = timezone.now()
+        changed = [
+            HealthProfile(pk=pk, risk_level=level, scoring_version=rules.version, last_updated=now)
+            for pk, level, old_level, old_version in zip(pks, levels.tolist(), old_levels, old_versions)
+            if level != old_level or old_version != rules.version
+        ]
+        HealthProfile.objects.bulk_update(changed, ['risk_level', 'scoring_version', 'last_updated'], batch_size=2000)
+
+        scanned += len(rows)
+        updated += len(changed)
+        if progress:
+            progress(len(rows))
+
+    if updated:
+        profiles_rescored.send(sender=HealthProfile, version=rules.version)
+    logger.info(
+        f"Re-scored profiles with v{rules.version}: {scanned} scanned, {updated} updated "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    return scanned, updated
@@ -1,12 +1,13 @@
 from rest_framework import serializers
 from .models import HealthProfile
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from HealthBackEnd.fieldsets import SparseFieldsetMixin
 
-class HealthProfileSerializer(serializers.ModelSerializer):
+class HealthProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = HealthProfile
         fields = '__all__'
-        read_only_fields = ('user', 'risk_level', 'last_updated')
+        read_only_fields = ('user', 'risk_level', 'scoring_version', 'last_updated')
     
     def validate(self, data):
         """Custom validation for medical data"""
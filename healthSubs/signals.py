@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from HealthBackEnd.cache import invalidate
+from .models import HealthProfile, RiskScoringVersion
+from .scoring import ACTIVE_RULES_CACHE_KEY, WEIGHT_FIELDS, apply_risk, profiles_rescored
+
+
+def _queue_rescore():
+    from .tasks import rescore_risk_levels
+    transaction.on_commit(lambda: rescore_risk_levels.delay())
+
+
+@receiver(pre_save, sender=RiskScoringVersion)
+def compare_scoring_version(sender, instance, raw=False, **kwargs):
+    """Note whether this save changes scores: new weights, or the version switched on/off."""
+    old = None if raw or instance.pk is None else (
+        RiskScoringVersion.objects.filter(pk=instance.pk).values(*WEIGHT_FIELDS).first()
+    )
+    instance._was_active = bool(old and old['is_active'])
+    instance._scores_changed = old is None or any(getattr(instance, f) != old[f] for f in WEIGHT_FIELDS)
+
+
+@receiver(post_save, sender=RiskScoringVersion)
+def activate_scoring_version(sender, instance, **kwargs):
+    cache.delete(ACTIVE_RULES_CACHE_KEY)
+    if getattr(instance, '_scores_changed', True) and (instance.is_active or getattr(instance, '_was_active', False)):
+        _queue_rescore()
+
+
+@receiver(post_delete, sender=RiskScoringVersion)
+def delete_scoring_version(sender, instance, **kwargs):
+    cache.delete(ACTIVE_RULES_CACHE_KEY)
+    if instance.is_active:
+        _queue_rescore()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def provision_profile(sender, instance, created, raw=False, **kwargs):
+    """Every user has a profile from signup on, so profile reads never need to create one."""
+    if created and not raw:
+        profile = HealthProfile(user=instance)
+        apply_risk(profile)
+        profile.save()
+
+
+@receiver([post_save, post_delete], sender=HealthProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    invalidate('profile', instance.user_id)
+
+
+@receiver(profiles_rescored)
+def invalidate_rescored_profiles(sender, **kwargs):
+    invalidate('profile')  # bulk_update skips post_save
@@ -0,0 +1,9 @@
+from celery import shared_task
+from .scoring import rescore_profiles
+
+
+@shared_task
+def rescore_risk_levels(version=None):
+    """Re-score every profile, e.g. after a new RiskScoringVersion is activated."""
+    scanned, updated = rescore_profiles(version=version)
+    return {'scanned': scanned, 'updated': updated}
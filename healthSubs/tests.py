@@ -1,3 +1,260 @@
-from django.test import TestCase
+import io
+from datetime import date
+from functools import partial
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, skipUnlessDBFeature
+from django.urls import reverse
+from rest_framework.test import APIClient
+from tqdm import tqdm
+from monitoring.testing import QueryBudgetTestCase
+from circles.models import Circle, Membership
+from .cohorts import CohortError, build_cohort_filter
+from .models import HealthProfile, RiskScoringVersion
+from .scoring import SCORED_FIELDS, active_rules, rescore_profiles, score_columns, score_profile
 
-# Create your tests here.
+
+class HealthProfileQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.fixtures['owner'])
+
+    def test_health_profile(self):
+        with self.assertWithinBudget('health-profile'):
+            response = self.client.get(reverse('health-profile'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_health_profile_not_modified(self):
+        etag = self.client.get(reverse('health-profile'))['ETag']
+        with self.assertWithinBudget('health-profile-not-modified'):
+            response = self.client.get(reverse('health-profile'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A batch re-score bypasses post_save but still invalidates cached profiles
+        profile = HealthProfile.objects.get(user=self.fixtures['owner'])
+        HealthProfile.objects.filter(pk=profile.pk).update(risk_level='high')
+        rescore_profiles()
+        response = self.client.get(reverse('health-profile'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['risk_level'], 'low')
+
+    def test_health_profile_update(self):
+        # The owner is in both fixture circles, so this also covers the two CircleStats updates
+        with self.assertWithinBudget('health-profile-update'):
+            response = self.client.patch(reverse('health-profile'), {'is_smoker': True}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['risk_level'], 'low')
+
+
+def legacy_risk_level(profile):
+    """HealthProfileAPI._calculate_risk_level before scoring moved to versioned rules (user-039)."""
+    risk_score = 0
+    condition_weights = {'Diabetes': 3, 'Hypertension': 2, 'HIV/AIDS': 4, 'Cancer': 5, 'Asthma': 1}
+    risk_score += sum(condition_weights.get(cond, 0) for cond in profile.conditions)
+    if profile.is_smoker: risk_score += 3
+    if profile.alcohol_use: risk_score += 2
+    if profile.exercise_frequency == 'none': risk_score += 2
+    if profile.sleep_hours and profile.sleep_hours < 6: risk_score += 1
+    family_weights = {'Heart Disease': 2, 'Diabetes': 1, 'Cancer': 2}
+    risk_score += sum(family_weights.get(cond, 0) for cond in profile.family_history)
+    if profile.weight_category == 'overweight': risk_score += 1
+    elif profile.weight_category == 'obese': risk_score += 2
+    if risk_score >= 8:
+        return 'high'
+    if risk_score >= 4:
+        return 'medium'
+    return 'low'
+
+
+class RiskScoringTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def profiles(self):
+        cases = [
+            {},
+            {'conditions': ['Asthma']},
+            {'conditions': ['Diabetes', 'Diabetes']},  # listed twice: counted twice
+            {'conditions': ['Asthma', 'Asthma', 'Asthma', 'Asthma']},
+            {'conditions': ['Cancer', 'Unknown'], 'family_history': ['Cancer', 'Cancer']},
+            {'family_history': ['Heart Disease', 'Diabetes', 'Stroke']},
+            {'is_smoker': True, 'alcohol_use': True},
+            {'exercise_frequency': 'none', 'sleep_hours': 5, 'weight_category': 'overweight'},
+            {'sleep_hours': 0, 'weight_category': 'obese', 'conditions': ['Hypertension']},
+            {'sleep_hours': 6, 'is_smoker': True, 'conditions': ['HIV/AIDS', 'HIV/AIDS']},
+        ]
+        defaults = {
+            'conditions': [], 'family_history': [], 'is_smoker': False, 'alcohol_use': False,
+            'exercise_frequency': 'daily', 'sleep_hours': None, 'weight_category': 'healthy',
+        }
+        return [HealthProfile(**{**defaults, **case}) for case in cases]
+
+    def assertMatchesLegacy(self):
+        profiles = self.profiles()
+        expected = [legacy_risk_level(profile) for profile in profiles]
+        self.assertEqual([score_profile(profile)[1] for profile in profiles], expected)
+        columns = {field: [getattr(profile, field) for profile in profiles] for field in SCORED_FIELDS}
+        self.assertEqual(score_columns(active_rules(), columns)[1].tolist(), expected)
+        self.assertEqual(len(set(expected)), 3)
+
+    def test_matches_legacy_scorer(self):
+        self.assertEqual(active_rules().version, 1)
+        self.assertMatchesLegacy()
+
+    def test_no_active_version_uses_defaults(self):
+        RiskScoringVersion.objects.update(is_active=False)
+        cache.clear()
+        self.assertIsNone(active_rules().version)
+        self.assertMatchesLegacy()
+
+        user = get_user_model().objects.create_user(username='no-version', password='pass')
+        profile = HealthProfile.objects.get(user=user)
+        self.assertEqual((profile.risk_level, profile.scoring_version), ('low', None))
+
+    @mock.patch('healthSubs.tasks.rescore_risk_levels.delay')
+    def test_rescores_only_when_scores_change(self, delay):
+        active = RiskScoringVersion.objects.get(is_active=True)
+
+        def saved(version, **changes):
+            delay.reset_mock()
+            for field, value in changes.items():
+                setattr(version, field, value)
+            with self.captureOnCommitCallbacks(execute=True):
+                version.save()
+            return delay.called
+
+        self.assertFalse(saved(active, notes='Reviewed'))
+        self.assertTrue(saved(active, medium_threshold=5))
+        self.assertEqual(active_rules().medium_threshold, 5)
+
+        draft = RiskScoringVersion(version=2, **{f: getattr(active, f) for f in ('condition_weights', 'family_weights')})
+        self.assertFalse(saved(draft))  # inactive drafts don't affect anyone
+        self.assertFalse(saved(draft, high_threshold=9))
+        self.assertTrue(saved(draft, is_active=True))
+        self.assertEqual(active_rules().version, 2)
+        self.assertTrue(saved(draft, is_active=False))  # back to v1
+        self.assertEqual(active_rules().version, 1)
+
+    def rescore(self, *args):
+        out = io.StringIO()
+        with mock.patch('healthSubs.management.commands.rescore_profiles.tqdm', partial(tqdm, disable=True)):
+            call_command('rescore_profiles', *args, stdout=out)
+        return out.getvalue().strip()
+
+    def test_rescore_command(self):
+        users = [get_user_model().objects.create_user(username=f'rescore{i}', password='pass') for i in range(3)]
+        backfilled = HealthProfile.objects.filter(user=users[0])
+        backfilled.update(risk_level='', scoring_version=None)  # as left by the 0005 backfill
+
+        self.assertEqual(self.rescore('--stale-only'), "Scanned 1 profiles, updated 1")
+        self.assertEqual(backfilled.values_list('risk_level', 'scoring_version').get(), ('low', 1))
+
+        v1 = RiskScoringVersion.objects.get(version=1)
+        RiskScoringVersion.objects.create(
+            version=2, condition_weights=v1.condition_weights, family_weights=v1.family_weights,
+            lifestyle_weights=v1.lifestyle_weights, medium_threshold=0, high_threshold=100,
+        )
+        self.assertEqual(self.rescore('--scoring-version', '2'), "Scanned 3 profiles, updated 3")
+        self.assertEqual(set(HealthProfile.objects.values_list('risk_level', 'scoring_version')), {('medium', 2)})
+
+
+class CohortFilterTests(SimpleTestCase):
+
+    def test_rejects_malformed_specs(self):
+        invalid = [
+            [],
+            {'blood_type': 'O'},
+            {'conditions': 'Diabetes'},
+            {'conditions': {'some': ['Diabetes']}},
+            {'conditions': {'any': ['Diabetes', 3]}},
+            {'is_smoker': 'yes'},
+            {'is_smoker': 1},
+            {'risk_level': ['medium', 'severe']},
+            {'risk_level': [{'in': 'high'}]},
+            {'age': 40},
+            {'age': {'min': '40'}},
+            {'age': {'min': True}},  # bool is an int subclass
+            {'age': {'over': 40}},
+            {'age': {'max': 5000}},  # past date.min
+            {'age': {'min': -1}},
+            {'circle': True},
+            {'circle': '12'},
+        ]
+        for spec in invalid:
+            with self.subTest(spec=spec), self.assertRaises(CohortError):
+                build_cohort_filter(spec)
+
+    def test_accepts_valid_specs(self):
+        build_cohort_filter({
+            'conditions': {'all': ['Hypertension'], 'any': ['Diabetes', 'Asthma'], 'none': ['Cancer']},
+            'allergies': ['Penicillin'], 'is_smoker': False, 'risk_level': 'high',
+            'gender': ['M', 'F'], 'age': {'min': 40, 'max': 65}, 'circle': 12,
+        })
+        build_cohort_filter({'age': {'min': 0, 'max': 150}})
+
+
+class CohortQueryAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_user(username='analyst', password='pass', is_staff=True)
+        cls.users = [User.objects.create_user(username=f'member{i}', password='pass') for i in range(6)]
+        today = date.today()
+        for i, user in enumerate(cls.users):
+            HealthProfile.objects.filter(user=user).update(
+                is_smoker=i % 2 == 0,
+                date_of_birth=today.replace(year=today.year - 30 - 5 * i),
+                conditions=['Hypertension', 'Diabetes'] if i < 3 else ['Asthma'],
+            )
+        cls.circle = Circle.objects.create(name='Cohort', creator=cls.users[0], contribution_amount=100)
+        Membership.objects.bulk_create(
+            [Membership(user=user, circle=cls.circle, is_active=user != cls.users[4]) for user in cls.users[2:]]
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def query(self, spec, **params):
+        return self.client.post(reverse('health-cohorts'), {'filter': spec, **params}, format='json')
+
+    def ids(self, *indexes):
+        return [self.users[i].id for i in indexes]
+
+    def test_filters_and_pages(self):
+        response = self.query({'is_smoker': True})
+        self.assertEqual(response.data, {'count': 3, 'user_ids': self.ids(0, 2, 4), 'next': None})
+
+        # Ages 30..55; members 2-5 (4 inactive)
+        response = self.query({'age': {'min': 40}, 'circle': self.circle.id})
+        self.assertEqual((response.data['count'], response.data['user_ids']), (3, self.ids(2, 3, 5)))
+
+        first = self.query({}, limit=4).data
+        self.assertEqual((first['count'], first['user_ids'], first['next']), (7, [self.admin.id, *self.ids(0, 1, 2)], self.users[2].id))
+        second = self.query({}, limit=4, after=first['next']).data
+        self.assertEqual((second['user_ids'], second['next']), (self.ids(3, 4, 5), None))
+
+    @skipUnlessDBFeature('supports_json_field_contains')
+    def test_list_fields(self):
+        response = self.query({'conditions': {'all': ['Diabetes'], 'none': ['Asthma']}, 'is_smoker': False})
+        self.assertEqual(response.data['user_ids'], self.ids(1))
+        response = self.query({'conditions': {'any': ['Asthma', 'Cancer']}})
+        self.assertEqual(response.data['user_ids'], self.ids(3, 4, 5))
+
+    def test_rejects_bad_requests(self):
+        for params in ({'limit': True}, {'limit': 0}, {'after': 'x'}, {'after': False}):
+            with self.subTest(params=params):
+                self.assertEqual(self.query({}, **params).status_code, 400)
+        for age in ({'min': True}, {'max': 5000}, {'min': -3}):
+            with self.subTest(age=age):
+                response = self.query({'age': age})
+                self.assertEqual(response.status_code, 400)
+                self.assertTrue(response.data['filter'].startswith('age:'))
+
+        self.client.force_authenticate(self.users[0])
+        self.assertEqual(self.query({}).status_code, 403)
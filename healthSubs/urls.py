@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import HealthProfileAPI
+from .views import CohortQueryAPI, HealthProfileAPI
 
 urlpatterns = [
     path('', HealthProfileAPI.as_view(), name='health-profile'),
+    path('cohorts/', CohortQueryAPI.as_view(), name='health-cohorts'),
 ]
\ No newline at end of file
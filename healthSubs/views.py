@@ -1,60 +1,65 @@
-from rest_framework import generics
-from rest_framework.permissions import IsAuthenticated
+from types import SimpleNamespace
+from rest_framework import generics, serializers
+from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
+from auths.authentication import ClaimsAuthMixin
+from HealthBackEnd.conditional import ConditionalGetMixin, version_stamp
+from HealthBackEnd.fieldsets import parse_fieldset, sparse_data
+from .cohorts import CohortError, run_cohort
 from .models import HealthProfile
 from .serializers import HealthProfileSerializer
+from .profiles import get_profile_data
+from .scoring import SCORED_FIELDS, active_rules, score_profile
 
-class HealthProfileAPI(generics.RetrieveUpdateAPIView):
+class HealthProfileAPI(ConditionalGetMixin, ClaimsAuthMixin, generics.RetrieveUpdateAPIView):
     serializer_class = HealthProfileSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ['get', 'put', 'patch']  # Disable delete
+    last_modified_field = 'last_updated'
+
+    def get_version_stamp(self, request):
+        return version_stamp('profile', request.user.id)
+
+    def get_last_modified(self, request):
+        return HealthProfile.objects.filter(user_id=request.user.id).values_list('last_updated', flat=True).first()
+
+    def retrieve(self, request, *args, **kwargs):
+        """Served from the per-user profile cache"""
+        data = get_profile_data(request.user.id)
+        if not data:
+            return Response(self.get_serializer(self.get_object()).data)
+        return Response(sparse_data(data, *parse_fieldset(request)))
 
     def get_object(self):
-        """Get or create profile for authenticated user"""
-        return HealthProfile.objects.get_or_create(user=self.request.user)[0]
+        """Profiles are created at signup; create one only for users that predate that"""
+        try:
+            return HealthProfile.objects.get(user_id=self.request.user.id)
+        except HealthProfile.DoesNotExist:
+            return HealthProfile.objects.get_or_create(user_id=self.request.user.id)[0]
 
     def perform_update(self, serializer):
-        """Auto-calculate risk level on update"""
-        instance = serializer.save()
-        self._calculate_risk_level(instance)
-
-    def _calculate_risk_level(self, profile):
-        """Medical-grade risk assessment"""
-        risk_score = 0
-        
-        # Medical Conditions (CDC weights)
-        condition_weights = {
-            'Diabetes': 3,
-            'Hypertension': 2,
-            'HIV/AIDS': 4,
-            'Cancer': 5,
-            'Asthma': 1
-        }
-        risk_score += sum(condition_weights.get(cond, 0) for cond in profile.conditions)
-
-        # Lifestyle Factors
-        if profile.is_smoker: risk_score += 3
-        if profile.alcohol_use: risk_score += 2
-        if profile.exercise_frequency == 'none': risk_score += 2
-        if profile.sleep_hours and profile.sleep_hours < 6: risk_score += 1
-
-        # Family History
-        family_weights = {
-            'Heart Disease': 2,
-            'Diabetes': 1,
-            'Cancer': 2
-        }
-        risk_score += sum(family_weights.get(cond, 0) for cond in profile.family_history)
-
-        # Weight Status
-        if profile.weight_category == 'overweight': risk_score += 1
-        elif profile.weight_category == 'obese': risk_score += 2
-
-        # Determine final level
-        if risk_score >= 8:
-            profile.risk_level = 'high'
-        elif risk_score >= 4:
-            profile.risk_level = 'medium'
-        else:
-            profile.risk_level = 'low'
-        
-        profile.save()
\ No newline at end of file
+        """Score the updated values first so the profile is written once, risk level included"""
+        rules = active_rules()
+        updated = SimpleNamespace(**{
+            field: serializer.validated_data.get(field, getattr(serializer.instance, field))
+            for field in SCORED_FIELDS
+        })
+        _, risk_level = score_profile(updated, rules)
+        serializer.save(risk_level=risk_level, scoring_version=rules.version)
+
+
+class CohortQueryAPI(APIView):
+    """Count and list profiles matching a cohort filter (staff only; see healthSubs.cohorts)"""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        try:
+            result = run_cohort(
+                request.data.get('filter', {}),
+                after=request.data.get('after'),
+                limit=request.data.get('limit', 100),
+            )
+        except CohortError as e:
+            raise serializers.ValidationError({'filter': str(e)})
+        return Response(result)
@@ -0,0 +1,103 @@
+"""
+Drive the API with concurrent virtual users and report per-endpoint latency.
+
+    python -m loadtest.run --base-url http://127.0.0.1:8000 --scenario full --users 20 --iterations 10
+
+Run the server with LLM_BACKEND=chatbot.fake_llm.FakeLLMClient so chat, claims and
+Twilio flows don't hit OpenAI. See LOADTEST_DOC.md.
+"""
+import argparse
+import json
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .scenarios import SCENARIOS, Client, Recorder
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[rank]
+
+
+def virtual_user(base_url, recorder, scenario, iterations, think_time):
+    setup, steps = SCENARIOS[scenario]
+    client = Client(base_url, recorder)
+    state = {}
+    for step in setup:
+        step(client, state)
+    for _ in range(iterations):
+        for step in steps:
+            step(client, state)
+            if think_time:
+                time.sleep(random.uniform(0, think_time))
+
+
+def summarize(recorder, elapsed):
+    rows = []
+    for name, samples in sorted(recorder.samples.items()):
+        latencies = sorted(ms for ms, _ in samples)
+        errors = sum(1 for _, status in samples if status is None or status >= 500)
+        client_errors = sum(1 for _, status in samples if status is not None and 400 <= status < 500)
+        rows.append({
+            "endpoint": name,
+            "requests": len(samples),
+            "rps": round(len(samples) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "max_ms": round(latencies[-1], 1),
+            "4xx": client_errors,
+            "errors": errors,
+        })
+    return rows
+
+
+def print_report(rows, elapsed):
+    header = f"{'endpoint':<34}{'reqs':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}{'4xx':>6}{'err':>6}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['endpoint']:<34}{row['requests']:>7}{row['rps']:>9}{row['p50_ms']:>9}"
+            f"{row['p95_ms']:>9}{row['p99_ms']:>9}{row['max_ms']:>9}{row['4xx']:>6}{row['errors']:>6}"
+        )
+    total = sum(row["requests"] for row in rows)
+    print("-" * len(header))
+    print(f"{total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="full")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=5, help="Scenario iterations per user")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause between steps (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    recorder = Recorder()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        futures = [
+            pool.submit(virtual_user, args.base_url, recorder, args.scenario, args.iterations, args.think_time)
+            for _ in range(args.users)
+        ]
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+
+    rows = summarize(recorder, elapsed)
+    print_report(rows, elapsed)
+    if args.json_path:
+        with open(args.json_path, "w") as fh:
+            json.dump({"scenario": args.scenario, "users": args.users, "elapsed_s": elapsed, "endpoints": rows}, fh, indent=2)
+
+
+if __name__ == "__main__":
+    main()
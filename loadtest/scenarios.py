@@ -0,0 +1,121 @@
+import itertools
+import random
+import threading
+import time
+import uuid
+import requests
+
+PASSWORD = "LoadTest#2025"
+
+CHAT_PROMPTS = [
+    "What are the early signs of malaria?",
+    "How much water should I drink every day?",
+    "Is it safe to take paracetamol with coartem?",
+    "How do I know if my blood pressure is high?",
+    "What foods help with diabetes?",
+]
+
+
+class Recorder:
+    """Collects (latency ms, status) per endpoint name from all virtual users."""
+
+    def __init__(self):
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, elapsed_ms, status):
+        with self.lock:
+            self.samples.setdefault(name, []).append((elapsed_ms, status))
+
+
+class Client:
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url.rstrip('/')
+        self.recorder = recorder
+        self.http = requests.Session()
+        self.token = None
+
+    def request(self, name, method, path, **kwargs):
+        headers = kwargs.pop('headers', {})
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        start = time.perf_counter()
+        try:
+            response = self.http.request(method, f"{self.base_url}{path}", headers=headers, timeout=60, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, None
+        self.recorder.record(name, (time.perf_counter() - start) * 1000, status)
+        return response
+
+
+_user_counter = itertools.count()
+RUN_ID = uuid.uuid4().hex[:6]
+
+
+def signup_login(client, state):
+    username = f"lt_{RUN_ID}_{next(_user_counter)}"
+    client.request("POST /user-auth/signup/", "POST", "/api/user-auth/signup/", json={
+        "username": username, "password": PASSWORD, "phone": "08000000000", "language": "English",
+    })
+    response = client.request("POST /user-auth/login/", "POST", "/api/user-auth/login/", json={
+        "username": username, "password": PASSWORD,
+    })
+    if response is not None and response.status_code == 200:
+        client.token = response.json()["access"]
+    client.request("GET /health-sub/", "GET", "/api/health-sub/")
+
+
+def wallet(client, state):
+    client.request("POST /wallet/ (topup)", "POST", "/api/wallet/", json={
+        "amount": 5000, "transaction_type": "topup", "description": "load test",
+    })
+    client.request("GET /wallet/", "GET", "/api/wallet/")
+
+
+def circles(client, state):
+    if "circle_id" not in state:
+        response = client.request("POST /circles/", "POST", "/api/circles/", json={
+            "name": f"Load test circle {RUN_ID}",
+            "contribution_amount": "100.00",
+            "frequency": "weekly",
+            "claim_lock_period": 0,
+        })
+        if response is None or response.status_code != 201:
+            return
+        state["circle_id"] = response.json()["id"]
+
+    circle_id = state["circle_id"]
+    client.request("POST /circles/<id>/contribute/", "POST", f"/api/circles/{circle_id}/contribute/", json={
+        "amount": "100.00",
+    })
+    client.request("GET /circles/", "GET", "/api/circles/")
+    client.request("GET /circles/<id>/", "GET", f"/api/circles/{circle_id}/")
+    client.request("GET /circles/<id>/members/", "GET", f"/api/circles/{circle_id}/members/")
+    client.request("POST /circles/<id>/claim/", "POST", f"/api/circles/{circle_id}/claim/", data={
+        "amount": "50.00", "reason": f"Clinic visit {uuid.uuid4().hex[:8]}",
+    })
+
+
+def chat(client, state):
+    client.request("POST /chatbot/", "POST", "/api/chatbot/", data={"prompt": random.choice(CHAT_PROMPTS)})
+
+
+def twilio(client, state):
+    client.request("POST /chatbot/twilio-hook/", "POST", "/api/chatbot/twilio-hook/", data={
+        "MessageSid": f"SM{uuid.uuid4().hex}",
+        "From": f"whatsapp:+234800{random.randint(0, 9999999):07d}",
+        "To": "whatsapp:+14155238886",
+        "Body": random.choice(CHAT_PROMPTS),
+    })
+
+
+# name -> (setup steps run once per virtual user, steps repeated every iteration)
+SCENARIOS = {
+    "auth": ([], [signup_login]),
+    "wallet": ([signup_login], [wallet]),
+    "circles": ([signup_login, wallet], [circles]),
+    "chat": ([signup_login], [chat]),
+    "twilio": ([], [twilio]),
+    "full": ([signup_login], [wallet, circles, chat, twilio]),
+}
@@ -0,0 +1,108 @@
+import contextvars
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from django.db import connections
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """DB, LLM and outbound HTTP work done while handling one request (or task)."""
+
+    def __init__(self):
+        self.db_count = 0
+        self.db_ms = 0.0
+        self.queries = defaultdict(lambda: [0, 0.0])  # sql -> [count, total ms]
+        self.llm_count = 0
+        self.llm_ms = 0.0
+        self.http_count = 0
+        self.http_ms = 0.0
+
+    def record_query(self, sql, elapsed_ms):
+        self.db_count += 1
+        self.db_ms += elapsed_ms
+        entry = self.queries[sql]
+        entry[0] += 1
+        entry[1] += elapsed_ms
+
+    def top_queries(self, limit=5):
+        """Slowest statements by total time; a high count on one statement usually means N+1."""
+        ranked = sorted(self.queries.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {"sql": sql[:300], "count": count, "total_ms": round(total_ms, 1)}
+            for sql, (count, total_ms) in ranked[:limit]
+        ]
+
+    def server_timing(self, total_ms):
+        return ", ".join([
+            f'db;dur={self.db_ms:.1f};desc="{self.db_count} queries"',
+            f'llm;dur={self.llm_ms:.1f};desc="{self.llm_count} calls"',
+            f'http;dur={self.http_ms:.1f};desc="{self.http_count} calls"',
+            f'total;dur={total_ms:.1f}',
+        ])
+
+    def as_log_fields(self):
+        return {
+            "db_queries": self.db_count,
+            "db_ms": round(self.db_ms, 1),
+            "llm_calls": self.llm_count,
+            "llm_ms": round(self.llm_ms, 1),
+            "http_calls": self.http_count,
+            "http_ms": round(self.http_ms, 1),
+        }
+
+
+def current_stats():
+    return _current.get()
+
+
+def record_llm_call(elapsed_ms):
+    stats = _current.get()
+    if stats is not None:
+        stats.llm_count += 1
+        stats.llm_ms += elapsed_ms
+
+
+def record_http_call(elapsed_ms):
+    stats = _current.get()
+    if stats is not None:
+        stats.http_count += 1
+        stats.http_ms += elapsed_ms
+
+
+@contextmanager
+def track_http():
+    """Time an outbound HTTP call against the current request."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_http_call((time.perf_counter() - start) * 1000)
+
+
+class _QueryTimer:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.stats.record_query(sql, (time.perf_counter() - start) * 1000)
+
+
+@contextmanager
+def collect():
+    """Collect RequestStats for everything run inside the block, on every DB alias."""
+    stats = RequestStats()
+    token = _current.set(stats)
+    timer = _QueryTimer(stats)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            yield stats
+    finally:
+        _current.reset(token)
@@ -0,0 +1,20 @@
+import json
+import logging
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Appends the `extra=` fields of a record as key=value pairs so they show up in plain logs."""
+
+    def format(self, record):
+        message = super().format(record)
+        fields = {key: value for key, value in vars(record).items() if key not in _RESERVED}
+        if not fields:
+            return message
+        pairs = " ".join(
+            f"{key}={json.dumps(value, default=str) if not isinstance(value, str) else value}"
+            for key, value in fields.items()
+        )
+        return f"{message} {pairs}"
@@ -0,0 +1,68 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from circles.models import Circle, Claim
+from circles.serializers import CircleSerializer, ClaimSerializer
+from healthSubs.models import HealthProfile
+from healthSubs.serializers import HealthProfileSerializer
+from HealthBackEnd.fieldsets import trim_queryset
+from HealthBackEnd.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    help = "Compare query + serialization time and payload size: full vs sparse fieldsets, DRF JSON vs orjson"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=200, help="Objects per serializer")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per case")
+        parser.add_argument('--circle-fields', default='id,name,balance,contribution_amount,frequency,claims.status')
+        parser.add_argument('--profile-fields', default='id,full_name,risk_level,last_updated')
+        parser.add_argument('--claim-fields', default='id,amount,status,created_at')
+
+    def handle(self, *args, **options):
+        if not Circle.objects.exists():
+            raise CommandError("No data to serialize; run generate_synthetic_data first")
+
+        limit = options['limit']
+        cases = [
+            ('circles', lambda: Circle.objects.prefetch_related('members', 'contributions', 'claims'),
+             CircleSerializer, options['circle_fields']),
+            ('profiles', lambda: HealthProfile.objects.all(), HealthProfileSerializer, options['profile_fields']),
+            ('claims', lambda: Claim.objects.all(), ClaimSerializer, options['claim_fields']),
+        ]
+
+        factory = APIRequestFactory()
+        for name, queryset, serializer_class, fields in cases:
+            for label, params in (('full', {}), ('sparse', {'fields': fields})):
+                request = Request(factory.get('/', params))
+                serializer = serializer_class(context={'request': request})
+
+                serialize_ms, queries = [], 0
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    with CaptureQueriesContext(connection) as captured:
+                        objects = list((trim_queryset(queryset(), serializer) if params else queryset()).order_by('pk')[:limit])
+                        data = serializer_class(objects, many=True, context={'request': request}).data
+                    serialize_ms.append((time.perf_counter() - start) * 1000)
+                    queries = len(captured)
+
+                render = {}
+                for renderer in (JSONRenderer(), ORJSONRenderer()):
+                    timings = []
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        body = renderer.render(data)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    render[type(renderer).__name__] = (statistics.median(timings), len(body))
+
+                (json_ms, json_bytes), (orjson_ms, _) = render['JSONRenderer'], render['ORJSONRenderer']
+                self.stdout.write(
+                    f"{name} {label}: {len(objects)} objects, {queries} queries, "
+                    f"query+serialize median {statistics.median(serialize_ms):.1f} ms, "
+                    f"render json {json_ms:.1f} ms / orjson {orjson_ms:.1f} ms, {json_bytes:,} B"
+                )
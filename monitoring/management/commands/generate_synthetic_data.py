@@ -0,0 +1,303 @@
+import io
+import json
+import multiprocessing
+import os
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, models, transaction
+from django.db.models import Max
+from tqdm import tqdm
+from circles.models import Circle, Claim, Contribution, Membership
+from healthSubs.models import HealthProfile
+from wallets.models import Transaction, Wallet
+
+User = get_user_model()
+
+LANGUAGES = ['English', 'English', 'English', 'Swahili', 'French', 'Amharic', 'Yoruba', 'Hausa']
+CONDITIONS = ['Diabetes', 'Hypertension', 'HIV/AIDS', 'Cancer', 'Asthma', 'Sickle Cell', 'Arthritis']
+FAMILY_HISTORY = ['Heart Disease', 'Diabetes', 'Cancer', 'Stroke']
+MEDICATIONS = ['Metformin', 'Lisinopril', 'Salbutamol', 'Amlodipine', 'ARVs', 'Insulin']
+ALLERGIES = ['Penicillin', 'Peanuts', 'Dust', 'Shellfish', 'Sulfa drugs']
+SURGERIES = ['Appendectomy', 'C-section', 'Hernia repair', 'Cataract surgery']
+OCCUPATIONS = ['Farmer', 'Trader', 'Teacher', 'Driver', 'Nurse', 'Student', 'Tailor', 'Mechanic']
+LOCATIONS = ['Nairobi', 'Lagos', 'Accra', 'Kampala', 'Addis Ababa', 'Kigali', 'Dar es Salaam']
+CLAIM_REASONS = ['Malaria treatment', 'Maternity care', 'Clinic consultation', 'Dental care', 'Lab tests',
+                 'Prescription refill', 'Minor surgery']
+FREQUENCY_DAYS = {'weekly': 7, 'monthly': 30}
+
+# Set in each worker (inherited over fork): everything a chunk needs besides its own arguments.
+_ctx = {}
+
+
+def _sample(rng, vocabulary, p):
+    """0-3 items, most people having none: gives the JSON fields realistic variety."""
+    if rng.random() > p:
+        return []
+    return rng.sample(vocabulary, rng.randint(1, 3))
+
+
+# --- inserting ---
+
+def _db_value(field, value):
+    if isinstance(field, models.JSONField):
+        return json.dumps(value)
+    return field.get_db_prep_save(value, connection)
+
+
+def _copy_text(value):
+    if value is None:
+        return r'\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def _insert(model, rows):
+    """Write dicts of attname -> value, filling unspecified fields with their defaults."""
+    if not rows:
+        return 0
+    fields = [f for f in model._meta.concrete_fields]
+    columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+    table = connection.ops.quote_name(model._meta.db_table)
+    defaults = {f.attname: f.get_default() for f in fields if f.attname not in rows[0]}
+    values = [
+        [_db_value(f, row[f.attname] if f.attname in row else defaults[f.attname]) for f in fields]
+        for row in rows
+    ]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            buffer = io.StringIO()
+            for row in values:
+                buffer.write('\t'.join(_copy_text(v) for v in row))
+                buffer.write('\n')
+            buffer.seek(0)
+            cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN', buffer)
+        else:
+            placeholders = ', '.join(['%s'] * len(fields))
+            cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', values)
+    return len(rows)
+
+
+# --- chunk generators (run in workers) ---
+
+def _user_chunk(args):
+    start, count = args
+    seed, epoch, password, base = _ctx['seed'], _ctx['epoch'], _ctx['password'], _ctx['base']
+    rng = random.Random(f'{seed}:users:{start}')
+    users, wallets, profiles = [], [], []
+    for i in range(start, start + count):
+        user_id = base['user'] + i + 1
+        joined = epoch - timedelta(days=rng.randint(0, 730), seconds=rng.randint(0, 86399))
+        users.append({
+            'id': user_id, 'password': password, 'username': f'user{user_id}', 'email': f'user{user_id}@example.com',
+            'first_name': '', 'last_name': '', 'is_superuser': False, 'is_staff': False, 'is_active': True,
+            'date_joined': joined, 'phone': f'+2547{user_id:08d}', 'language': rng.choice(LANGUAGES),
+        })
+        wallets.append({
+            'id': base['wallet'] + i + 1, 'user_id': user_id, 'balance': Decimal(rng.randint(0, 50000)),
+            'created_at': joined, 'updated_at': joined,
+        })
+        height = rng.randint(150, 195)
+        weight = rng.randint(45, 120)
+        bmi = weight / ((height / 100) ** 2)
+        profiles.append({
+            'id': base['profile'] + i + 1, 'user_id': user_id, 'full_name': f'User {user_id}',
+            'date_of_birth': (epoch - timedelta(days=rng.randint(18 * 365, 75 * 365))).date(),
+            'gender': rng.choice('MFO'), 'occupation': rng.choice(OCCUPATIONS), 'location': rng.choice(LOCATIONS),
+            'height_cm': height, 'weight_kg': weight,
+            'weight_category': 'underweight' if bmi < 18.5 else 'healthy' if bmi < 25 else 'overweight' if bmi < 30 else 'obese',
+            'conditions': _sample(rng, CONDITIONS, 0.3), 'medications': _sample(rng, MEDICATIONS, 0.25),
+            'allergies': _sample(rng, ALLERGIES, 0.15), 'surgeries': _sample(rng, SURGERIES, 0.1),
+            'family_history': _sample(rng, FAMILY_HISTORY, 0.4),
+            'is_smoker': rng.random() < 0.15, 'alcohol_use': rng.random() < 0.3,
+            'exercise_frequency': rng.choice(['none', '1-2', '3-5', 'daily']), 'sleep_hours': rng.randint(4, 9),
+            'has_insurance': rng.random() < 0.2, 'last_updated': joined,
+        })
+    with transaction.atomic():
+        _insert(User, users)
+        _insert(Wallet, wallets)
+        _insert(HealthProfile, profiles)
+    return count
+
+
+def _circle_chunk(plans):
+    """plans: (index, size, rounds, claims, membership_offset, contribution_offset, claim_offset) per circle."""
+    seed, epoch, base, n_users = _ctx['seed'], _ctx['epoch'], _ctx['base'], _ctx['users']
+    circles, memberships, contributions, claims = [], [], [], []
+    for index, size, rounds, n_claims, m_offset, c_offset, cl_offset in plans:
+        rng = random.Random(f'{seed}:circle:{index}')
+        circle_id = base['circle'] + index + 1
+        frequency = rng.choice(['weekly', 'weekly', 'monthly'])
+        amount = Decimal(rng.choice([50, 100, 200, 500, 1000]))
+        interval = timedelta(days=FREQUENCY_DAYS[frequency])
+        created = epoch - interval * rounds - timedelta(days=rng.randint(1, 30))
+        members = [base['user'] + u + 1 for u in rng.sample(range(n_users), size)]
+
+        active = 0
+        for j, user_id in enumerate(members):
+            is_active = rng.random() > 0.05
+            active += is_active
+            memberships.append({
+                'id': base['membership'] + m_offset + j + 1, 'user_id': user_id, 'circle_id': circle_id,
+                'join_date': created, 'payment_warnings': 0, 'is_active': is_active,
+                'last_contribution_date': created + interval * rounds if rounds else None,
+            })
+
+        c_id = base['contribution'] + c_offset
+        for r in range(rounds):
+            when = created + interval * (r + 1)
+            for user_id in members:
+                c_id += 1
+                contributions.append({
+                    'id': c_id, 'user_id': user_id, 'circle_id': circle_id, 'amount': amount,
+                    'timestamp': when, 'is_automatic': rng.random() < 0.7, 'refunded': False,
+                })
+
+        balance = amount * size * rounds
+        for k in range(n_claims):
+            claim_amount = Decimal(rng.randint(1, 10) * 100)
+            status = rng.choices(['approved', 'rejected', 'pending'], weights=[6, 3, 1])[0]
+            if status == 'approved' and claim_amount > balance:
+                status = 'rejected'
+            if status == 'approved':
+                balance -= claim_amount
+            filed = created + timedelta(days=rng.randint(30, max(31, (epoch - created).days)))
+            claims.append({
+                'id': base['claim'] + cl_offset + k + 1, 'user_id': rng.choice(members), 'circle_id': circle_id,
+                'amount': claim_amount, 'reason': rng.choice(CLAIM_REASONS), 'status': status, 'receipt': '',
+                'created_at': filed, 'processed_at': filed if status != 'pending' else None,
+            })
+
+        circles.append({
+            'id': circle_id, 'name': f'Circle {circle_id}', 'description': '', 'creator_id': members[0],
+            'contribution_amount': amount, 'frequency': frequency, 'balance': balance,
+            'created_at': created, 'updated_at': created, 'claim_lock_period': 30, 'min_balance_alert': amount * 2,
+            'member_count': size, 'active_member_count': active, 'total_contributed': amount * size * rounds,
+        })
+
+    with transaction.atomic():
+        _insert(Circle, circles)
+        _insert(Membership, memberships)
+        _insert(Contribution, contributions)
+        _insert(Claim, claims)
+    return len(plans)
+
+
+def _transaction_chunk(args):
+    start, count = args
+    seed, epoch, base, n_users = _ctx['seed'], _ctx['epoch'], _ctx['base'], _ctx['users']
+    rng = random.Random(f'{seed}:transactions:{start}')
+    rows = []
+    for i in range(start, start + count):
+        kind = rng.choices(['topup', 'withdrawal'], weights=[3, 2])[0]
+        rows.append({
+            'id': base['transaction'] + i + 1, 'wallet_id': base['wallet'] + rng.randrange(n_users) + 1,
+            'amount': Decimal(rng.randint(1, 200) * 50), 'transaction_type': kind,
+            'timestamp': epoch - timedelta(days=rng.randint(0, 700), seconds=rng.randint(0, 86399)),
+            'description': 'Wallet top-up' if kind == 'topup' else 'Circle contribution',
+        })
+    with transaction.atomic():
+        _insert(Transaction, rows)
+    return count
+
+
+def _init_worker(ctx):
+    _ctx.update(ctx)
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic benchmark-scale dataset (users, wallets, profiles, circles, ledger)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000)
+        parser.add_argument('--circles', type=int, default=100_000)
+        parser.add_argument('--members', type=str, default='5-30', help="Members per circle, min-max")
+        parser.add_argument('--contributions', type=int, default=20_000_000, help="Approximate total")
+        parser.add_argument('--transactions', type=int, default=10_000_000)
+        parser.add_argument('--claims-per-circle', type=float, default=3)
+        parser.add_argument('--scale', type=float, default=1.0, help="Multiply every volume, e.g. 0.001 for a quick run")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--epoch', type=str, default='2025-06-30', help="Newest timestamp in the data (YYYY-MM-DD)")
+        parser.add_argument('--password', type=str, default='password123', help="Password for every generated user")
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=5000, help="Users/transactions per chunk")
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        n_users = max(1, int(options['users'] * scale))
+        n_circles = int(options['circles'] * scale)
+        n_transactions = int(options['transactions'] * scale)
+        target_contributions = int(options['contributions'] * scale)
+        low, _, high = options['members'].partition('-')
+        low, high = int(low), int(high or low)
+        if high > n_users:
+            raise CommandError(f"--members upper bound {high} is more than the {n_users} users")
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write("SQLite allows one writer at a time; using a single worker")
+            workers = 1
+
+        # Explicit primary keys above whatever is already there, so the run is additive.
+        models_by_key = {
+            'user': User, 'wallet': Wallet, 'profile': HealthProfile, 'circle': Circle, 'membership': Membership,
+            'contribution': Contribution, 'claim': Claim, 'transaction': Transaction,
+        }
+        base = {key: model.objects.aggregate(m=Max('pk'))['m'] or 0 for key, model in models_by_key.items()}
+
+        # Circle plans are drawn up front so each chunk knows its primary-key ranges.
+        rng = random.Random(options['seed'])
+        sizes = [rng.randint(low, high) for _ in range(n_circles)]
+        avg_rounds = target_contributions / max(1, sum(sizes))
+        plans, m_offset, c_offset, cl_offset = [], 0, 0, 0
+        for index, size in enumerate(sizes):
+            rounds = rng.randint(0, max(0, round(2 * avg_rounds)))
+            n_claims = rng.randint(0, max(0, round(2 * options['claims_per_circle'])))
+            plans.append((index, size, rounds, n_claims, m_offset, c_offset, cl_offset))
+            m_offset += size
+            c_offset += size * rounds
+            cl_offset += n_claims
+
+        ctx = {
+            'seed': options['seed'],
+            'epoch': datetime.strptime(options['epoch'], '%Y-%m-%d').replace(tzinfo=dt_timezone.utc),
+            'password': make_password(options['password']),  # hashed once, shared by every user
+            'base': base,
+            'users': n_users,
+        }
+        batch = options['batch_size']
+        circle_batch = max(1, batch // max(1, (low + high) // 2))
+        phases = [
+            ('users', _user_chunk, [(s, min(batch, n_users - s)) for s in range(0, n_users, batch)], n_users),
+            ('circles', _circle_chunk, [plans[s:s + circle_batch] for s in range(0, n_circles, circle_batch)], n_circles),
+            ('transactions', _transaction_chunk,
+             [(s, min(batch, n_transactions - s)) for s in range(0, n_transactions, batch)], n_transactions),
+        ]
+
+        self.stdout.write(
+            f"Generating {n_users} users, {n_circles} circles, {m_offset} memberships, "
+            f"{c_offset} contributions, {cl_offset} claims, {n_transactions} transactions "
+            f"with {workers} worker(s)"
+        )
+        for name, func, chunks, total in phases:
+            with tqdm(total=total, desc=name, unit='rows') as progress:
+                if workers == 1:
+                    _init_worker(ctx)
+                    for chunk in chunks:
+                        progress.update(func(chunk))
+                else:
+                    connections.close_all()  # children must not share the parent's connection
+                    with multiprocessing.get_context('fork').Pool(workers, _init_worker, (ctx,)) as pool:
+                        for done in pool.imap_unordered(func, chunks):
+                            progress.update(done)
+
+        # Rows were inserted with explicit ids, so move the sequences past them.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(models_by_key.values())):
+                cursor.execute(sql)
+        self.stdout.write(self.style.SUCCESS("Done"))
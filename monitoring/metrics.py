@@ -0,0 +1,86 @@
+import os
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py) so every worker
+# writes to shared files and /metrics aggregates them.
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency by route',
+    ['route', 'method', 'status'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'DB queries per request by route',
+    ['route'], buckets=(1, 2, 5, 10, 20, 50, 100, 250, 1000),
+)
+
+TASK_DURATION = Histogram(
+    'celery_task_duration_seconds', 'Celery task run time',
+    ['task', 'outcome'], buckets=LATENCY_BUCKETS + (120, 300, 900),
+)
+
+LLM_LATENCY = Histogram(
+    'llm_request_duration_seconds', 'Upstream LLM call latency',
+    ['model', 'tier', 'outcome'], buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter('llm_tokens_total', 'LLM tokens used', ['model', 'kind'])
+LLM_ERRORS = Counter('llm_errors_total', 'Failed LLM calls', ['model', 'tier'])
+
+LEDGER_AMOUNT = Counter('ledger_amount_total', 'Money moved through wallet transactions', ['transaction_type'])
+LEDGER_TRANSACTIONS = Counter('ledger_transactions_total', 'Wallet transactions recorded', ['transaction_type'])
+CLAIMS_PROCESSED = Counter('claims_processed_total', 'Claims decided', ['status'])
+
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Versioned cache lookups (HealthBackEnd.cache) by result: hit, miss or early refresh',
+    ['namespace', 'result'],
+)
+CACHE_LATENCY = Histogram(
+    'cache_operation_duration_seconds', 'Versioned cache lookup (get) and fill (compute) time',
+    ['namespace', 'operation'], buckets=(0.0005, 0.001, 0.0025, 0.005) + LATENCY_BUCKETS,
+)
+
+
+def scrape_registry(*collectors):
+    """
+    Registry to expose: every process's files in multiprocess mode, this process's
+    metrics otherwise. `collectors` are added to the multiprocess registry only.
+    """
+    if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    for collector in collectors:
+        registry.register(collector)
+    return registry
+
+
+def observe_llm_call(model, tier, seconds, usage=None, error=False):
+    LLM_LATENCY.labels(model, tier, 'error' if error else 'ok').observe(seconds)
+    if error:
+        LLM_ERRORS.labels(model, tier).inc()
+    if usage is not None:
+        LLM_TOKENS.labels(model, 'prompt').inc(getattr(usage, 'prompt_tokens', 0) or 0)
+        LLM_TOKENS.labels(model, 'completion').inc(getattr(usage, 'completion_tokens', 0) or 0)
+
+
+class LedgerCollector:
+    """Gauges read from the database at scrape time, so they're correct across processes."""
+
+    def describe(self):
+        yield GaugeMetricFamily('claims_pending', 'Claims waiting for a decision')
+        yield GaugeMetricFamily('circles_below_min_balance', 'Circles whose balance is under min_balance_alert')
+
+    def collect(self):
+        from django.db.models import F
+        from circles.models import Circle, Claim
+
+        yield GaugeMetricFamily(
+            'claims_pending', 'Claims waiting for a decision',
+            value=Claim.objects.filter(status='pending').count(),
+        )
+        yield GaugeMetricFamily(
+            'circles_below_min_balance', 'Circles whose balance is under min_balance_alert',
+            value=Circle.objects.filter(balance__lt=F('min_balance_alert')).count(),
+        )
@@ -0,0 +1,78 @@
+import logging
+import time
+from django.conf import settings
+from .instrumentation import collect
+from .metrics import REQUEST_LATENCY, REQUEST_QUERIES
+from .profiler import sample, should_profile_request
+
+logger = logging.getLogger('monitoring.requests')
+
+
+class InstrumentationMiddleware:
+    """
+    Adds a Server-Timing header (db / llm / http / total) to every response, logs one
+    structured line per request, and logs the heaviest queries when a request goes over
+    its query or time budget (REQUEST_QUERY_BUDGET / REQUEST_TIME_BUDGET_MS, overridable
+    per URL name in REQUEST_BUDGETS).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with collect() as stats:
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        response['Server-Timing'] = stats.server_timing(total_ms)
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.view_name if match else None
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(total_ms, 1),
+            **stats.as_log_fields(),
+        }
+        logger.info("request", extra=fields)
+
+        metric_route = match.route if match else 'unmatched'
+        REQUEST_LATENCY.labels(metric_route, request.method, response.status_code).observe(total_ms / 1000)
+        REQUEST_QUERIES.labels(metric_route).observe(stats.db_count)
+
+        query_budget, time_budget = settings.REQUEST_BUDGETS.get(
+            route, (settings.REQUEST_QUERY_BUDGET, settings.REQUEST_TIME_BUDGET_MS)
+        )
+        if stats.db_count > query_budget or total_ms > time_budget:
+            logger.warning(
+                "request over budget",
+                extra={
+                    **fields,
+                    "query_budget": query_budget,
+                    "time_budget_ms": time_budget,
+                    "top_queries": stats.top_queries(),
+                },
+            )
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Runs the rest of the stack under the sampling profiler when the request carries a valid
+    signed X-Profile header or is picked by PROFILER_SAMPLE_RATE. Profiles are listed at
+    /admin/profiles/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not should_profile_request(request):
+            return self.get_response(request)
+        with sample('request', f"{request.method} {request.path}"):
+            response = self.get_response(request)
+        response['X-Profiled'] = '1'
+        return response
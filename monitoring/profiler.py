@@ -0,0 +1,179 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from django.conf import settings
+from django.core import signing
+
+PROFILE_HEADER = 'X-Profile'
+_SIGNING_SALT = 'monitoring.profiler'
+_lock = threading.Lock()
+_last_ns = 0
+
+
+class Sampler(threading.Thread):
+    """
+    Samples one thread's stack every `interval` seconds from a background thread and
+    counts collapsed stacks ("outer;inner;leaf"), the input format of flamegraph.pl and
+    speedscope. The profiled code runs unmodified, so overhead is one stack walk per tick.
+    """
+
+    def __init__(self, target_thread_id, interval):
+        super().__init__(daemon=True, name='profiler-sampler')
+        self.target = target_thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is None:
+                continue
+            self.stacks[_collapse(frame)] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+@lru_cache(maxsize=4096)
+def _frame_name(code):
+    filename = code.co_filename
+    for prefix in (str(settings.BASE_DIR) + os.sep, *(p + os.sep for p in sys.path if p)):
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):]
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+def _collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+@contextmanager
+def sample(kind, label):
+    """Profile the calling thread for the duration of the block and store the result."""
+    sampler = Sampler(threading.get_ident(), settings.PROFILER_INTERVAL_MS / 1000)
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        yield sampler
+    finally:
+        sampler.stop()
+        save_profile(kind, label, sampler, (time.perf_counter() - start) * 1000)
+
+
+# --- triggering ---
+
+def make_profile_token():
+    """Value for the X-Profile header; only valid for PROFILER_TOKEN_MAX_AGE seconds."""
+    return signing.TimestampSigner(salt=_SIGNING_SALT).sign('profile')
+
+
+def _valid_token(value):
+    try:
+        signing.TimestampSigner(salt=_SIGNING_SALT).unsign(value, max_age=settings.PROFILER_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def should_profile_request(request):
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        return _valid_token(token)
+    rate = settings.PROFILER_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def should_profile_task(name):
+    if name in settings.PROFILER_TASKS:
+        return True
+    rate = settings.PROFILER_TASK_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+# --- ring buffer on disk ---
+
+def _slug(label):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '-', label).strip('-')[:80] or 'root'
+
+
+def _timestamp_ns():
+    """time_ns(), strictly increasing within the process so names never collide or reorder."""
+    global _last_ns
+    with _lock:
+        _last_ns = max(time.time_ns(), _last_ns + 1)
+        return _last_ns
+
+
+def save_profile(kind, label, sampler, duration_ms):
+    if not sampler.samples:
+        return None
+    directory = settings.PROFILER_DIR
+    os.makedirs(directory, exist_ok=True)
+    # Zero-padded nanoseconds first, so sorting names sorts profiles by age
+    name = f"{_timestamp_ns():020d}-{kind}-{_slug(label)}-{int(duration_ms)}ms.folded"
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(f"# {kind} {label} duration_ms={duration_ms:.1f} samples={sampler.samples}\n")
+        for stack, count in sampler.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    _prune(directory)
+    return name
+
+
+def _prune(directory):
+    with _lock:
+        files = sorted(f for f in os.listdir(directory) if f.endswith('.folded'))
+        for old in files[:-settings.PROFILER_MAX_PROFILES]:
+            try:
+                os.remove(os.path.join(directory, old))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    directory = settings.PROFILER_DIR
+    if not os.path.isdir(directory):
+        return []
+    return sorted((f for f in os.listdir(directory) if f.endswith('.folded')), reverse=True)
+
+
+def read_profile(name):
+    """Returns (header, [(stack, count)]) or None. `name` must be a bare file name."""
+    if os.path.basename(name) != name or not name.endswith('.folded'):
+        return None
+    path = os.path.join(settings.PROFILER_DIR, name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        header = f.readline().lstrip('# ').strip()
+        stacks = []
+        for line in f:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            stacks.append((stack, int(count)))
+    return header, stacks
+
+
+def top_functions(stacks, limit=25):
+    """Self and total sample counts per frame, for a quick look without a flamegraph."""
+    own, total = Counter(), Counter()
+    for stack, count in stacks:
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [(frame, own[frame], total[frame]) for frame, _ in own.most_common(limit)]
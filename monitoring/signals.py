@@ -0,0 +1,71 @@
+import logging
+import os
+import shutil
+import time
+from celery.signals import celeryd_init, task_postrun, task_prerun, worker_process_shutdown, worker_ready
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from prometheus_client import multiprocess, start_http_server
+from wallets.models import Transaction
+from .metrics import LEDGER_AMOUNT, LEDGER_TRANSACTIONS, TASK_DURATION, scrape_registry
+from .profiler import sample, should_profile_task
+
+logger = logging.getLogger(__name__)
+
+_task_started = {}
+_task_profiles = {}
+
+
+@task_prerun.connect
+def start_task_timer(task_id=None, task=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+    if task is not None and should_profile_task(task.name):
+        profile = sample('task', task.name)
+        profile.__enter__()
+        _task_profiles[task_id] = profile
+
+
+# postrun fires for failed tasks too, with state FAILURE
+@task_postrun.connect
+def observe_task(task_id=None, task=None, state=None, **kwargs):
+    profile = _task_profiles.pop(task_id, None)
+    if profile is not None:
+        profile.__exit__(None, None, None)
+    started = _task_started.pop(task_id, None)
+    if started is not None:
+        TASK_DURATION.labels(task.name, (state or 'unknown').lower()).observe(time.perf_counter() - started)
+
+
+# Celery workers are scraped on their own port (CELERY_METRICS_PORT); with a prefork pool,
+# set PROMETHEUS_MULTIPROC_DIR so the pool processes' task/LLM metrics reach the exporter.
+
+@celeryd_init.connect
+def reset_worker_metrics(**kwargs):
+    """Before the pool forks: start from an empty multiprocess directory, as gunicorn does."""
+    path = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if settings.CELERY_METRICS_PORT and path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+@worker_ready.connect
+def start_worker_exporter(**kwargs):
+    port = settings.CELERY_METRICS_PORT
+    if not port:
+        return
+    start_http_server(port, registry=scrape_registry())
+    logger.info(f"Serving worker metrics on :{port}")
+
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(pid=None, **kwargs):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+@receiver(post_save, sender=Transaction)
+def count_transaction(sender, instance, created, **kwargs):
+    if created:
+        LEDGER_TRANSACTIONS.labels(instance.transaction_type).inc()
+        LEDGER_AMOUNT.labels(instance.transaction_type).inc(float(instance.amount))
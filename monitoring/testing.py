@@ -0,0 +1,120 @@
+import gc
+import json
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+BUDGETS_FILE = Path(settings.BASE_DIR) / 'query_budgets.json'
+
+
+def load_budgets():
+    with open(BUDGETS_FILE) as f:
+        return json.load(f)
+
+
+def build_fixtures(circles=2, members_per_circle=300, contributions_per_circle=1500,
+                   claims_per_circle=50, transactions=1000, seed=1):
+    """
+    Realistically sized data for the query-budget tests: big circles, lots of
+    contributions and claims, and one wallet with a long history. Returns the objects
+    the tests log in as and look up.
+    """
+    from circles.models import Circle, Claim, Contribution, Membership
+    from circles.counters import rebuild_counters
+    from circles.stats import rebuild_stats
+    from healthSubs.models import HealthProfile
+    from wallets.models import Transaction, Wallet
+
+    User = get_user_model()
+    rng = random.Random(seed)
+    password = make_password('budget-pass')
+    users = User.objects.bulk_create([
+        User(username=f'budget{i}', password=password, phone=f'+2547{i:08d}')
+        for i in range(circles * members_per_circle)
+    ])
+    owner = users[0]
+    Wallet.objects.bulk_create([Wallet(user=user, balance=Decimal('1000')) for user in users])
+    HealthProfile.objects.bulk_create([
+        HealthProfile(user=user, full_name=user.username, gender='F', conditions=[], family_history=[])
+        for user in users[:members_per_circle]
+    ])
+
+    joined = timezone.now() - timedelta(days=90)
+    created = []
+    for c in range(circles):
+        circle_users = users[c * members_per_circle:(c + 1) * members_per_circle]
+        if owner not in circle_users:
+            circle_users = [owner] + circle_users[:-1]
+        circle = Circle.objects.create(
+            name=f'Budget circle {c}', creator=owner, contribution_amount=Decimal('100'), balance=Decimal('50000'),
+        )
+        Membership.objects.bulk_create([Membership(user=user, circle=circle) for user in circle_users])
+        Membership.objects.filter(circle=circle).update(join_date=joined)
+        Contribution.objects.bulk_create([
+            Contribution(user=rng.choice(circle_users), circle=circle, amount=Decimal('100'))
+            for _ in range(contributions_per_circle)
+        ])
+        Claim.objects.bulk_create([
+            Claim(user=rng.choice(circle_users), circle=circle, amount=Decimal(rng.randint(100, 5000)),
+                  reason=f'Clinic visit {i}', status=rng.choice(['pending', 'approved', 'rejected']))
+            for i in range(claims_per_circle)
+        ])
+        created.append(circle)
+
+    wallet = Wallet.objects.get(user=owner)
+    Transaction.objects.bulk_create([
+        Transaction(wallet=wallet, amount=Decimal('10'), transaction_type=rng.choice(['topup', 'withdrawal']))
+        for _ in range(transactions)
+    ])
+    rebuild_stats()  # bulk_create skips the signals that maintain CircleStats and the circle counters
+    rebuild_counters()
+    admin = User.objects.create_superuser('budget-admin', password='budget-pass')
+    return {'owner': owner, 'circles': created, 'admin': admin}
+
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Base class for the query-budget regression tests. `assertWithinBudget(name)` wraps a
+    request and fails if it runs more queries, or takes longer, than the entry for `name`
+    in query_budgets.json. The cache is emptied around every test, so budgets cover cold reads.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.budgets = load_budgets()
+        cls.fixtures = build_fixtures()
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+        super().tearDown()
+
+    @contextmanager
+    def assertWithinBudget(self, name):
+        budget = self.budgets[name]
+        gc.collect()  # a full collection due in the block would be timed as the request's
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            yield
+            elapsed_ms = (time.perf_counter() - start) * 1000
+        queries = len(ctx.captured_queries)
+        statements = '\n'.join(q['sql'][:200] for q in ctx.captured_queries)
+        self.assertLessEqual(
+            queries, budget['queries'],
+            f"{name} ran {queries} queries (budget {budget['queries']}):\n{statements}",
+        )
+        self.assertLessEqual(
+            elapsed_ms, budget['ms'],
+            f"{name} took {elapsed_ms:.0f} ms (budget {budget['ms']} ms)",
+        )
@@ -0,0 +1,164 @@
+import io
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+from functools import partial
+from types import SimpleNamespace
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from tqdm import tqdm
+from circles.models import Circle, Claim, Contribution, Membership
+from healthSubs.models import HealthProfile
+from wallets.models import Transaction, Wallet
+from .profiler import list_profiles, make_profile_token, read_profile, sample, save_profile, top_functions
+from .signals import start_worker_exporter
+
+
+class InstrumentationMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='timed', password='pass')
+        Wallet.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_and_request_metrics(self):
+        labels = {'route': 'api/wallet/', 'method': 'GET', 'status': '200'}
+        before = REGISTRY.get_sample_value('http_request_duration_seconds_count', labels) or 0
+
+        with self.assertLogs('monitoring.requests', 'INFO') as logs:
+            response = self.client.get(reverse('wallet'))
+
+        timing = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(list(timing), ['db', 'llm', 'http', 'total'])
+        self.assertIn('desc="0 calls"', timing['llm'])
+        self.assertEqual(REGISTRY.get_sample_value('http_request_duration_seconds_count', labels), before + 1)
+
+        (record,) = logs.records
+        self.assertEqual((record.route, record.status), ('wallet', 200))
+        self.assertGreater(record.db_queries, 0)
+
+    @override_settings(REQUEST_BUDGETS={'wallet': (0, 30000)})
+    def test_over_budget_logs_top_queries(self):
+        with self.assertLogs('monitoring.requests', 'WARNING') as logs:
+            self.client.get(reverse('wallet'))
+
+        (record,) = logs.records
+        self.assertEqual((record.getMessage(), record.query_budget), ('request over budget', 0))
+        self.assertTrue(record.top_queries)
+        self.assertEqual(set(record.top_queries[0]), {'sql', 'count', 'total_ms'})
+
+
+class MetricsEndpointTests(TestCase):
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_requires_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        for metric in ('http_request_duration_seconds', 'celery_task_duration_seconds', 'claims_pending 0.0'):
+            self.assertIn(metric, body)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False, METRICS_PUBLIC=False)
+    def test_hidden_without_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        for allowed in ({'METRICS_PUBLIC': True}, {'DEBUG': True}):
+            with self.subTest(**allowed), self.settings(**allowed):
+                self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(CELERY_METRICS_PORT=9808)
+    def test_worker_exporter(self):
+        with mock.patch('monitoring.signals.start_http_server') as start:
+            start_worker_exporter()
+        start.assert_called_once_with(9808, registry=REGISTRY)
+
+        with self.settings(CELERY_METRICS_PORT=None), mock.patch('monitoring.signals.start_http_server') as start:
+            start_worker_exporter()
+        start.assert_not_called()
+
+
+@override_settings(METRICS_PUBLIC=True)
+class ProfilerTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        override = self.settings(PROFILER_DIR=directory, PROFILER_INTERVAL_MS=1, PROFILER_MAX_PROFILES=3)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_sample_stores_collapsed_stacks(self):
+        def busy_loop():
+            deadline = time.perf_counter() + 0.1
+            while time.perf_counter() < deadline:
+                pass
+
+        with sample('task', 'circles.tasks.enforce_contributions') as sampler:
+            busy_loop()
+        self.assertGreater(sampler.samples, 0)
+
+        (name,) = list_profiles()
+        self.assertIn('-task-circles.tasks.enforce_contributions-', name)
+        header, stacks = read_profile(name)
+        self.assertTrue(header.startswith('task circles.tasks.enforce_contributions duration_ms='))
+        self.assertEqual(sum(count for _, count in stacks), sampler.samples)
+        self.assertIn('busy_loop (monitoring/tests.py:', top_functions(stacks)[0][0])
+
+    def test_keeps_newest_profiles(self):
+        sampler = SimpleNamespace(samples=1, stacks=Counter({'main;leaf': 1}))
+        names = [save_profile('request', f'GET /{i}', sampler, 1) for i in range(5)]
+        self.assertEqual(list_profiles(), names[:1:-1])  # newest first, oldest two pruned
+        self.assertIsNone(read_profile('../' + names[-1]))
+
+    def test_signed_header_profiles_request(self):
+        with mock.patch('monitoring.middleware.sample', wraps=sample) as profiled:
+            response = self.client.get(reverse('metrics'), HTTP_X_PROFILE=make_profile_token())
+        self.assertEqual(response['X-Profiled'], '1')
+        profiled.assert_called_once_with('request', 'GET /metrics')
+
+        response = self.client.get(reverse('metrics'), HTTP_X_PROFILE='profile:forged')
+        self.assertNotIn('X-Profiled', response)
+
+
+class SyntheticDataTests(TestCase):
+
+    def generate(self, **options):
+        out = io.StringIO()
+        with mock.patch('monitoring.management.commands.generate_synthetic_data.tqdm', partial(tqdm, disable=True)):
+            call_command(
+                'generate_synthetic_data', users=20, circles=4, members='3-5', contributions=60,
+                transactions=30, workers=1, batch_size=7, stdout=out, **options,
+            )
+        planned = re.search(r'(\d+) memberships, (\d+) contributions, (\d+) claims', out.getvalue())
+        return [int(n) for n in planned.groups()]
+
+    def test_row_counts(self):
+        memberships, contributions, claims = self.generate()
+
+        User = get_user_model()
+        self.assertEqual([User.objects.count(), Wallet.objects.count(), HealthProfile.objects.count()], [20, 20, 20])
+        self.assertEqual(Circle.objects.count(), 4)
+        self.assertEqual(Membership.objects.count(), memberships)
+        self.assertEqual(Contribution.objects.count(), contributions)
+        self.assertEqual(Claim.objects.count(), claims)
+        self.assertEqual(Transaction.objects.count(), 30)
+        self.assertEqual(Circle.objects.aggregate(n=Sum('member_count'))['n'], memberships)
+        self.assertTrue(all(3 <= circle.member_count <= 5 for circle in Circle.objects.all()))
+
+        # A second run adds to the data, and the sequences were moved past the explicit ids
+        self.generate(seed=7)
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Circle.objects.count(), 8)
+        User.objects.create_user(username='after-generate', password='pass')
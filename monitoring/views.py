@@ -0,0 +1,61 @@
+import hmac
+import os
+from django.conf import settings
+from django.contrib import admin
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.template.response import TemplateResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from .metrics import LedgerCollector, scrape_registry
+from .profiler import list_profiles, make_profile_token, read_profile, top_functions
+
+_ledger_collector = LedgerCollector()
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    REGISTRY.register(_ledger_collector)
+
+
+def metrics_view(request):
+    """
+    Prometheus exposition endpoint. Requires `Authorization: Bearer <METRICS_TOKEN>`; without
+    a token configured it is only served with DEBUG or METRICS_PUBLIC.
+    """
+    if settings.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not hmac.compare_digest(supplied, settings.METRICS_TOKEN):
+            return HttpResponseForbidden()
+    elif not (settings.DEBUG or settings.METRICS_PUBLIC):
+        raise Http404
+
+    registry = scrape_registry(_ledger_collector)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+def profile_list_view(request):
+    """Admin page listing stored profiles, plus a fresh X-Profile token to trigger one."""
+    context = {
+        **admin.site.each_context(request),
+        'title': 'Profiles',
+        'profiles': list_profiles(),
+        'token': make_profile_token(),
+        'token_max_age': settings.PROFILER_TOKEN_MAX_AGE,
+    }
+    return TemplateResponse(request, 'admin/monitoring/profile_list.html', context)
+
+
+def profile_detail_view(request, name):
+    profile = read_profile(name)
+    if profile is None:
+        raise Http404
+    header, stacks = profile
+    if request.GET.get('download'):
+        body = ''.join(f"{stack} {count}\n" for stack, count in stacks)
+        response = HttpResponse(body, content_type='text/plain')
+        response['Content-Disposition'] = f'attachment; filename="{name}"'
+        return response
+    context = {
+        **admin.site.each_context(request),
+        'title': name,
+        'name': name,
+        'header': header,
+        'functions': top_functions(stacks),
+    }
+    return TemplateResponse(request, 'admin/monitoring/profile_detail.html', context)
@@ -0,0 +1,22 @@
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from HealthBackEnd.cache import invalidate
+from .models import Transaction, Wallet
+
+
+@receiver([post_save, post_delete], sender=Wallet)
+def invalidate_cached_wallet(sender, instance, **kwargs):
+    invalidate('wallet', instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+def invalidate_cached_wallet_history(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Model) and not isinstance(origin, Transaction):
+        return  # cascade from a wallet (or its user): the wallet's own post_delete invalidates it
+    if Transaction.wallet.is_cached(instance):
+        user_id = instance.wallet.user_id
+    else:
+        user_id = Wallet.objects.filter(pk=instance.wallet_id).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        invalidate('wallet', user_id)
@@ -1,3 +1,158 @@
+import datetime
+import uuid
+from decimal import Decimal
+from unittest import mock
+import fakeredis
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from HealthBackEnd import cache as versioned_cache
+from HealthBackEnd.renderers import ORJSONRenderer
+from monitoring.testing import QueryBudgetTestCase
+from .models import Transaction, Wallet
+from .serializers import WalletSerializer
 
-# Create your tests here.
+
+class WalletQueryBudgetTests(QueryBudgetTestCase):
+    """Query count / wall time for the wallet endpoint with a long transaction history."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.fixtures['owner'])
+
+    def test_wallet(self):
+        with self.assertWithinBudget('wallet'):
+            response = self.client.get(reverse('wallet'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['wallet']['transactions']), 1000)
+
+    def test_wallet_cached(self):
+        self.client.get(reverse('wallet'))
+        with self.assertWithinBudget('wallet-cached'):
+            response = self.client.get(reverse('wallet'))
+        self.assertEqual(len(response.data['wallet']['transactions']), 1000)
+
+        self.client.post(reverse('wallet'), {'amount': 50, 'transaction_type': 'topup'}, format='json')
+        self.assertEqual(len(self.client.get(reverse('wallet')).data['wallet']['transactions']), 1001)
+
+    def test_wallet_not_modified(self):
+        response = self.client.get(reverse('wallet'))
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertWithinBudget('wallet-not-modified'):
+            response = self.client.get(reverse('wallet'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(reverse('wallet'), HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.client.post(reverse('wallet'), {'amount': 50, 'transaction_type': 'topup'}, format='json')
+        self.assertEqual(self.client.get(reverse('wallet'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class WalletInvalidationTests(TestCase):
+
+    def wallet(self, username, transactions):
+        wallet = Wallet.objects.create(user=get_user_model().objects.create_user(username=username, password='pass'))
+        Transaction.objects.bulk_create(
+            Transaction(wallet=wallet, amount=Decimal('10'), transaction_type='topup') for _ in range(transactions)
+        )
+        return Wallet.objects.get(pk=wallet.pk)
+
+    def test_transaction_save_bumps_owner_version(self):
+        wallet = self.wallet('history', 0)
+        before = versioned_cache.get_version('wallet', wallet.user_id)
+        with CaptureQueriesContext(connection) as captured:
+            Transaction.objects.create(wallet_id=wallet.pk, amount=Decimal('5'), transaction_type='topup')
+        self.assertNotEqual(versioned_cache.get_version('wallet', wallet.user_id), before)
+        self.assertEqual(sum('"wallets_wallet"' in query['sql'] for query in captured), 1)  # user_id only
+
+    def test_cascade_delete_skips_per_transaction_lookup(self):
+        small, large = self.wallet('small', 1), self.wallet('large', 20)
+        with CaptureQueriesContext(connection) as small_delete:
+            small.delete()
+        with CaptureQueriesContext(connection) as large_delete:
+            large.delete()
+        self.assertEqual(len(large_delete), len(small_delete))
+
+
+class WalletCacheOutageTests(TestCase):
+    """A Redis outage degrades the cache, never the writes, and leaves no stale wallet or false 304."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeServer()
+        override = self.settings(CACHES={'default': {
+            'BACKEND': 'HealthBackEnd.cache.FailOpenRedisCache',
+            'LOCATION': 'redis://fake',
+            'OPTIONS': {'connection_class': fakeredis.FakeConnection, 'server': self.redis},
+        }})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(versioned_cache._pending_resets.clear)
+
+        self.user = get_user_model().objects.create_user(username='outage', password='pass')
+        self.wallet = Wallet.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_writes_succeed_while_redis_is_down(self):
+        etag = self.client.get(reverse('wallet'))['ETag']
+        self.redis.connected = False
+        with self.assertLogs('HealthBackEnd.cache', 'WARNING') as logs, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('wallet'), {'amount': 50, 'transaction_type': 'topup'}, format='json')
+            get_user_model().objects.create_user(username='signup-during-outage', password='pass')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('bump lost' in line for line in logs.output))
+        self.assertEqual(Transaction.objects.count(), 1)
+
+        # Reconnected: the lost bumps reset the namespace before anything is read
+        self.redis.connected = True
+        self.assertEqual(self.client.get(reverse('wallet'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get(reverse('wallet')).data['wallet']['balance'], '50.00')
+
+    @mock.patch('HealthBackEnd.cache.time.sleep')
+    def test_miss_computes_without_waiting_while_redis_is_down(self, sleep):
+        self.redis.connected = False
+        with self.assertLogs('HealthBackEnd.cache', 'WARNING'):
+            self.assertEqual(versioned_cache.cached('wallet', 'outage', lambda: 'fresh', 60), 'fresh')
+        sleep.assert_not_called()
+
+    @mock.patch('HealthBackEnd.cache.time.sleep')
+    def test_failed_compute_releases_lock(self, sleep):
+        def broken():
+            raise RuntimeError('database went away')
+
+        with self.assertRaises(RuntimeError):
+            versioned_cache.cached('wallet', 'flaky', broken, 60)
+        self.assertEqual(versioned_cache.cached('wallet', 'flaky', lambda: 'fresh', 60), 'fresh')
+        sleep.assert_not_called()
+
+
+class RendererParityTests(TestCase):
+    """ORJSONRenderer must produce the same bytes as DRF's JSONRenderer."""
+
+    def assertSameOutput(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_serialized_wallet(self):
+        user = get_user_model().objects.create_user(username='renderer', password='pw')
+        wallet = Wallet.objects.create(user=user, balance=Decimal('12.50'))
+        Transaction.objects.create(wallet=wallet, amount=Decimal('0.10'), transaction_type='topup',
+                                   description='line\u2028break')
+        wallet.refresh_from_db()
+        self.assertNotEqual(wallet.created_at.microsecond, 0)
+        self.assertSameOutput(WalletSerializer(wallet).data)
+
+    def test_raw_values(self):
+        user = get_user_model().objects.create_user(username='renderer', password='pw')
+        Wallet.objects.create(user=user, balance=Decimal('12.50'))
+        self.assertSameOutput({
+            'wallets': list(Wallet.objects.values('balance', 'created_at')),
+            'naive': datetime.datetime(2024, 3, 1, 12, 30, 0, 123456),
+            'offset': datetime.datetime(2024, 3, 1, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+            'date': datetime.date(2024, 3, 1),
+            'time': datetime.time(9, 15, 30, 500),
+            'duration': datetime.timedelta(hours=1, seconds=5),
+            'uuid': uuid.UUID(int=1),
+        })
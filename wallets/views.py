@@ -1,31 +1,41 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from auths.authentication import ClaimsAuthMixin
+from HealthBackEnd.cache import cached
+from HealthBackEnd.conditional import ConditionalGetMixin, version_stamp
 from .models import Wallet, Transaction
-from .serializers import WalletSerializer, TransactionSerializer
+from .serializers import WalletSerializer
 
-class WalletAPIView(APIView):
+def _wallet_data(user_id):
+    wallet = Wallet.objects.filter(user_id=user_id).first()
+    return {'wallet': WalletSerializer(wallet).data} if wallet else None
+
+
+class WalletAPIView(ConditionalGetMixin, ClaimsAuthMixin, APIView):
+    read_replica = True
     permission_classes = [IsAuthenticated]
+    last_modified_field = 'wallet.updated_at'
+
+    def get_version_stamp(self, request):
+        return version_stamp('wallet', request.user.id)
+
+    def get_last_modified(self, request):
+        # Every transaction path saves the wallet, so updated_at covers the history too
+        return Wallet.objects.filter(user_id=request.user.id).values_list('updated_at', flat=True).first()
 
     def get(self, request):
-        # Get wallet details and transaction history
-        try:
-            wallet = Wallet.objects.get(user=request.user)
-        except Wallet.DoesNotExist:
+        # Get wallet details and transaction history (versioned cache, bumped by wallet/transaction saves)
+        data = cached('wallet', request.user.id, lambda: _wallet_data(request.user.id), settings.WALLET_CACHE_TIMEOUT)
+        if data is None:
             return Response(
                 {"error": "Wallet not found. Please make your first top-up to create a wallet."},
                 status=status.HTTP_404_NOT_FOUND
             )
-
-        serializer = WalletSerializer(wallet)
-        transactions = wallet.transactions.all().order_by('-timestamp')
-        transaction_serializer = TransactionSerializer(transactions, many=True)
-        
-        response_data = {
-            'wallet': serializer.data,
-        }
-        return Response(response_data)
+        return Response(data)
 
     def post(self, request):
         # Handle top-up or withdrawal
@@ -54,28 +64,30 @@ class WalletAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get or create wallet
-        wallet, created = Wallet.objects.get_or_create(user=request.user)
+        # Balance and history change together
+        with transaction.atomic():
+            # Get or create wallet
+            wallet, created = Wallet.objects.get_or_create(user=request.user)
 
-        if transaction_type == 'withdrawal':
-            if wallet.balance < amount:
-                return Response(
-                    {"error": "Insufficient balance. Please top up your wallet."},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            wallet.balance -= int(amount)
-        else:  # topup
-            wallet.balance += int(amount)
+            if transaction_type == 'withdrawal':
+                if wallet.balance < amount:
+                    return Response(
+                        {"error": "Insufficient balance. Please top up your wallet."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                wallet.balance -= int(amount)
+            else:  # topup
+                wallet.balance += int(amount)
 
-        wallet.save()
+            wallet.save()
 
-        # Create transaction record
-        transaction = Transaction.objects.create(
-            wallet=wallet,
-            amount=amount,
-            transaction_type=transaction_type,
-            description=request.data.get('description', '')
-        )
+            # Create transaction record
+            Transaction.objects.create(
+                wallet=wallet,
+                amount=amount,
+                transaction_type=transaction_type,
+                description=request.data.get('description', '')
+            )
 
         serializer = WalletSerializer(wallet)
         return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file